@@ -0,0 +1,65 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark the launch journal.
+
+Measures the cost of journaling one TERCC, i.e. appending the received, submitted and
+ACK:ed entries, with SQLite synchronous NORMAL and FULL, and the time to read back the
+launched suites on startup from a full journal.
+
+    python -m benchmarks.bench_journal [--size 10000] [--iterations 2000] [--directory /tmp]
+"""
+
+import argparse
+import tempfile
+import uuid
+from pathlib import Path
+
+from suite_starter.journal import ACKED, RECEIVED, SUBMITTED, LaunchJournal
+
+from .common import measure, report
+
+
+def main():
+    """Run the journal benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--directory", help="Directory to store the journals in")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        for synchronous in ("NORMAL", "FULL"):
+            path = str(Path(directory).joinpath(f"{synchronous}.db"))
+            journal = LaunchJournal(path, size=args.size, synchronous=synchronous)
+
+            def journal_tercc(journal=journal):
+                suite_id = str(uuid.uuid4())
+                for kind in (RECEIVED, SUBMITTED, ACKED):
+                    journal.append(suite_id, kind)
+
+            results[f"append[synchronous={synchronous}]"] = measure(journal_tercc, args.iterations)
+            while len(journal) < args.size:
+                journal_tercc()
+            results[f"replay[synchronous={synchronous},size={args.size}]"] = measure(
+                lambda journal=journal: journal.submitted(args.size), 20
+            )
+            journal.close()
+    report("journal", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark creating jobs with a new Kubernetes client per event or a shared client.
+
+Jobs are created in a fake Kubernetes API served over TLS on localhost, so the
+difference between the cases is client setup, TLS handshakes and connection setup.
+
+    python -m benchmarks.bench_kubernetes_client [--iterations 200] [--no-tls]
+"""
+
+import argparse
+import json
+from unittest.mock import patch
+
+from etos_lib.kubernetes.jobs import Job
+from kubernetes import client  # pylint:disable=no-name-in-module
+
+from suite_starter.template import SuiteRunnerTemplate
+from tests.fakes import FakeKubernetes
+
+from .common import CONFIGURATION, ESR_TEMPLATE, measure, report, tercc
+
+
+def main():
+    """Run the Kubernetes client benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--no-tls", action="store_true")
+    args = parser.parse_args()
+
+    template = SuiteRunnerTemplate(ESR_TEMPLATE.read_text(encoding="utf-8"), CONFIGURATION)
+    counter = iter(range(10**9))
+
+    def body() -> dict:
+        event = tercc()
+        return template.render(
+            EiffelTestExecutionRecipeCollectionCreatedEvent=json.dumps(event.json),
+            suite_id=event.meta.event_id,
+            job_name=f"suite-runner-{next(counter)}",
+            otel_context="",
+        )
+
+    results = {}
+    with FakeKubernetes(tls=not args.no_tls) as fake:
+
+        def load_config(_):
+            client.Configuration.set_default(fake.configuration())
+
+        with patch.object(Job, "_load_config", load_config):
+
+            def client_per_event():
+                Job(namespace="etos").create_job(body())
+
+            def shared_client(job=Job(namespace="etos")):
+                job.create_job(body())
+
+            for name, function in (
+                ("client_per_event", client_per_event),
+                ("shared_client", shared_client),
+            ):
+                connections = fake.connections
+                result = measure(function, args.iterations)
+                # measure() calls the function one extra time when tracing allocations.
+                result["connections_per_event"] = (fake.connections - connections) / (
+                    args.iterations + 1
+                )
+                results[f"{name}[tls={fake.tls}]"] = result
+    report("kubernetes_client", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Load test the suite starter with synthetic TERCCs of different sizes and rates.
+
+TERCCs arrive at a fixed rate, or all at once with rate 0, and the latency of each TERCC
+is measured from when it arrived until it was ACK:ed. Jobs are created in a fake
+Kubernetes API on localhost, or by a stub that only sleeps, with a configurable latency.
+
+Modes:
+    callback  Call `SuiteStarter.suite_runner_callback` from a pool of worker threads.
+    threaded  Consume from an in-memory AMQP stand-in with the suite starter subscriber,
+              including its thread pool, prefetch and ACK:ing.
+    async     Consume from an in-memory queue with the asyncio suite starter.
+
+    python -m benchmarks.bench_load [--modes callback,threaded,async] [--sizes 10,1000]
+        [--rates 0,100] [--count 200] [--workers 10] [--latency 0.05] [--stub]
+
+Prints one JSON line per mode, size and rate, with throughput in TERCCs per second,
+latency percentiles and the growth of the peak resident memory of the process.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+
+from etos_lib.kubernetes.jobs import Job
+from etos_lib.lib.config import Config
+from kubernetes import client
+
+from suite_starter.suite_starter import SuiteStarter
+from tests.fakes import FakeKubernetes, InMemoryBroker, InMemoryQueue
+
+from .common import ENVIRONMENT as BASE_ENVIRONMENT
+from .common import ESR_TEMPLATE, report, tercc
+
+ENVIRONMENT = {**BASE_ENVIRONMENT, "ETOS_DISABLE_RECEIVING_EVENTS": "1"}
+
+
+def due(start: float, index: int, rate: float) -> float:
+    """Get the time that a TERCC is due to arrive.
+
+    :param start: Time that the first TERCC arrives.
+    :param index: Index of the TERCC.
+    :param rate: TERCCs per second, or 0 for all at once.
+    """
+    return start + index / rate if rate else start
+
+
+def arrivals(count: int, rate: float):
+    """Yield the index of each TERCC when it is due to arrive, and when it was due."""
+    start = time.monotonic()
+    for index in range(count):
+        arrival = due(start, index, rate)
+        time.sleep(max(arrival - time.monotonic(), 0))
+        yield index, arrival
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    """Summarize the latencies of a load test run."""
+    latencies = sorted(latencies)
+    return {
+        "terccs": len(latencies),
+        "throughput_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def callback_mode(suite_starter: SuiteStarter, bodies: list[bytes], args) -> list[float]:
+    """Call the TERCC callback from a pool of worker threads."""
+    latencies = []
+
+    def handle(index: int, arrival: float):
+        ack, _ = suite_starter.etos.subscriber.call(bodies[index])
+        assert ack, "TERCC was not ACK:ed"
+        latencies.append(time.monotonic() - arrival)
+
+    with ThreadPoolExecutor(args.workers) as pool:
+        for index, arrival in arrivals(len(bodies), args.rate):
+            pool.submit(handle, index, arrival)
+    return latencies
+
+
+def threaded_mode(suite_starter: SuiteStarter, bodies: list[bytes], args) -> list[float]:
+    """Consume TERCCs from an in-memory AMQP stand-in with the suite starter subscriber."""
+    with InMemoryBroker() as broker:
+        broker.attach(suite_starter.etos.subscriber)
+        for index, _ in arrivals(len(bodies), args.rate):
+            broker.publish(bodies[index])
+        assert broker.wait(len(bodies), timeout=600), "Not all TERCCs were handled"
+    assert not broker.rejected and not broker.requeued, "Not all TERCCs were ACK:ed"
+    return [latency for _, latency in broker.acked]
+
+
+def async_mode(suite_starter, bodies: list[bytes], args, fake) -> list[float]:
+    """Consume TERCCs from an in-memory queue with the asyncio suite starter."""
+    # Optional dependency. pylint:disable=import-outside-toplevel
+    from kubernetes_asyncio import client as async_client
+
+    async def stub(*_, **__):
+        await asyncio.sleep(args.latency)
+        return MagicMock()
+
+    async def publish(queue: InMemoryQueue):
+        start = time.monotonic()
+        for index, body in enumerate(bodies):
+            # Always yield, to let the consumer run between arrivals.
+            await asyncio.sleep(max(due(start, index, args.rate) - time.monotonic(), 0))
+            queue.publish(body)
+        queue.close()
+
+    async def run() -> InMemoryQueue:
+        queue = InMemoryQueue()
+        configuration = async_client.Configuration(host=fake.url if fake else "http://stub")
+        async with async_client.ApiClient(configuration) as api_client:
+            suite_starter.batch_v1 = async_client.BatchV1Api(api_client)
+            if fake is None:
+                suite_starter.batch_v1.create_namespaced_job = stub
+            await asyncio.gather(publish(queue), suite_starter.consume(queue))
+        return queue
+
+    queue = asyncio.run(run())
+    assert len(queue.acked) == len(bodies), "Not all TERCCs were ACK:ed"
+    return [message.acked - message.published for message in queue.acked]
+
+
+def suite_starter_for(mode: str):
+    """Initialize a suite starter for a mode."""
+    Config().reset()
+    if mode == "async":
+        # Optional dependency. pylint:disable=import-outside-toplevel
+        from suite_starter.async_suite_starter import AsyncSuiteStarter
+
+        suite_starter = AsyncSuiteStarter(str(ESR_TEMPLATE))
+        suite_starter.namespace = "etos"
+        return suite_starter
+    suite_starter = SuiteStarter(str(ESR_TEMPLATE))
+    suite_starter.job.namespace = "etos"
+    return suite_starter
+
+
+def run_case(mode: str, size: int, args, fake) -> dict:
+    """Run a load test for a mode and TERCC size at a rate."""
+    bodies = [json.dumps(tercc(recipes=size).json).encode("utf-8") for _ in range(args.count)]
+    suite_starter = suite_starter_for(mode)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.monotonic()
+    if mode == "callback":
+        latencies = callback_mode(suite_starter, bodies, args)
+    elif mode == "threaded":
+        latencies = threaded_mode(suite_starter, bodies, args)
+    else:
+        latencies = async_mode(suite_starter, bodies, args, fake)
+    result = summarize(latencies, time.monotonic() - start)
+    result["tercc_kib"] = len(bodies[0]) / 1024
+    # ru_maxrss is in KiB on Linux and can not be reset, so this is how much the peak
+    # memory of the process grew during this case.
+    result["peak_rss_growth_mib"] = (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - peak_rss
+    ) / 1024
+    return result
+
+
+def main():
+    """Run the load test."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--modes", default="callback,threaded,async")
+    parser.add_argument("--sizes", default="10,1000", help="Number of recipes per TERCC")
+    parser.add_argument("--rates", default="0", help="TERCCs per second, 0 for all at once")
+    parser.add_argument("--count", type=int, default=200, help="Number of TERCCs per case")
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds to create a job")
+    parser.add_argument("--stub", action="store_true", help="Do not create jobs over HTTP")
+    args = parser.parse_args()
+    # Logging every TERCC would both slow down the suite starter and garble the results.
+    logging.disable(logging.INFO)
+
+    results = {}
+    with ExitStack() as stack:
+        stack.enter_context(patch.dict(os.environ, ENVIRONMENT))
+        os.environ["SUITE_STARTER_WORKERS"] = str(args.workers)
+        fake = None
+        if args.stub:
+
+            def create_job(_, body):
+                time.sleep(args.latency)
+                return client.V1Job(metadata=client.V1ObjectMeta(name=body["metadata"]["name"]))
+
+            stack.enter_context(patch.object(Job, "create_job", create_job))
+        else:
+            fake = stack.enter_context(FakeKubernetes(latency=args.latency))
+        configuration = fake.configuration() if fake else client.Configuration()
+        stack.enter_context(
+            patch.object(
+                Job, "_load_config", lambda _: client.Configuration.set_default(configuration)
+            )
+        )
+        for mode in args.modes.split(","):
+            for size in (int(size) for size in args.sizes.split(",")):
+                for rate in (float(rate) for rate in args.rates.split(",")):
+                    args.rate = rate
+                    case = (
+                        f"{mode}[recipes={size},rate={rate:g},workers={args.workers},"
+                        f"latency={args.latency:g},kubernetes={'stub' if args.stub else 'fake'}]"
+                    )
+                    results[case] = run_case(mode, size, args, fake)
+                    if fake is not None:
+                        fake.jobs.clear()
+    report("load", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark the cost of logging the data of a suite runner launch.
+
+Compares logging the dynamic and static data in full for every TERCC, as the suite
+starter used to, against a structured record with a truncated TERCC, and against a
+launch that is not sampled by the log sampler. Records are formatted as JSON by the
+ETOS log formatter and written to a stream that discards them.
+
+    python -m benchmarks.bench_logging [--sizes 10,1000] [--iterations 500]
+"""
+
+import argparse
+import io
+import logging
+
+from etos_lib.logging.formatter import EtosLogFormatter
+
+from suite_starter.logs import SUITE_ID, SuiteLogSampler, truncate
+from suite_starter.scheduler import RateLimit
+
+from .common import CONFIGURATION, dynamic_data, measure, report, tercc
+
+
+class NullStream(io.TextIOBase):
+    """Stream that discards everything written to it."""
+
+    def write(self, s: str) -> int:
+        """Discard a string."""
+        return len(s)
+
+
+def cases(logger: logging.Logger, sampler: SuiteLogSampler, data: dict) -> dict:
+    """Create the functions that log the data of a launch in each way."""
+    payload = data["EiffelTestExecutionRecipeCollectionCreatedEvent"]
+    suite_ids = iter(range(10**9))
+
+    def full():
+        logger.info("Dynamic data: %r", data)
+        logger.info("Static data: %r", CONFIGURATION)
+
+    def structured():
+        logger.info(
+            "Dynamic data for ESR",
+            extra={
+                SUITE_ID: data["suite_id"],
+                "job_name": data["job_name"],
+                "tercc": truncate(payload, 256),
+                "tercc_size": len(payload),
+            },
+        )
+
+    def sampled_out():
+        if sampler.sampled(str(next(suite_ids))):
+            structured()
+
+    return {"full": full, "structured": structured, "sampled_out": sampled_out}
+
+
+def main():
+    """Run the logging benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10,1000", help="Number of recipes per TERCC")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    logger = logging.getLogger("benchmark")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler(NullStream())
+    handler.setFormatter(EtosLogFormatter())
+    logger.addHandler(handler)
+    # Nearly no suites are sampled after the first one.
+    sampler = SuiteLogSampler(RateLimit(0.001))
+
+    results = {}
+    for size in (int(size) for size in args.sizes.split(",")):
+        data = dynamic_data(tercc(recipes=size))
+        kib = len(data["EiffelTestExecutionRecipeCollectionCreatedEvent"]) // 1024
+        for case, function in cases(logger, sampler, data).items():
+            results[f"{case}[tercc_kib={kib}]"] = measure(function, args.iterations)
+    report("logging", results)
+
+
+if __name__ == "__main__":
+    main()
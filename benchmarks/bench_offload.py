@@ -0,0 +1,109 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark passing large TERCCs to the suite runner.
+
+Compares embedding the TERCC in the environment of every container in the job against
+storing it compressed in a ConfigMap and passing a reference, for synthetic TERCCs of
+1 MB and 10 MB. Measures the time to build the requests, their total size and the peak
+memory allocated, as sent by the Kubernetes client. The API calls themselves are not
+made.
+
+    python -m benchmarks.bench_offload [--sizes 1,10] [--iterations 10]
+"""
+
+import argparse
+import json
+from unittest.mock import MagicMock
+
+from kubernetes import client
+
+from suite_starter.offload import REFERENCE, TerccStore
+from suite_starter.suite_starter import SuiteStarter
+from suite_starter.template import SuiteRunnerTemplate
+
+from .common import CONFIGURATION, ESR_TEMPLATE, dynamic_data, measure, report, tercc
+
+# Number of bytes that each recipe adds to a serialized TERCC, roughly.
+RECIPE_SIZE = 190
+
+
+def bench(template: SuiteRunnerTemplate, size: int, iterations: int) -> dict:
+    """Benchmark passing a TERCC of `size` MB inline and offloaded."""
+    api_client = client.ApiClient()
+    core = MagicMock()
+    store = TerccStore(core, "etos", threshold=1)
+    event = tercc(recipes=size * 1_000_000 // RECIPE_SIZE)
+    sizes = {}
+
+    def inline():
+        data = dynamic_data(event)
+        data["EiffelTestExecutionRecipeCollectionCreatedEvent"] = json.dumps(
+            event.json, separators=(",", ":")
+        )
+        body = template.render(**data)
+        request = json.dumps(api_client.sanitize_for_serialization(body))
+        sizes["inline"] = len(request)
+        return request
+
+    def offload():
+        data = dynamic_data(event)
+        serialized = json.dumps(event.json, separators=(",", ":"))
+        data["EiffelTestExecutionRecipeCollectionCreatedEvent"] = REFERENCE
+        body = template.render(**data)
+        config_maps = store.config_maps(data["suite_id"], serialized)
+        store.mount(body, config_maps)
+        store.create(config_maps)
+        requests = [
+            json.dumps(api_client.sanitize_for_serialization(call[0][1]))
+            for call in core.create_namespaced_config_map.call_args_list
+        ]
+        core.reset_mock()
+        requests.append(json.dumps(api_client.sanitize_for_serialization(body)))
+        sizes["offload"] = sum(len(request) for request in requests)
+        return requests
+
+    tercc_size = len(json.dumps(event.json, separators=(",", ":")))
+    results = {}
+    for name, function in (("inline", inline), ("offload", offload)):
+        result = measure(function, iterations)
+        results[f"{name}[tercc={size}MB]"] = {
+            "tercc_bytes": tercc_size,
+            "request_bytes": sizes[name],
+            **result,
+        }
+    return results
+
+
+def main():
+    """Run the offload benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1,10", help="TERCC sizes in MB, comma separated")
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    template = SuiteRunnerTemplate(
+        ESR_TEMPLATE.read_text(encoding="utf-8"),
+        CONFIGURATION,
+        prune=SuiteStarter.remove_empty_configmaps,
+    )
+    results = {}
+    for size in args.sizes.split(","):
+        results.update(bench(template, int(size), args.iterations))
+    report("offload", results)
+
+
+if __name__ == "__main__":
+    main()
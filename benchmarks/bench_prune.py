@@ -0,0 +1,97 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark removing unset configmaps from suite runner jobs.
+
+Compares removing unset configmaps from every rendered job, both with the previous
+`while ... in list: list.remove` loop and with the current single pass, against
+rendering a template that had them removed when it was compiled.
+
+    python -m benchmarks.bench_prune [--sidecars 50] [--configmaps 20] [--iterations 200]
+"""
+
+import argparse
+
+from suite_starter.suite_starter import SuiteStarter
+from suite_starter.template import SuiteRunnerTemplate
+
+from .common import CONFIGURATION, dynamic_data, large_template, measure, report, tercc
+
+EMPTY_CONFIGMAP = {"configMapRef": {"name": "None"}}
+
+
+def remove_empty_configmaps_quadratic(data):
+    """Remove unset configmaps the way the suite starter used to, for comparison."""
+    if isinstance(data, dict):
+        for key, value in list(data.items()):
+            if value == EMPTY_CONFIGMAP:
+                del data[key]
+            else:
+                remove_empty_configmaps_quadratic(value)
+    elif isinstance(data, list):
+        while EMPTY_CONFIGMAP in data:
+            data.remove(EMPTY_CONFIGMAP)
+        for item in data:
+            remove_empty_configmaps_quadratic(item)
+
+
+def main():
+    """Run the prune benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sidecars", type=int, default=50)
+    parser.add_argument(
+        "--configmaps", type=int, default=20, help="Unset configmaps in each envFrom list"
+    )
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    unset = "        - configMapRef:\n            name: {etos_observability_configmap}\n"
+    text = large_template(args.sidecars).replace(
+        "        envFrom:\n", "        envFrom:\n" + unset * args.configmaps
+    )
+    template = SuiteRunnerTemplate(text, CONFIGURATION)
+    pruned = SuiteRunnerTemplate(text, CONFIGURATION, prune=SuiteStarter.remove_empty_configmaps)
+    data = dynamic_data(tercc())
+
+    def render_and_remove_quadratic():
+        body = template.render(**data)
+        remove_empty_configmaps_quadratic(body)
+        return body
+
+    def render_and_remove():
+        body = template.render(**data)
+        SuiteStarter.remove_empty_configmaps(body)
+        return body
+
+    def render_pruned():
+        return pruned.render(**data)
+
+    assert render_and_remove_quadratic() == render_pruned(), "Pruned job differs"
+    assert render_and_remove() == render_pruned(), "Pruned job differs"
+    case = f"sidecars={args.sidecars},configmaps={args.configmaps}"
+    report(
+        "prune",
+        {
+            f"render_and_remove_quadratic[{case}]": measure(
+                render_and_remove_quadratic, args.iterations
+            ),
+            f"render_and_remove[{case}]": measure(render_and_remove, args.iterations),
+            f"render_pruned[{case}]": measure(render_pruned, args.iterations),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark sharing the static environment of the suite runners in ConfigMaps.
+
+Compares the size of the job creation request, as sent by the Kubernetes client, when
+the static environment variables are in every job against when they are loaded from
+shared ConfigMaps, for the test template and a template with many sidecars. The TERCC
+is either embedded in the job or offloaded to a ConfigMap, in which case the static
+parts of the job make up most of the request.
+
+    python -m benchmarks.bench_shared [--sidecars 20] [--iterations 200]
+"""
+
+import argparse
+import json
+
+from kubernetes import client
+
+from suite_starter.offload import REFERENCE
+from suite_starter.shared import SharedEnvironment
+from suite_starter.suite_starter import SuiteStarter
+from suite_starter.template import SuiteRunnerTemplate
+
+from .common import (
+    CONFIGURATION,
+    ESR_TEMPLATE,
+    dynamic_data,
+    large_template,
+    measure,
+    report,
+    tercc,
+)
+
+
+def compile_template(text: str, shared: bool) -> SuiteRunnerTemplate:
+    """Compile a template like the suite starter does, with or without a shared environment."""
+    template = SuiteRunnerTemplate(text, CONFIGURATION, prune=SuiteStarter.remove_empty_configmaps)
+    if shared:
+        SharedEnvironment().extract(template)
+    return template
+
+
+def bench(name: str, text: str, offload: bool, iterations: int) -> dict:
+    """Benchmark rendering and serializing jobs from a template with and without sharing."""
+    api_client = client.ApiClient()
+    data = dynamic_data(tercc())
+    if offload:
+        data["EiffelTestExecutionRecipeCollectionCreatedEvent"] = REFERENCE
+    case = f"{name},tercc={'offloaded' if offload else 'embedded'}"
+    results = {}
+    for shared in (False, True):
+        template = compile_template(text, shared)
+
+        def request(template=template):
+            body = template.render(**data)
+            return json.dumps(api_client.sanitize_for_serialization(body))
+
+        results[f"{'shared' if shared else 'inline'}[{case}]"] = {
+            "request_bytes": len(request()),
+            **measure(request, iterations),
+        }
+    inline, shared = (result["request_bytes"] for result in results.values())
+    for result in results.values():
+        result["reduction"] = 1 - shared / inline
+    return results
+
+
+def main():
+    """Run the shared environment benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sidecars", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    templates = {
+        "template=esr": ESR_TEMPLATE.read_text(encoding="utf-8"),
+        f"sidecars={args.sidecars}": large_template(args.sidecars),
+    }
+    results = {}
+    for name, text in templates.items():
+        for offload in (False, True):
+            results.update(bench(name, text, offload, args.iterations))
+    report("shared", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark the time from starting a suite starter process to consuming the first TERCC.
+
+Each iteration starts a new Python process running a suite starter. A TERCC is waiting
+for it in a broker stand-in, which is the standard input of the process, and the suite
+runner job is created in a fake Kubernetes API on localhost. The time is measured from
+starting the process until the TERCC has been ACK:ed.
+
+    python -m benchmarks.bench_startup [--iterations 10]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from .common import ENVIRONMENT, ESR_TEMPLATE, measure, report, tercc
+
+KUBECONFIG = """
+apiVersion: v1
+kind: Config
+clusters:
+- name: fake
+  cluster:
+    server: {url}
+users:
+- name: fake
+  user:
+    token: fake
+contexts:
+- name: fake
+  context:
+    cluster: fake
+    user: fake
+current-context: fake
+"""
+
+
+def child():
+    """Start a suite starter, consume one TERCC from standard input and exit."""
+    start = time.perf_counter()
+    # Importing the suite starter is part of what is measured.
+    # pylint:disable=import-outside-toplevel
+    from suite_starter.subscriber import SuiteStarterSubscriber
+    from suite_starter.suite_starter import SuiteStarter
+
+    imported = time.perf_counter()
+    consumed = threading.Event()
+    result = {}
+
+    def start_subscriber(subscriber):
+        """Consume from the broker stand-in instead of connecting to RabbitMQ."""
+
+        def consume():
+            result["ack"], _ = subscriber.call(sys.stdin.buffer.readline())
+            result["first_message_ms"] = (time.perf_counter() - start) * 1000
+            consumed.set()
+
+        threading.Thread(target=consume, daemon=True).start()
+
+    with patch.object(SuiteStarterSubscriber, "start", start_subscriber):
+        SuiteStarter(str(ESR_TEMPLATE))
+    result["import_ms"] = (imported - start) * 1000
+    result["ready_ms"] = (time.perf_counter() - start) * 1000
+    consumed.wait()
+    print(json.dumps(result), flush=True)
+
+
+def main():
+    """Run the startup benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    # pylint:disable=import-outside-toplevel
+    from tests.fakes import FakeKubernetes
+
+    phases = []
+    with FakeKubernetes() as fake, tempfile.TemporaryDirectory() as directory:
+        kubeconfig = Path(directory).joinpath("kubeconfig")
+        kubeconfig.write_text(KUBECONFIG.format(url=fake.url), encoding="utf-8")
+        environment = {
+            key: value for key, value in os.environ.items() if not key.startswith("OTEL_")
+        }
+        environment.update(
+            {
+                **ENVIRONMENT,
+                "KUBECONFIG": str(kubeconfig),
+                "ETOS_NAMESPACE": "etos",
+            }
+        )
+
+        def start_and_consume():
+            message = json.dumps(tercc().json) + "\n"
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+                input=message.encode("utf-8"),
+                env=environment,
+                capture_output=True,
+                check=True,
+            ).stdout
+            phases.append(json.loads(output.splitlines()[-1]))
+
+        result = measure(start_and_consume, args.iterations)
+    assert all(phase["ack"] for phase in phases), "A TERCC was not ACK:ed"
+    for phase in ("import_ms", "ready_ms", "first_message_ms"):
+        result[f"{phase.replace('_ms', '')}_p50_ms"] = sorted(p[phase] for p in phases)[
+            len(phases) // 2
+        ]
+    report("startup", {"process_start_to_first_message": result})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark building a job body from the suite runner template.
+
+Compares formatting and parsing the template text for every TERCC against
+rendering a template that has been compiled once.
+
+    python -m benchmarks.bench_template [--sidecars 20] [--iterations 200]
+"""
+
+import argparse
+
+from etos_lib.kubernetes.jobs import Job
+
+from suite_starter.template import SuiteRunnerTemplate
+
+from .common import CONFIGURATION, dynamic_data, large_template, measure, report, tercc
+
+
+def main():
+    """Run the template benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sidecars", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    text = large_template(args.sidecars)
+    template = SuiteRunnerTemplate(text, CONFIGURATION)
+    data = dynamic_data(tercc())
+
+    def format_and_load():
+        return Job.load_yaml(text.format(**data, **CONFIGURATION))
+
+    def render():
+        return template.render(**data)
+
+    assert format_and_load() == render(), "Rendered job differs from formatted job"
+    report(
+        "template",
+        {
+            f"format_and_load[sidecars={args.sidecars}]": measure(format_and_load, args.iterations),
+            f"render[sidecars={args.sidecars}]": measure(render, args.iterations),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
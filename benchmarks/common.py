@@ -0,0 +1,152 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Common helpers for the suite starter benchmarks."""
+
+import json
+import statistics
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import Callable
+
+from eiffellib.events import EiffelTestExecutionRecipeCollectionCreatedEvent
+
+ROOT = Path(__file__).parent.parent
+ESR_TEMPLATE = ROOT.joinpath("tests", "esr_template.yaml")
+
+CONFIGURATION = {
+    "docker_image": "registry.nordix.org/eiffel/etos-suite-runner:latest",
+    "log_listener": "registry.nordix.org/eiffel/etos-log-listener:latest",
+    "etos_configmap": "etos",
+    "etos_observability_configmap": "None",
+    "etos_rabbitmq_secret": "etos-rabbitmq",
+    "ttl": "3600",
+    "termination_grace_period": "300",
+    "sidecar_image": "registry.nordix.org/eiffel/etos-sidecar:latest",
+    "otel_exporter_otlp_endpoint": "null",
+}
+
+# Environment that a suite starter is configured with in the benchmarks.
+ENVIRONMENT = {
+    "ETOS_CONFIGMAP": CONFIGURATION["etos_configmap"],
+    "SUITE_RUNNER": CONFIGURATION["docker_image"],
+    "LOG_LISTENER": CONFIGURATION["log_listener"],
+    "ETOS_RABBITMQ_SECRET": CONFIGURATION["etos_rabbitmq_secret"],
+    "ETOS_DISABLE_SENDING_EVENTS": "1",
+}
+
+SIDECAR = """
+      - name: sidecar-{index}
+        image: {{sidecar_image}}
+        imagePullPolicy: Always
+        envFrom:
+        - configMapRef:
+            name: {{etos_configmap}}
+        - configMapRef:
+            name: {{etos_observability_configmap}}
+        - secretRef:
+            name: {{etos_rabbitmq_secret}}
+        env:
+        - name: TERCC
+          value: '{{EiffelTestExecutionRecipeCollectionCreatedEvent}}'
+        - name: OTEL_CONTEXT
+          value: '{{otel_context}}'
+        - name: SIDECAR_INDEX
+          value: '{index}'
+        - name: KUBEXIT_GRAVEYARD
+          value: /graveyard
+        volumeMounts:
+        - name: graveyard
+          mountPath: /graveyard
+"""
+
+
+def large_template(sidecars: int = 20) -> str:
+    """Generate a suite runner template with many sidecar containers."""
+    template = ESR_TEMPLATE.read_text(encoding="utf-8")
+    marker = "      restartPolicy: Never"
+    extra = "".join(SIDECAR.format(index=index) for index in range(sidecars))
+    return template.replace(marker, extra.lstrip("\n") + marker)
+
+
+def tercc(recipes: int = 10) -> EiffelTestExecutionRecipeCollectionCreatedEvent:
+    """Generate a TERCC with a number of fake recipes in a single batch."""
+    event = EiffelTestExecutionRecipeCollectionCreatedEvent()
+    event.data.add("selectionStrategy", {"tracker": "Benchmark", "id": str(uuid.uuid4())})
+    event.data.add(
+        "batches",
+        [
+            {
+                "name": "benchmark",
+                "priority": 1,
+                "recipes": [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "testCase": {"id": f"test_{index}", "tracker": "Benchmark"},
+                        "constraints": [{"key": "ENVIRONMENT", "value": {"key": "value"}}],
+                    }
+                    for index in range(recipes)
+                ],
+            }
+        ],
+    )
+    event.links.add("CAUSE", str(uuid.uuid4()))
+    return event
+
+
+def dynamic_data(event: EiffelTestExecutionRecipeCollectionCreatedEvent) -> dict:
+    """Generate the dynamic template data for a TERCC."""
+    return {
+        "EiffelTestExecutionRecipeCollectionCreatedEvent": json.dumps(event.json),
+        "suite_id": event.meta.event_id,
+        "job_name": f"suite-runner-{event.meta.event_id}",
+        "otel_context": "",
+    }
+
+
+def measure(function: Callable, iterations: int) -> dict:
+    """Measure per-call time and allocations of a function.
+
+    Time is measured without tracemalloc active, since tracing allocations slows
+    down the function being measured considerably.
+    """
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p50_ms": statistics.median(timings) * 1000,
+        "p99_ms": sorted(timings)[int(len(timings) * 0.99) - 1] * 1000,
+        "peak_alloc_kib": (peak - before) / 1024,
+    }
+
+
+def report(name: str, results: dict) -> None:
+    """Print benchmark results as JSON lines, one per measured case."""
+    for case, result in results.items():
+        print(json.dumps({"benchmark": name, "case": case, **result}))
@@ -0,0 +1,206 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Replay captured TERCCs, or synthetic traffic, through the suite starter.
+
+TERCCs are published to an in-memory AMQP stand-in that the suite starter subscriber
+consumes from, with its thread pool, prefetch, flow control and NACK:ing, and jobs are
+created in a fake Kubernetes API on localhost that can be slow and fail. Configure the
+suite starter, e.g. its workers, retries and circuit breaker, with its usual environment
+variables.
+
+Captured TERCCs are read as JSON lines and published with the gaps between their
+`meta.time`, divided by `--speed`. Speed 0 publishes them all at once. Synthetic TERCCs
+are published at `--rate` per second instead.
+
+    python -m benchmarks.replay (--capture FILE [--speed 1] | --synthetic 200 [--rate 50])
+        [--latency 0.05] [--error-rate 0.1] [--error-status 503] [--record FILE]
+
+Prints the end-to-end latency from publish to ACK, redeliveries, NACKs and queue depth
+as one JSON line. With `--record`, the latency and deliveries of each TERCC are written to
+a JSON lines file.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from contextlib import ExitStack
+from http import HTTPStatus
+from typing import Iterator
+from unittest.mock import patch
+
+from etos_lib.kubernetes.jobs import Job
+from kubernetes import client
+
+from tests.fakes import FakeKubernetes, InMemoryBroker
+
+from .bench_load import ENVIRONMENT, suite_starter_for, summarize
+from .common import report, tercc
+
+
+def captured(path: str, speed: float) -> Iterator[tuple[float, bytes]]:
+    """Read captured TERCCs and the time after the first that each shall be published.
+
+    :param path: JSON lines file with one TERCC per line.
+    :param speed: How many times faster than captured to publish, or 0 for all at once.
+    """
+    first = None
+    offset = 0.0
+    with open(path, encoding="utf-8") as capture:
+        for line in capture:
+            if not line.strip():
+                continue
+            created = json.loads(line)["meta"]["time"] / 1000
+            first = created if first is None else first
+            if speed:
+                # Captures are not always in order, but TERCCs are published in order.
+                offset = max(offset, (created - first) / speed)
+            yield offset, line.strip().encode("utf-8")
+
+
+def synthetic(count: int, rate: float, recipes: int) -> Iterator[tuple[float, bytes]]:
+    """Generate TERCCs and the time after the first that each shall be published."""
+    for index in range(count):
+        body = json.dumps(tercc(recipes=recipes).json).encode("utf-8")
+        yield (index / rate if rate else 0.0), body
+
+
+class DepthSampler(threading.Thread):
+    """Sample the depth of the queue and the number of unacknowledged messages."""
+
+    def __init__(self, broker: InMemoryBroker, interval: float = 0.01):
+        """Initialize the sampler."""
+        super().__init__(name="DepthSampler", daemon=True)
+        self.broker = broker
+        self.interval = interval
+        self.ready: list[int] = []
+        self.unacked: list[int] = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        """Sample until stopped."""
+        while not self.stopped.wait(self.interval):
+            self.ready.append(self.broker.ready)
+            self.unacked.append(self.broker.unacked)
+
+    def summary(self) -> dict:
+        """Summarize the sampled depths."""
+        return {
+            "queue_depth_max": max(self.ready, default=0),
+            "queue_depth_mean": statistics.mean(self.ready) if self.ready else 0.0,
+            "unacked_max": max(self.unacked, default=0),
+        }
+
+
+def replay(suite_starter, terccs: Iterator[tuple[float, bytes]], args) -> dict:
+    """Publish TERCCs on schedule to the suite starter and wait for them to be ACK:ed.
+
+    :param suite_starter: Suite starter whose subscriber has not been started.
+    :param terccs: Time after the start to publish each TERCC at, and the TERCC.
+    :return: Summary of the replay, and the latency and deliveries of each TERCC.
+    """
+    published = 0
+    with InMemoryBroker() as broker:
+        sampler = DepthSampler(broker)
+        broker.attach(suite_starter.etos.subscriber)
+        start = time.monotonic()
+        sampler.start()
+        for offset, body in terccs:
+            time.sleep(max(start + offset - time.monotonic(), 0))
+            broker.publish(body)
+            published += 1
+        completed = broker.wait(published, timeout=args.timeout)
+        elapsed = time.monotonic() - start
+        sampler.stopped.set()
+    events = [
+        {
+            "suite_id": json.loads(body)["meta"]["id"],
+            "latency_ms": latency * 1000,
+            "deliveries": broker.deliveries[body],
+        }
+        for body, latency in broker.acked
+    ]
+    result = {"published": published, "completed": completed}
+    if events:
+        result.update(summarize([event["latency_ms"] / 1000 for event in events], elapsed))
+    result.update(
+        {
+            "rejected": len(broker.rejected),
+            "nacked": broker.requeued,
+            "redelivered": sum(1 for count in broker.deliveries.values() if count > 1),
+            **sampler.summary(),
+        }
+    )
+    return {"summary": result, "events": events}
+
+
+def main():
+    """Replay TERCCs through the suite starter."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--capture", help="JSON lines file with captured TERCCs")
+    source.add_argument("--synthetic", type=int, help="Number of synthetic TERCCs")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed, 0 for no gaps")
+    parser.add_argument("--rate", type=float, default=0, help="Synthetic TERCCs per second")
+    parser.add_argument("--recipes", type=int, default=10, help="Recipes per synthetic TERCC")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds to create a job")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of failed creates")
+    parser.add_argument("--error-status", type=int, default=HTTPStatus.SERVICE_UNAVAILABLE)
+    parser.add_argument("--retry-after", help="Retry-After header of failed creates")
+    parser.add_argument("--seed", type=int, help="Seed for the failed creates")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for ACKs")
+    parser.add_argument("--record", help="JSON lines file to record each TERCC in")
+    args = parser.parse_args()
+    # Logging every TERCC, and every injected fault, would both slow down the suite starter
+    # and garble the results.
+    logging.disable(logging.WARNING)
+
+    if args.capture:
+        terccs = captured(args.capture, args.speed)
+        case = f"capture[{os.path.basename(args.capture)},speed={args.speed:g}]"
+    else:
+        terccs = synthetic(args.synthetic, args.rate, args.recipes)
+        case = f"synthetic[count={args.synthetic},rate={args.rate:g},recipes={args.recipes}]"
+    case = f"{case}[latency={args.latency:g},error_rate={args.error_rate:g}]"
+    with ExitStack() as stack:
+        stack.enter_context(patch.dict(os.environ, {**ENVIRONMENT, **os.environ}))
+        fake = stack.enter_context(FakeKubernetes(latency=args.latency))
+        if args.error_rate:
+            fake.fail_randomly(
+                HTTPStatus(args.error_status), args.error_rate, args.retry_after, args.seed
+            )
+        configuration = fake.configuration()
+        stack.enter_context(
+            patch.object(
+                Job, "_load_config", lambda _: client.Configuration.set_default(configuration)
+            )
+        )
+        result = replay(suite_starter_for("threaded"), terccs, args)
+        result["summary"]["kubernetes_requests"] = fake.requests
+    if args.record:
+        with open(args.record, "w", encoding="utf-8") as record:
+            for event in result["events"]:
+                record.write(json.dumps(event) + "\n")
+    report("replay", {case: result["summary"]})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Admission control of suite runner jobs, based on the number of active suite runners."""
+
+import logging
+import threading
+from http import HTTPStatus
+from typing import Optional
+
+from kubernetes import client, watch  # pylint:disable=no-name-in-module
+
+from .launched import JOB_NAME_PREFIX
+from .metrics import ACTIVE_SUITE_RUNNERS, ADMISSION_TIMEOUTS
+
+LOGGER = logging.getLogger(__name__)
+
+LABEL_SELECTOR = "app=suite-runner"
+# Conditions that a job has when it will not run any more pods.
+FINISHED = ("Complete", "Failed")
+
+
+class AdmissionTimeout(Exception):
+    """A suite runner was not admitted before the admission timeout."""
+
+
+def _active(job: client.V1Job) -> bool:
+    """Check whether a suite runner job is active, i.e. has not finished."""
+    if not job.metadata.name.startswith(JOB_NAME_PREFIX):
+        return False
+    conditions = (job.status and job.status.conditions) or []
+    return not any(
+        condition.type in FINISHED and condition.status == "True" for condition in conditions
+    )
+
+
+class AdmissionControl:  # pylint:disable=too-many-instance-attributes
+    """Limit the number of active suite runner jobs in the cluster.
+
+    The active suite runner jobs are cached by listing them once and then watching them
+    in a background thread, like a Kubernetes informer, so admitting a suite runner does
+    not call the Kubernetes API. When the watch expires, the jobs are listed again.
+
+    A suite runner is admitted when the number of active jobs, plus the number of suite
+    runners that have been admitted but not yet launched, is below the ceiling. Otherwise
+    :meth:`reserve` waits for jobs to finish, for up to `timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        batch_v1: client.BatchV1Api,
+        namespace: str,
+        ceiling: int,
+        timeout: float,
+        watch_timeout: int = 300,
+    ):
+        """Initialize admission control.
+
+        :param batch_v1: Kubernetes batch API to list and watch jobs with.
+        :param namespace: Namespace that suite runner jobs are created in.
+        :param ceiling: Maximum number of active suite runner jobs.
+        :param timeout: Seconds to wait for a suite runner to be admitted.
+        :param watch_timeout: Seconds to watch for before restarting the watch.
+        """
+        if ceiling < 1:
+            raise ValueError(
+                f"Maximum number of active suite runners must be at least 1, was {ceiling}"
+            )
+        self.batch_v1 = batch_v1
+        self.namespace = namespace
+        self.ceiling = ceiling
+        self.timeout = timeout
+        self.watch_timeout = watch_timeout
+        self.__condition = threading.Condition()
+        self.__active: set[str] = set()
+        self.__reserved = 0
+        self.__synced = False
+        self.__stop = threading.Event()
+        self.__watch = watch.Watch()
+        self.__thread = threading.Thread(target=self._run, name="AdmissionControl", daemon=True)
+
+    def start(self):
+        """Start caching the active suite runner jobs."""
+        LOGGER.info("Launching suite runners while fewer than %d are active", self.ceiling)
+        self.__thread.start()
+
+    def stop(self):
+        """Stop caching the active suite runner jobs, once the current watch returns."""
+        self.__stop.set()
+        self.__watch.stop()
+
+    def __len__(self) -> int:
+        """Get the number of active suite runner jobs."""
+        with self.__condition:
+            return len(self.__active)
+
+    def _run(self):
+        """List and watch suite runner jobs until stopped."""
+        while not self.__stop.is_set():
+            # The jobs are listed again every time the watch times out, which corrects the
+            # cache for suite runners that were counted as active when they were launched
+            # but had already been seen to finish.
+            try:
+                self._watch(self._list())
+            except Exception as exception:  # pylint:disable=broad-exception-caught
+                # A watch that has expired is not an error, list the jobs again.
+                if getattr(exception, "status", None) != HTTPStatus.GONE:
+                    LOGGER.exception("Failed to watch suite runner jobs")
+                    self.__stop.wait(1.0)
+
+    def _list(self) -> str:
+        """List the suite runner jobs and replace the cache with the active ones.
+
+        :return: Resource version to watch for changes from.
+        """
+        jobs = self.batch_v1.list_namespaced_job(self.namespace, label_selector=LABEL_SELECTOR)
+        with self.__condition:
+            self.__active = {job.metadata.name for job in jobs.items if _active(job)}
+            self.__synced = True
+            self._update()
+        LOGGER.info("%d suite runners are active", len(self.__active))
+        return jobs.metadata.resource_version
+
+    def _watch(self, resource_version: str):
+        """Update the cache with changes to suite runner jobs until the watch times out.
+
+        :param resource_version: Resource version to watch for changes from.
+        """
+        for event in self.__watch.stream(
+            self.batch_v1.list_namespaced_job,
+            self.namespace,
+            label_selector=LABEL_SELECTOR,
+            resource_version=resource_version,
+            timeout_seconds=self.watch_timeout,
+        ):
+            job = event["object"]
+            with self.__condition:
+                if event["type"] != "DELETED" and _active(job):
+                    self.__active.add(job.metadata.name)
+                else:
+                    self.__active.discard(job.metadata.name)
+                self._update()
+
+    def _update(self):
+        """Wake up waiting suite runners. Must be called with the lock held."""
+        ACTIVE_SUITE_RUNNERS.set(len(self.__active))
+        self.__condition.notify_all()
+
+    def reserve(self):
+        """Wait until a suite runner can be launched and reserve room for it.
+
+        :raises AdmissionTimeout: If there was no room within the timeout.
+        """
+        with self.__condition:
+            if not self.__condition.wait_for(
+                lambda: self.__synced and len(self.__active) + self.__reserved < self.ceiling,
+                self.timeout,
+            ):
+                ADMISSION_TIMEOUTS.inc()
+                raise AdmissionTimeout(
+                    f"{len(self.__active)} suite runners are active and {self.__reserved} are "
+                    f"being launched, which is the maximum of {self.ceiling}"
+                )
+            self.__reserved += 1
+
+    def release(self, job_name: Optional[str]):
+        """Release the room reserved for a suite runner.
+
+        :param job_name: Name of the job that was launched, which is counted as active
+                         until it is seen to finish, or None if no job was launched.
+        """
+        with self.__condition:
+            self.__reserved -= 1
+            if job_name is not None:
+                self.__active.add(job_name)
+            self._update()
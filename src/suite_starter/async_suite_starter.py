@@ -0,0 +1,309 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS suite starter running on an asyncio event loop.
+
+Requires the optional dependencies in the `asyncio` extra, `aio-pika` and
+`kubernetes_asyncio`, which are imported when the suite starter is served.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+from contextvars import ContextVar
+from typing import Optional
+
+import eiffellib.events
+from etos_lib.lib.exceptions import SubscriberConfigurationMissing
+from opentelemetry import context, propagate
+
+from .metrics import IN_FLIGHT, TERCCS_NACKED
+from .subscriber import DrainReport, FlowControl
+from .suite_starter import SuiteStarter
+
+LOGGER = logging.getLogger(__name__)
+TERCC = "EiffelTestExecutionRecipeCollectionCreatedEvent"
+# Suite ID that the log messages of the current task are tagged with. Each task that
+# handles a TERCC runs in a copy of the context, so the ID is set per task.
+IDENTIFIER: ContextVar[Optional[str]] = ContextVar("identifier", default=None)
+
+
+def _identify_records():
+    """Tag log records with the suite ID of the task that created them.
+
+    The ETOS logging identifier is thread-local, and would be shared by all tasks on the
+    event loop, so it is never set in asyncio mode. The ETOS log filter only sets the
+    identifier of records that do not already have one.
+    """
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "identifies", False):
+        return
+
+    def record_factory(*args, **kwargs) -> logging.LogRecord:
+        record = factory(*args, **kwargs)
+        identifier = IDENTIFIER.get()
+        if identifier is not None:
+            record.identifier = identifier
+        return record
+
+    record_factory.identifies = True
+    logging.setLogRecordFactory(record_factory)
+
+
+class AsyncSuiteStarter(SuiteStarter):
+    """Suite starter that consumes TERCCs and creates jobs on an asyncio event loop.
+
+    Instead of a thread per TERCC, each TERCC is handled by an asyncio task, which means
+    that the number of workers can be much larger than in the threaded suite starter.
+    At most `SUITE_STARTER_WORKERS` TERCCs are prefetched from RabbitMQ and handled
+    concurrently. The prefetch count can be changed with `SUITE_STARTER_PREFETCH`.
+
+    Log messages are tagged with the suite ID of the task that logged them through a
+    context variable, instead of the thread-local ETOS logging identifier.
+    """
+
+    workers = 10
+    pool_size = 10
+    flow_control = FlowControl(prefetch=10)
+    namespace = None
+    batch_v1 = None
+    stopping = None
+
+    def _kubernetes_client(self, pool_size: int):
+        """Do not create a threaded Kubernetes client, an async client is created in `serve`."""
+        self.pool_size = pool_size
+
+    @staticmethod
+    def _identify(suite_id: str):
+        """Tag the log messages of the current task with a suite ID."""
+        IDENTIFIER.set(suite_id)
+
+    def _tercc_store(self, threshold: int):
+        """Do not store TERCCs out of band, it is not supported in asyncio mode."""
+        if threshold:
+            LOGGER.warning("Storing large TERCCs in ConfigMaps is not supported in asyncio mode")
+
+    @staticmethod
+    def _shared_environment():
+        """Do not share the static environment of the suite runners, not supported in asyncio."""
+        if os.getenv("SUITE_STARTER_SHARED_ENVIRONMENT", "false").lower() == "true":
+            LOGGER.warning("Sharing the suite runner environment is not supported in asyncio mode")
+
+    def _fair_scheduler(self):
+        """Do not schedule launches fairly, it is not supported in asyncio mode."""
+        if os.getenv("SUITE_STARTER_SCHEDULER_CONCURRENCY", "0") != "0":
+            LOGGER.warning(
+                "Fair scheduling of suite runner launches is not supported in asyncio mode"
+            )
+
+    def _admission_control(self, ceiling: int):
+        """Do not limit the number of active suite runners, it is not supported in asyncio mode."""
+        if ceiling:
+            LOGGER.warning("Admission control of suite runners is not supported in asyncio mode")
+
+    def _circuit_breaker(self, threshold: int):
+        """Do not hold consumption while the Kubernetes API is down, not supported in asyncio."""
+        if threshold:
+            LOGGER.warning("The Kubernetes API circuit breaker is not supported in asyncio mode")
+
+    def _start_subscriber(self, workers: int, flow_control: FlowControl):
+        """Do not start the threaded subscriber, messages are consumed in `serve`."""
+        if flow_control.max_in_flight:
+            LOGGER.warning(
+                "Limiting the TERCCs in flight is not supported in asyncio mode, "
+                "they are limited by the prefetch count"
+            )
+        self.workers = workers
+        self.flow_control = flow_control
+
+    async def _async_kubernetes_client(self):
+        """Create the async Kubernetes job client that is shared by all suite runner launches."""
+        # Optional dependency. pylint:disable=import-outside-toplevel
+        from kubernetes_asyncio import client, config
+
+        if os.getenv("DOCKER_CONTEXT"):
+            config.load_incluster_config()
+        else:
+            await config.load_kube_config()
+        configuration = client.Configuration.get_default_copy()
+        configuration.connection_pool_maxsize = self.pool_size
+        return client.BatchV1Api(client.ApiClient(configuration))
+
+    async def serve(self):
+        """Connect to RabbitMQ and Kubernetes and launch suite runners forever."""
+        # Optional dependency. pylint:disable=import-outside-toplevel
+        import aio_pika
+
+        rabbitmq = self.etos.config.get("rabbitmq_subscriber")
+        if not rabbitmq:
+            raise SubscriberConfigurationMissing
+        self.namespace = os.getenv("ETOS_NAMESPACE")
+        self.batch_v1 = await self._async_kubernetes_client()
+        parameters = {"host": rabbitmq["host"], "port": rabbitmq["port"], "ssl": rabbitmq["ssl"]}
+        if rabbitmq["username"] and rabbitmq["password"]:
+            parameters["login"] = rabbitmq["username"]
+            parameters["password"] = rabbitmq["password"]
+        if rabbitmq["vhost"]:
+            parameters["virtualhost"] = rabbitmq["vhost"]
+        connection = await aio_pika.connect_robust(**parameters)
+        async with connection, self.batch_v1.api_client:
+            channel = await connection.channel()
+            await channel.set_qos(prefetch_count=self.flow_control.prefetch)
+            queue = await channel.declare_queue(
+                rabbitmq["queue"], **(rabbitmq["queue_params"] or {})
+            )
+            await queue.bind(rabbitmq["exchange"], routing_key=rabbitmq["routing_key"])
+            LOGGER.info("Suite starter is running and listening to events in the Eiffel context.")
+            loop = asyncio.get_running_loop()
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(signum, self.stop)
+            self._ready()
+            report = await self.consume(queue)
+        # Messages that were not ACK:ed are returned to the queue when the connection closes.
+        LOGGER.info(
+            "Drained: %d launches finished, %d TERCCs requeued, %d launches abandoned",
+            *report,
+        )
+
+    async def consume(self, queue) -> DrainReport:
+        """Consume messages from a queue, handling at most `workers` messages concurrently.
+
+        Consumes until the queue is closed, or until :meth:`stop` is called, after which the
+        launches in flight are given `SUITE_STARTER_DRAIN_TIMEOUT` seconds to finish.
+
+        :param queue: Queue to consume from. Anything with an async `iterator()` yielding
+                      messages that can be ACK:ed, NACK:ed and rejected, like an
+                      :obj:`aio_pika.abc.AbstractQueue`.
+        :return: What happened to the messages in flight when consuming stopped.
+        """
+        _identify_records()
+        in_flight = asyncio.Semaphore(self.workers)
+        tasks = set()
+        requeued = 0
+
+        def done(task):
+            tasks.discard(task)
+            in_flight.release()
+            IN_FLIGHT.dec()
+
+        async def receive():
+            nonlocal requeued
+            async with queue.iterator() as messages:
+                async for message in messages:
+                    IN_FLIGHT.inc()
+                    try:
+                        await in_flight.acquire()
+                    except asyncio.CancelledError:
+                        IN_FLIGHT.dec()
+                        requeued += 1
+                        await message.nack(requeue=True)
+                        raise
+                    task = asyncio.create_task(self._handle(message))
+                    tasks.add(task)
+                    task.add_done_callback(done)
+
+        if self.stopping is None:
+            self.stopping = asyncio.Event()
+        receiver = asyncio.create_task(receive())
+        stopping = asyncio.create_task(self.stopping.wait())
+        await asyncio.wait((receiver, stopping), return_when=asyncio.FIRST_COMPLETED)
+        if not stopping.done():
+            stopping.cancel()
+            receiver.result()
+            if tasks:
+                await asyncio.wait(tasks)
+            return DrainReport()
+        LOGGER.info("Shutting down, draining for at most %.1fs", self.drain_timeout)
+        receiver.cancel()
+        await asyncio.gather(receiver, return_exceptions=True)
+        if not tasks:
+            return DrainReport(requeued=requeued)
+        finished, abandoned = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        for task in abandoned:
+            task.cancel()
+        return DrainReport(len(finished), requeued, len(abandoned))
+
+    def stop(self):
+        """Stop consuming messages and drain the messages in flight."""
+        if self.stopping is None:
+            self.stopping = asyncio.Event()
+        self.stopping.set()
+
+    @staticmethod
+    def _event(body: bytes):
+        """Rebuild an Eiffel event from a message body."""
+        json_data = json.loads(body.decode("utf-8"))
+        meta = json_data.get("meta", {})
+        event = getattr(eiffellib.events, meta.get("type"))(meta.get("version"))
+        event.rebuild(json_data)
+        return event
+
+    async def _handle(self, message):
+        """Handle a single message, ACK:ing it only when its suite runner has been launched."""
+        try:
+            event = self._event(message.body)
+        except Exception:  # pylint:disable=broad-exception-caught
+            LOGGER.exception("Unable to deserialize message, rejecting: %r", message.body)
+            await message.reject(requeue=False)
+            return
+        if event.meta.type != TERCC:
+            await message.ack()
+            return
+        self._received(event)
+        if self._launched(event):
+            self._acked(event)
+            await message.ack()
+            return
+        token = context.attach(propagate.extract(message.headers or {}))
+        try:
+            ack = await self.suite_runner_callback(event, None)
+        except Exception:  # pylint:disable=broad-exception-caught
+            LOGGER.exception("Failed to launch a suite runner for %r", event.meta.event_id)
+            ack = False
+        finally:
+            context.detach(token)
+        if ack:
+            self._acked(event)
+            await message.ack()
+        else:
+            TERCCS_NACKED.inc()
+            await message.nack(requeue=True)
+
+    async def suite_runner_callback(self, event, _):  # pylint:disable=invalid-overridden-method
+        """Start a suite runner on a TERCC event.
+
+        :param event: EiffelTestExecutionRecipeCollectionCreatedEvent (TERCC)
+        :type event: :obj: `eiffellib.events.base_event.EiffelTestExecutionRecipeCollectionCreatedEvent`  # noqa pylint:disable=line-too-long
+        :return: Whether event was ACK:ed or not.
+        :rtype: bool
+        """
+        with self._launch_context(event) as job:
+            await self.retry.call_async(
+                lambda: self.batch_v1.create_namespaced_job(
+                    self.namespace, body=job.body, _request_timeout=self.request_timeout
+                )
+            )
+        return True
+
+    def run(self):
+        """Run the suite starter on an asyncio event loop."""
+        self._start_metrics_server()
+        self._start_template_watcher()
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            LOGGER.info("Suite starter was stopped.")
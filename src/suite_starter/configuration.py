@@ -0,0 +1,122 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Static configuration of the suite runner templates."""
+
+import os
+import string
+from types import MappingProxyType
+from typing import Iterable, Mapping, NamedTuple, Optional
+
+# Environment variable that each field of the configuration is loaded from.
+ENVIRONMENT = {
+    "docker_image": "SUITE_RUNNER",
+    "log_listener": "LOG_LISTENER",
+    "etos_configmap": "ETOS_CONFIGMAP",
+    "etos_observability_configmap": "ETOS_OBSERVABILITY_CONFIGMAP",
+    "etos_rabbitmq_secret": "ETOS_RABBITMQ_SECRET",
+    "ttl": "ETOS_ESR_TTL",
+    "termination_grace_period": "ETOS_TERMINATION_GRACE_PERIOD",
+    "sidecar_image": "ETOS_SIDECAR_IMAGE",
+    "otel_exporter_otlp_endpoint": "OTEL_EXPORTER_OTLP_ENDPOINT",
+}
+# Fields that templates may use without them being set. References to ConfigMaps with the
+# name "None" are removed from the templates.
+OPTIONAL = frozenset({"etos_configmap", "etos_observability_configmap"})
+
+
+def template_fields(template: str) -> set[str]:
+    """Get the names of the fields that a template is formatted with.
+
+    :param template: Suite runner template text.
+    :return: Names of the fields, without attribute and index lookups.
+    """
+    return {
+        field.split(".")[0].split("[")[0]
+        for _, field, _, _ in string.Formatter().parse(template)
+        if field
+    }
+
+
+class SuiteRunnerConfiguration(NamedTuple):
+    """Static configuration that the suite runner templates are formatted with.
+
+    Loaded from the environment and validated once, when the suite starter starts, and
+    validated against each template when it is compiled. Values that are not set are
+    formatted as "None", which is only allowed for the `OPTIONAL` ConfigMap references,
+    since ConfigMap references with the name "None" are removed from the templates.
+    """
+
+    docker_image: str
+    log_listener: Optional[str] = None
+    etos_configmap: Optional[str] = None
+    etos_observability_configmap: Optional[str] = None
+    etos_rabbitmq_secret: Optional[str] = None
+    ttl: str = "3600"
+    termination_grace_period: str = "300"
+    sidecar_image: Optional[str] = None
+    otel_exporter_otlp_endpoint: str = "null"
+
+    @classmethod
+    def from_environment(cls) -> "SuiteRunnerConfiguration":
+        """Load and validate the configuration from environment variables.
+
+        :raises ValueError: If SUITE_RUNNER is not set, or if a number is not a number.
+        """
+        docker_image = os.getenv("SUITE_RUNNER")
+        if not docker_image:
+            raise ValueError("SUITE_RUNNER must be set to the suite runner image")
+        configuration = cls(
+            docker_image=docker_image,
+            log_listener=os.getenv("LOG_LISTENER"),
+            etos_configmap=os.getenv("ETOS_CONFIGMAP"),
+            etos_observability_configmap=os.getenv("ETOS_OBSERVABILITY_CONFIGMAP"),
+            etos_rabbitmq_secret=os.getenv("ETOS_RABBITMQ_SECRET"),
+            ttl=os.getenv("ETOS_ESR_TTL", "3600"),
+            termination_grace_period=os.getenv("ETOS_TERMINATION_GRACE_PERIOD", "300"),
+            sidecar_image=os.getenv("ETOS_SIDECAR_IMAGE"),
+            otel_exporter_otlp_endpoint=os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") or "null",
+        )
+        for name, value in (
+            ("ETOS_ESR_TTL", configuration.ttl),
+            ("ETOS_TERMINATION_GRACE_PERIOD", configuration.termination_grace_period),
+        ):
+            if not value.isdigit():
+                raise ValueError(f"{name} must be a number of seconds, was {value!r}")
+        return configuration
+
+    def validate(self, fields: Iterable[str], overlay: Optional[Mapping[str, str]] = None):
+        """Validate that the configuration has a value for every field that a template uses.
+
+        :param fields: Fields that the template uses, see :func:`template_fields`.
+        :param overlay: Configuration that overrides this configuration for the template.
+        :raises ValueError: If a field that is not optional has no value.
+        """
+        values = {**self.mapping(), **(overlay or {})}
+        missing = sorted(
+            field
+            for field in fields
+            if field in values and field not in OPTIONAL and values[field] is None
+        )
+        if missing:
+            names = ", ".join(ENVIRONMENT.get(field, field) for field in missing)
+            raise ValueError(
+                f"{names} must be set, the suite runner template uses "
+                + ", ".join(f"{{{field}}}" for field in missing)
+            )
+
+    def mapping(self) -> Mapping[str, Optional[str]]:
+        """Get the configuration as a read-only mapping, to format templates with."""
+        return MappingProxyType(self._asdict())  # pylint:disable=no-member
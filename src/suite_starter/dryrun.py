@@ -0,0 +1,263 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Render suite runner jobs from TERCCs without RabbitMQ or Kubernetes.
+
+TERCCs are read as JSON lines from a file, or from stdin, and rendered into suite runner
+job manifests by the same pipeline as the suite starter, from the suite runner template,
+or the routes in SUITE_STARTER_TEMPLATE_ROUTES, and the configuration in the environment.
+The manifests are written to stdout as YAML documents, or to a directory with one file
+per job. With SUITE_STARTER_SHARED_ENVIRONMENT, the ConfigMaps that the jobs load their
+shared environment from are written first. Timing statistics per stage are written to
+stderr as JSON.
+
+    python -m suite_starter.dryrun [--template PATH] [--input FILE] [--output DIR]
+        [--format yaml|json] [--jobs N]
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import yaml
+from eiffellib.events import EiffelTestExecutionRecipeCollectionCreatedEvent
+from opentelemetry import trace
+
+from .configuration import SuiteRunnerConfiguration
+from .logs import SuiteLogSampler
+from .suite_starter import SuiteStarter
+
+LOGGER = logging.getLogger(__name__)
+TERCC = "EiffelTestExecutionRecipeCollectionCreatedEvent"
+STAGES = ("parse", "render", "serialize")
+# Safe dumper, backed by libyaml when it is available.
+DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+# Suite starter of each worker process, created by `_initialize`.
+_WORKER: Optional["DryRunSuiteStarter"] = None
+
+
+class Rendered(NamedTuple):
+    """A job manifest rendered from a TERCC, or the error that it could not be rendered for."""
+
+    line: int
+    job_name: Optional[str]
+    manifest: Optional[str]
+    timings: dict[str, float]
+    error: Optional[str] = None
+
+
+class DryRunSuiteStarter(SuiteStarter):  # pylint:disable=too-many-instance-attributes
+    """Suite starter that only renders jobs, without connecting to RabbitMQ or Kubernetes."""
+
+    # pylint:disable-next=super-init-not-called
+    def __init__(self, suite_runner_template_path: str, output_format: str = "yaml"):
+        """Load the configuration and compile the templates like the suite starter does.
+
+        :param suite_runner_template_path: Path to the suite runner template. Not used if
+                                           SUITE_STARTER_TEMPLATE_ROUTES is set.
+        :param output_format: Format of the rendered manifests, "yaml" or "json".
+        """
+        self.output_format = output_format
+        self.log_field_limit = int(os.getenv("SUITE_STARTER_LOG_FIELD_LIMIT", "256"))
+        self.log_sampler = SuiteLogSampler.from_environment()
+        self.configuration = SuiteRunnerConfiguration.from_environment()
+        self.suite_runner_template_path = suite_runner_template_path
+        self.template_routes = os.getenv("SUITE_STARTER_TEMPLATE_ROUTES")
+        # The shared environment is extracted like in the suite starter and its ConfigMaps
+        # are written together with the jobs, instead of being created.
+        self.shared_environment = self._shared_environment()
+        self.suite_runner_template, self.router = self._compile_templates()
+        self.tercc_store = None
+        self.tracer = trace.get_tracer(__name__)
+
+    def render(self, line: int, text: str) -> Rendered:
+        """Render the job manifest of a TERCC.
+
+        :param line: Line number of the TERCC in the input.
+        :param text: The TERCC, as JSON.
+        :return: The rendered manifest and the time spent in each stage.
+        """
+        timings = {}
+        try:
+            start = time.perf_counter()
+            data = json.loads(text)
+            if data.get("meta", {}).get("type") != TERCC:
+                raise ValueError(f"Not a TERCC: {data.get('meta', {}).get('type')!r}")
+            event = EiffelTestExecutionRecipeCollectionCreatedEvent(data["meta"].get("version"))
+            event.rebuild(data)
+            timings["parse"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            job = self._build_job(event, trace.INVALID_SPAN)
+            timings["render"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            manifest = self.serialize(job.body)
+            timings["serialize"] = time.perf_counter() - start
+        except Exception as exception:  # pylint:disable=broad-exception-caught
+            return Rendered(line, None, None, timings, f"{type(exception).__name__}: {exception}")
+        return Rendered(line, job.name, manifest, timings)
+
+    def serialize(self, body: dict) -> str:
+        """Serialize a manifest in the output format."""
+        if self.output_format == "json":
+            return json.dumps(body)
+        return yaml.dump(body, Dumper=DUMPER, sort_keys=False)
+
+    def shared(self) -> list[Rendered]:
+        """Render the ConfigMaps with the shared environment that the jobs load, if enabled.
+
+        The suite starter creates them when it loads the templates, so they must be applied
+        together with the jobs.
+        """
+        if self.shared_environment is None:
+            return []
+        return [
+            Rendered(0, body["metadata"]["name"], self.serialize(body), {})
+            for body in self.shared_environment.manifests()
+        ]
+
+
+def _initialize(suite_runner_template_path: str, output_format: str):
+    """Compile the templates in a worker process."""
+    global _WORKER  # pylint:disable=global-statement
+    logging.getLogger("suite_starter").setLevel(logging.WARNING)
+    _WORKER = DryRunSuiteStarter(suite_runner_template_path, output_format)
+
+
+def _render(item: tuple[int, str]) -> Rendered:
+    """Render a TERCC in a worker process."""
+    return _WORKER.render(*item)
+
+
+def read(lines: Iterable[str]) -> Iterator[tuple[int, str]]:
+    """Yield the line number and text of each non-empty line."""
+    for number, line in enumerate(lines, start=1):
+        if line.strip():
+            yield number, line
+
+
+def summarize(results: list[Rendered], elapsed: float, jobs: int) -> dict:
+    """Summarize the time spent in each stage of rendering the TERCCs.
+
+    :param results: The rendered TERCCs.
+    :param elapsed: Seconds that rendering all TERCCs took.
+    :param jobs: Number of worker processes.
+    :return: Throughput and timing statistics per stage, in milliseconds.
+    """
+    rendered = [result for result in results if result.error is None]
+    summary = {
+        "terccs": len(results),
+        "failed": len(results) - len(rendered),
+        "jobs": jobs,
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(rendered) / elapsed if elapsed else 0.0,
+    }
+    for stage in STAGES:
+        timings = sorted(result.timings[stage] for result in rendered)
+        if not timings:
+            continue
+        summary[stage] = {
+            "mean_ms": statistics.mean(timings) * 1000,
+            "p50_ms": statistics.median(timings) * 1000,
+            "p99_ms": timings[max(int(len(timings) * 0.99) - 1, 0)] * 1000,
+            "max_ms": timings[-1] * 1000,
+            "total_s": sum(timings),
+        }
+    return summary
+
+
+def write(result: Rendered, output: Optional[Path], output_format: str):
+    """Write a rendered manifest to a directory, or to stdout."""
+    if output is not None:
+        suffix = "json" if output_format == "json" else "yaml"
+        output.joinpath(f"{result.job_name}.{suffix}").write_text(result.manifest, "utf-8")
+    elif output_format == "json":
+        sys.stdout.write(result.manifest + "\n")
+    else:
+        sys.stdout.write("---\n" + result.manifest)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Render suite runner jobs from TERCCs.
+
+    :param argv: Command line arguments. Defaults to `sys.argv`.
+    :return: Exit code, 1 if any TERCC could not be rendered.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--template", default="/app/suite_runner_template.yaml")
+    parser.add_argument("--input", help="JSON lines file with TERCCs. Defaults to stdin.")
+    parser.add_argument("--output", type=Path, help="Directory to write the jobs to.")
+    parser.add_argument("--format", choices=("yaml", "json"), default="yaml")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Worker processes.")
+    parser.add_argument("--chunksize", type=int, default=16)
+    args = parser.parse_args(argv)
+    # The manifests are written to stdout, so the logs must not be.
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler) and handler.stream is sys.stdout:
+            handler.setStream(sys.stderr)
+    if args.output is not None:
+        args.output.mkdir(parents=True, exist_ok=True)
+
+    # Compile the templates here first, so that an invalid template fails before any input
+    # is read and before any workers are started.
+    _initialize(args.template, args.format)
+    for result in _WORKER.shared():
+        write(result, args.output, args.format)
+    with open(args.input, encoding="utf-8") if args.input else sys.stdin as lines:
+        items = read(lines)
+        start = time.perf_counter()
+        results = []
+        with ExitStack() as stack:
+            if args.jobs <= 1:
+                rendered = map(_render, items)
+            else:
+                pool = stack.enter_context(
+                    ProcessPoolExecutor(
+                        args.jobs, initializer=_initialize, initargs=(args.template, args.format)
+                    )
+                )
+                rendered = pool.map(_render, items, chunksize=args.chunksize)
+            for result in rendered:
+                _report(result, args)
+                # Only the timings are kept, the manifests can be large.
+                results.append(result._replace(manifest=None))
+        elapsed = time.perf_counter() - start
+    sys.stdout.flush()
+    summary = summarize(results, elapsed, max(args.jobs, 1))
+    sys.stderr.write(json.dumps(summary) + "\n")
+    return 1 if summary["failed"] else 0
+
+
+def _report(result: Rendered, args: argparse.Namespace):
+    """Write a rendered manifest, or log why it could not be rendered."""
+    if result.error is not None:
+        LOGGER.error("Could not render the TERCC on line %d: %s", result.line, result.error)
+        return
+    write(result, args.output, args.format)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
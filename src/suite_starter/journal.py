@@ -0,0 +1,120 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Persistent journal of suite runner launches."""
+
+import logging
+import sqlite3
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+RECEIVED = "received"
+SUBMITTED = "submitted"
+ACKED = "acked"
+
+
+class LaunchJournal:
+    """Append-only journal of TERCCs received, jobs submitted and TERCCs ACK:ed.
+
+    The journal is an SQLite database in WAL mode, which is meant to be stored on a volume
+    that survives restarts of the suite starter. On startup, the suites that had their jobs
+    submitted are read back so that redelivered TERCCs can be ACK:ed without launching
+    their suite runners again.
+
+    The journal keeps the latest `size` entries. Older entries are deleted every `size / 10`
+    appends.
+    """
+
+    def __init__(self, path: str, size: int = 10000, synchronous: str = "NORMAL"):
+        """Open, or create, the journal.
+
+        :param path: Path to the journal database.
+        :param size: Number of entries to keep.
+        :param synchronous: SQLite synchronous setting. NORMAL is safe if the process
+                            crashes, FULL is also safe if the node loses power.
+        """
+        if size < 1:
+            raise ValueError(f"Size of the launch journal must be at least 1, was {size}")
+        self.path = path
+        self.size = size
+        self.__compact_every = max(size // 10, 1)
+        self.__appended = 0
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(f"PRAGMA synchronous={synchronous}")
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "suite_id TEXT NOT NULL, "
+            "kind TEXT NOT NULL, "
+            "time REAL NOT NULL)"
+        )
+        self.__connection.execute(
+            "CREATE INDEX IF NOT EXISTS journal_kind ON journal (kind, suite_id)"
+        )
+
+    def append(self, suite_id: str, kind: str):
+        """Append an entry to the journal.
+
+        :param suite_id: ID of the suite, i.e. the event ID of the TERCC.
+        :param kind: What happened, :data:`RECEIVED`, :data:`SUBMITTED` or :data:`ACKED`.
+        """
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT INTO journal (suite_id, kind, time) VALUES (?, ?, ?)",
+                (suite_id, kind, time.time()),
+            )
+            self.__appended += 1
+            if self.__appended >= self.__compact_every:
+                self.__appended = 0
+                self._compact()
+
+    def _compact(self):
+        """Delete all but the latest `size` entries. Must be called with the lock held."""
+        self.__connection.execute(
+            "DELETE FROM journal WHERE id <= (SELECT MAX(id) FROM journal) - ?", (self.size,)
+        )
+
+    def compact(self):
+        """Delete all but the latest `size` entries."""
+        with self.__lock:
+            self._compact()
+
+    def submitted(self, limit: int) -> list[str]:
+        """Get the suites that most recently had their jobs submitted.
+
+        :param limit: Maximum number of suite IDs to get.
+        :return: Suite IDs, least recently submitted first.
+        """
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT suite_id FROM journal WHERE kind IN (?, ?) "
+                "GROUP BY suite_id ORDER BY MAX(id) DESC LIMIT ?",
+                (SUBMITTED, ACKED, limit),
+            ).fetchall()
+        return [suite_id for (suite_id,) in reversed(rows)]
+
+    def __len__(self) -> int:
+        """Get the number of entries in the journal."""
+        with self.__lock:
+            return self.__connection.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+
+    def close(self):
+        """Close the journal."""
+        with self.__lock:
+            self.__connection.close()
@@ -0,0 +1,85 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Duplicate suppression for suite runner launches."""
+
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+
+JOB_NAME_PREFIX = "suite-runner-"
+
+
+def job_name(suite_id: str) -> str:
+    """Get the name of the suite runner job for a suite.
+
+    The name is derived from the suite ID only, so that every replica of the suite starter
+    uses the same name for the same TERCC and Kubernetes refuses to create it twice.
+
+    :param suite_id: ID of the suite, i.e. the event ID of the TERCC.
+    :return: Name of the suite runner job.
+    """
+    return f"{JOB_NAME_PREFIX}{suite_id}".lower()
+
+
+def already_exists(exception: Exception) -> bool:
+    """Check whether an exception from the Kubernetes API means that the job already exists.
+
+    :param exception: Exception raised when creating a job, from either the synchronous or
+                      the asyncio Kubernetes client.
+    :return: Whether the job already exists.
+    """
+    return getattr(exception, "status", None) == HTTPStatus.CONFLICT
+
+
+class LaunchedSuites:
+    """Least recently used cache of the suite IDs that this process has launched.
+
+    Used to skip the call to the Kubernetes API when a TERCC is redelivered to a suite
+    starter that has already launched its suite runner.
+    """
+
+    def __init__(self, size: int):
+        """Initialize the cache.
+
+        :param size: Maximum number of suite IDs to remember. 0 disables the cache.
+        """
+        if size < 0:
+            raise ValueError(f"Size of the launched suites cache can not be negative, was {size}")
+        self.size = size
+        self.__lock = threading.Lock()
+        self.__suite_ids: OrderedDict[str, None] = OrderedDict()
+
+    def __contains__(self, suite_id: str) -> bool:
+        """Check whether a suite has been launched, marking it as recently used."""
+        with self.__lock:
+            if suite_id not in self.__suite_ids:
+                return False
+            self.__suite_ids.move_to_end(suite_id)
+            return True
+
+    def __len__(self) -> int:
+        """Get the number of suite IDs in the cache."""
+        return len(self.__suite_ids)
+
+    def add(self, suite_id: str):
+        """Remember that a suite has been launched, forgetting the least recently used."""
+        if not self.size:
+            return
+        with self.__lock:
+            self.__suite_ids[suite_id] = None
+            self.__suite_ids.move_to_end(suite_id)
+            while len(self.__suite_ids) > self.size:
+                self.__suite_ids.popitem(last=False)
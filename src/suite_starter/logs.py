@@ -0,0 +1,105 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Cheap logging of suite runner launches."""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from .scheduler import RateLimit, TokenBucket
+
+# Attribute of the log records that belong to the launch of a suite.
+SUITE_ID = "suite_id"
+
+
+def truncate(payload: str, limit: int) -> str:
+    """Truncate a large payload for a log field, keeping its size and a digest of it.
+
+    :param payload: Payload to log, like a JSON dumped TERCC.
+    :param limit: Maximum number of characters of the payload to keep.
+    :return: The payload if it is within the limit, or its first `limit` characters
+             followed by its length and a BLAKE2 digest, so that the payload can be
+             correlated with the payload of the same TERCC in other logs.
+    """
+    if len(payload) <= limit:
+        return payload
+    digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+    return f"{payload[:limit]}... ({len(payload)} characters, blake2b {digest})"
+
+
+class SuiteLogSampler(logging.Filter):
+    """Log the launches of a sample of the suites, limited to a rate of suites per second.
+
+    Whether a suite is sampled is decided by a token bucket when its first record is
+    logged and remembered for the `size` most recent suites, so that either all or none
+    of the records of a launch are logged. Only records with a `suite_id` attribute
+    below WARNING are dropped, everything else is always logged.
+    """
+
+    def __init__(
+        self,
+        limit: RateLimit,
+        size: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize the sampler.
+
+        :param limit: Number of suites per second, and burst, to log the launches of.
+        :param size: Number of suites to remember the sampling decisions of.
+        :param clock: Monotonic clock, in seconds.
+        """
+        super().__init__()
+        self.size = size
+        self.clock = clock
+        self.dropped = 0
+        self.__bucket = TokenBucket(limit, clock())
+        self.__decisions: OrderedDict[str, bool] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls) -> Optional["SuiteLogSampler"]:
+        """Load a sampler from environment variables, if sampling is enabled."""
+        rate = os.getenv("SUITE_STARTER_LOG_SAMPLE_RATE", "0")
+        if rate == "0":
+            return None
+        return cls(RateLimit.parse(rate))
+
+    def sampled(self, suite_id: str) -> bool:
+        """Check whether the launch of a suite is logged."""
+        with self.__lock:
+            decision = self.__decisions.get(suite_id)
+            if decision is not None:
+                self.__decisions.move_to_end(suite_id)
+                return decision
+            decision = self.__bucket.delay(self.clock()) == 0
+            if decision:
+                self.__bucket.take()
+            self.__decisions[suite_id] = decision
+            if len(self.__decisions) > self.size:
+                self.__decisions.popitem(last=False)
+            return decision
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Drop the records of suites that are not sampled, unless they are warnings."""
+        suite_id = getattr(record, SUITE_ID, None)
+        if suite_id is None or record.levelno >= logging.WARNING or self.sampled(suite_id):
+            return True
+        self.dropped += 1
+        return False
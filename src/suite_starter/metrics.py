@@ -0,0 +1,119 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Prometheus metrics for the ETOS suite starter."""
+
+from prometheus_client import Counter, Enum, Gauge, Histogram
+
+# Buckets for the parts of the hot path that run in-process, from microseconds and up.
+PROCESSING_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+TERCCS_RECEIVED = Counter(
+    "suite_starter_terccs_received",
+    "Number of TERCCs received from RabbitMQ.",
+)
+TERCCS_ACKED = Counter(
+    "suite_starter_terccs_acked",
+    "Number of TERCCs ACK:ed after their suite runner was launched.",
+)
+TERCCS_NACKED = Counter(
+    "suite_starter_terccs_nacked",
+    "Number of TERCCs NACK:ed and requeued because their suite runner could not be launched.",
+)
+RENDER_TIME = Histogram(
+    "suite_starter_render_seconds",
+    "Time to render a suite runner job from the compiled template, by template.",
+    ["template"],
+    buckets=PROCESSING_BUCKETS,
+)
+YAML_LOAD_TIME = Histogram(
+    "suite_starter_yaml_load_seconds",
+    "Time to parse the suite runner template as YAML when it is compiled.",
+    buckets=PROCESSING_BUCKETS,
+)
+CREATE_JOB_TIME = Histogram(
+    "suite_starter_create_job_seconds",
+    "Time to create a suite runner job in Kubernetes, by template.",
+    ["template"],
+)
+SUITE_RUNNERS_LAUNCHED = Counter(
+    "suite_starter_suite_runners_launched",
+    "Number of suite runners launched, or found to be launched already, by template.",
+    ["template"],
+)
+SUITE_RUNNER_LAUNCH_FAILURES = Counter(
+    "suite_starter_suite_runner_launch_failures",
+    "Number of suite runners that were rendered but could not be launched, by template.",
+    ["template"],
+)
+TEMPLATE_RELOADS = Counter(
+    "suite_starter_template_reloads",
+    "Number of times the suite runner template was reloaded, by result.",
+    ["result"],
+)
+CONSUMER_LAG = Gauge(
+    "suite_starter_consumer_lag_seconds",
+    "Time between the creation of the latest received TERCC and when it was received.",
+)
+IN_FLIGHT = Gauge(
+    "suite_starter_in_flight",
+    "Number of TERCCs that have been received but not yet ACK:ed or NACK:ed.",
+)
+CONSUMER_PAUSED = Gauge(
+    "suite_starter_consumer_paused",
+    "Whether consuming TERCCs is paused, because too many are in flight or it is held.",
+)
+SCHEDULER_QUEUE_DEPTH = Gauge(
+    "suite_starter_scheduler_queue_depth",
+    "Number of TERCCs waiting in the fair scheduler, by configured scheduling key or 'other'.",
+    ["key"],
+)
+SCHEDULER_WAIT = Histogram(
+    "suite_starter_scheduler_wait_seconds",
+    "Time that a TERCC waited in the fair scheduler before its suite runner was launched.",
+    ["key"],
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+ACTIVE_SUITE_RUNNERS = Gauge(
+    "suite_starter_active_suite_runners",
+    "Number of suite runner jobs in the cluster that have not finished, as seen by admission.",
+)
+ADMISSION_TIMEOUTS = Counter(
+    "suite_starter_admission_timeouts",
+    "Number of TERCCs NACK:ed because too many suite runners were active for too long.",
+)
+KUBERNETES_RETRIES = Counter(
+    "suite_starter_kubernetes_retries",
+    "Number of times a Kubernetes API call was retried, by the status code of the failure.",
+    ["reason"],
+)
+KUBERNETES_RETRIES_EXHAUSTED = Counter(
+    "suite_starter_kubernetes_retries_exhausted",
+    "Number of Kubernetes API calls that failed after running out of retries or budget.",
+)
+CIRCUIT_BREAKER_STATE = Enum(
+    "suite_starter_circuit_breaker_state",
+    "State of the circuit breaker for the Kubernetes API.",
+    states=["closed", "open", "half_open"],
+)
+CIRCUIT_BREAKER_REJECTIONS = Counter(
+    "suite_starter_circuit_breaker_rejections",
+    "Number of TERCCs NACK:ed without calling the Kubernetes API because the circuit was open.",
+)
+TERCCS_ROUTED = Counter(
+    "suite_starter_terccs_routed",
+    "Number of TERCCs routed to each suite runner template, by route name.",
+    ["template"],
+)
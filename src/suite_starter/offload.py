@@ -0,0 +1,172 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Out of band storage of large TERCCs."""
+
+import base64
+import gzip
+import hashlib
+import logging
+from http import HTTPStatus
+from typing import Any
+
+from kubernetes import client  # pylint:disable=no-name-in-module
+
+from .launched import already_exists
+
+LOGGER = logging.getLogger(__name__)
+
+KEY = "tercc.json.gz.{index:04d}"
+VOLUME = "etos-tercc"
+MOUNT_PATH = "/etos/tercc"
+# Value of the TERCC environment variable when the TERCC is stored out of band. The suite
+# runner reads the gzip compressed TERCC by concatenating the files in this directory, in
+# order, instead.
+REFERENCE = f"file://{MOUNT_PATH}"
+# The total size of a ConfigMap is limited to 1 MiB, leave some room for metadata.
+CHUNK_SIZE = 1024 * 1024 - 4096
+
+
+class TerccStore:
+    """Store large TERCCs in compressed, content-addressed ConfigMaps.
+
+    TERCCs larger than `threshold` bytes are gzip compressed and stored in ConfigMaps
+    named after the SHA-256 of the TERCC. A compressed TERCC that does not fit in one
+    ConfigMap is split over several. The ConfigMaps are mounted as one directory into
+    every container of the suite runner job that gets the TERCC in its environment, and
+    the environment variable is set to :data:`REFERENCE` instead of the TERCC itself.
+
+    The ConfigMaps are created right before the job and are owned by the job once the job
+    has been created, so that they are garbage collected together with the job. If the job
+    can not be created, the ConfigMaps are deleted again.
+    """
+
+    def __init__(self, core: client.CoreV1Api, namespace: str, threshold: int):
+        """Initialize the store.
+
+        :param core: Kubernetes core API to create ConfigMaps with.
+        :param namespace: Namespace to create ConfigMaps in, same as the jobs.
+        :param threshold: Size in bytes above which TERCCs are stored out of band.
+        """
+        if threshold < 1:
+            raise ValueError(f"TERCC offload threshold must be at least 1 byte, was {threshold}")
+        self.core = core
+        self.namespace = namespace
+        self.threshold = threshold
+
+    def offload(self, tercc: str) -> bool:
+        """Check whether a serialized TERCC shall be stored out of band."""
+        return len(tercc.encode("utf-8")) > self.threshold
+
+    @staticmethod
+    def config_maps(suite_id: str, tercc: str) -> list[client.V1ConfigMap]:
+        """Compress a serialized TERCC and split it over ConfigMaps, without creating them.
+
+        :param suite_id: ID of the suite that the TERCC belongs to.
+        :param tercc: Serialized TERCC.
+        :return: The ConfigMaps, in order.
+        """
+        data = tercc.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()[:40]
+        compressed = gzip.compress(data, compresslevel=1, mtime=0)
+        chunks = [
+            compressed[start : start + CHUNK_SIZE]
+            for start in range(0, len(compressed), CHUNK_SIZE)
+        ]
+        LOGGER.info(
+            "Storing TERCC of %d bytes, %d bytes compressed, in %d ConfigMap(s)",
+            len(data),
+            len(compressed),
+            len(chunks),
+        )
+        return [
+            client.V1ConfigMap(
+                metadata=client.V1ObjectMeta(
+                    name=f"tercc-{digest}-{index}", labels={"app": "suite-runner", "id": suite_id}
+                ),
+                binary_data={KEY.format(index=index): base64.b64encode(chunk).decode("ascii")},
+            )
+            for index, chunk in enumerate(chunks)
+        ]
+
+    def create(self, config_maps: list[client.V1ConfigMap]):
+        """Create the ConfigMaps of a TERCC, unless they already exist.
+
+        :param config_maps: ConfigMaps to create, as returned by :meth:`config_maps`.
+        """
+        for body in config_maps:
+            try:
+                self.core.create_namespaced_config_map(self.namespace, body)
+            except Exception as exception:  # pylint:disable=broad-exception-caught
+                if not already_exists(exception):
+                    raise
+                LOGGER.info("ConfigMap %r already exists", body.metadata.name)
+
+    def delete(self, config_maps: list[client.V1ConfigMap]):
+        """Delete the ConfigMaps of a TERCC whose job could not be created.
+
+        Failures are logged and not raised, so that they do not hide why the job could not
+        be created.
+
+        :param config_maps: ConfigMaps to delete, as returned by :meth:`config_maps`.
+        """
+        for body in config_maps:
+            name = body.metadata.name
+            try:
+                self.core.delete_namespaced_config_map(name, self.namespace)
+            except Exception as exception:  # pylint:disable=broad-exception-caught
+                if getattr(exception, "status", None) != HTTPStatus.NOT_FOUND:
+                    LOGGER.warning("Failed to delete ConfigMap %r: %r", name, exception)
+
+    @staticmethod
+    def mount(body: dict, config_maps: list[client.V1ConfigMap]):
+        """Mount TERCC ConfigMaps into the containers of a job that reference them.
+
+        :param body: Suite runner job to modify.
+        :param config_maps: ConfigMaps to mount, as returned by :meth:`config_maps`.
+        """
+        pod = body["spec"]["template"]["spec"]
+        sources = [{"configMap": {"name": config_map.metadata.name}} for config_map in config_maps]
+        pod.setdefault("volumes", []).append({"name": VOLUME, "projected": {"sources": sources}})
+        for container in pod.get("initContainers", []) + pod.get("containers", []):
+            if any(variable.get("value") == REFERENCE for variable in container.get("env", [])):
+                container.setdefault("volumeMounts", []).append(
+                    {"name": VOLUME, "mountPath": MOUNT_PATH, "readOnly": True}
+                )
+
+    def adopt(self, body: dict, job: Any):
+        """Make a created job the owner of the TERCC ConfigMaps mounted into it, if any.
+
+        :param body: Suite runner job that was created.
+        :param job: The job returned by the Kubernetes API when it was created.
+        """
+        volumes = body["spec"]["template"]["spec"].get("volumes", [])
+        for volume in volumes:
+            if volume["name"] == VOLUME:
+                break
+        else:
+            return
+        owner = {
+            "apiVersion": "batch/v1",
+            "kind": "Job",
+            "name": job.metadata.name,
+            "uid": job.metadata.uid,
+        }
+        for source in volume["projected"]["sources"]:
+            self.core.patch_namespaced_config_map(
+                source["configMap"]["name"],
+                self.namespace,
+                {"metadata": {"ownerReferences": [owner]}},
+            )
@@ -0,0 +1,104 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Hot reload of the suite runner template."""
+
+import logging
+import os
+import threading
+from typing import Any, Callable, Optional
+
+from .metrics import TEMPLATE_RELOADS
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TemplateWatcher:
+    """Poll a template file for changes and reload it in a background thread.
+
+    A file mounted from a ConfigMap is replaced by swapping a symlink, so the file is
+    considered changed when the modification time, inode or size of the file that the
+    path resolves to changes. The new template is loaded by `load`, which shall raise
+    if the template is not valid, and handed to `swap` only if it could be loaded.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        load: Callable[[str], Any],
+        swap: Callable[[Any], None],
+        interval: float,
+    ):
+        """Initialize the watcher.
+
+        :param path: Path to the template file.
+        :param load: Function that loads, compiles and validates a template from a path.
+        :param swap: Function that starts using a newly loaded template.
+        :param interval: Number of seconds between polls.
+        """
+        if interval <= 0:
+            raise ValueError(f"Template reload interval must be positive, was {interval}")
+        self.path = path
+        self.load = load
+        self.swap = swap
+        self.interval = interval
+        self.__signature = self._signature()
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self._watch, name="TemplateWatcher", daemon=True)
+
+    def _signature(self) -> Optional[tuple[int, int, int]]:
+        """Get the modification time, inode and size of the template file."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+    def start(self):
+        """Start watching the template file."""
+        LOGGER.info("Polling %r for changes every %.1fs", self.path, self.interval)
+        self.__thread.start()
+
+    def stop(self):
+        """Stop watching the template file."""
+        self.__stop.set()
+        if self.__thread.is_alive():
+            self.__thread.join()
+
+    def _watch(self):
+        """Poll the template file until stopped."""
+        while not self.__stop.wait(self.interval):
+            self.poll()
+
+    def poll(self) -> bool:
+        """Reload the template if the file has changed.
+
+        :return: Whether a new template was swapped in.
+        """
+        signature = self._signature()
+        if signature is None or signature == self.__signature:
+            return False
+        self.__signature = signature
+        LOGGER.info("Suite runner template %r has changed, reloading", self.path)
+        try:
+            template = self.load(self.path)
+        except Exception:  # pylint:disable=broad-exception-caught
+            LOGGER.exception("Failed to reload the suite runner template, keeping the old one")
+            TEMPLATE_RELOADS.labels(result="failure").inc()
+            return False
+        self.swap(template)
+        TEMPLATE_RELOADS.labels(result="success").inc()
+        LOGGER.info("Suite runner template reloaded")
+        return True
@@ -0,0 +1,368 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Retries with backoff and a circuit breaker for calls to the Kubernetes API."""
+
+import asyncio
+import datetime
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from kubernetes import client  # pylint:disable=no-name-in-module
+from urllib3.exceptions import HTTPError
+
+from .metrics import (
+    CIRCUIT_BREAKER_REJECTIONS,
+    CIRCUIT_BREAKER_STATE,
+    KUBERNETES_RETRIES,
+    KUBERNETES_RETRIES_EXHAUSTED,
+)
+
+LOGGER = logging.getLogger(__name__)
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def reason(exception: Exception) -> Optional[str]:
+    """Get the reason that a call to the Kubernetes API failed, if the failure is transient.
+
+    The Kubernetes API is throttling (429) or unavailable (5xx), or the connection to it
+    failed. Any other error, such as a conflict or an invalid job, fails the same way
+    if the call is retried.
+
+    :param exception: Exception raised by the Kubernetes client.
+    :return: HTTP status code, or "connection", if transient. Otherwise None.
+    """
+    status = getattr(exception, "status", None)
+    if isinstance(status, int) and status > 0:
+        if status == HTTPStatus.TOO_MANY_REQUESTS or status >= HTTPStatus.INTERNAL_SERVER_ERROR:
+            return str(status)
+        return None
+    if isinstance(exception, (HTTPError, ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return "connection"
+    return None
+
+
+def retry_after(exception: Exception) -> Optional[float]:
+    """Get the number of seconds that the Kubernetes API asked the client to wait for.
+
+    :param exception: Exception raised by the Kubernetes client.
+    :return: Value of the Retry-After header in seconds, or None if there is none.
+    """
+    headers = getattr(exception, "headers", None) or {}
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        LOGGER.warning("Ignoring invalid Retry-After header %r", value)
+        return None
+    return max((date - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
+
+
+class RetryPolicy:
+    """Retry transient failures with exponential backoff and full jitter, within a budget.
+
+    Before retry `n`, counting from 0, the call waits for a random time between 0 and
+    `min(max_delay, base_delay * 2 ** n)` seconds, or for at least as long as the Retry-After
+    header of the failure says. A call is retried at most `retries` times and gives up
+    instead of waiting beyond `budget` seconds in total.
+    """
+
+    def __init__(
+        self,
+        retries: int,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        budget: float = 60.0,
+        jitter: Callable[[], float] = random.random,
+    ):
+        """Initialize the retry policy.
+
+        :param retries: Maximum number of retries of a call. 0 disables retries.
+        :param base_delay: Maximum delay before the first retry, in seconds.
+        :param max_delay: Maximum delay before any retry, unless told otherwise by Retry-After.
+        :param budget: Maximum number of seconds to wait in total for a call.
+        :param jitter: Random number generator in [0, 1).
+        """
+        if retries < 0 or base_delay < 0 or max_delay < 0 or budget < 0:
+            raise ValueError("Retries, delays and budget can not be negative")
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.jitter = jitter
+
+    @classmethod
+    def from_environment(cls) -> "RetryPolicy":
+        """Load the retry policy from environment variables."""
+        return cls(
+            int(os.getenv("SUITE_STARTER_RETRIES", "3")),
+            base_delay=float(os.getenv("SUITE_STARTER_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("SUITE_STARTER_RETRY_MAX_DELAY", "30")),
+            budget=float(os.getenv("SUITE_STARTER_RETRY_BUDGET", "60")),
+        )
+
+    def delay(self, exception: Exception, attempt: int, waited: float) -> Optional[float]:
+        """Get the number of seconds to wait before retrying a failed call.
+
+        :param exception: Exception raised by the failed call.
+        :param attempt: Number of retries made so far.
+        :param waited: Number of seconds waited so far for the call.
+        :return: Seconds to wait, or None if the call shall not be retried.
+        """
+        failure = reason(exception)
+        if failure is None:
+            return None
+        if attempt >= self.retries:
+            KUBERNETES_RETRIES_EXHAUSTED.inc()
+            return None
+        delay = self.jitter() * min(self.max_delay, self.base_delay * 2**attempt)
+        delay = max(delay, retry_after(exception) or 0.0)
+        if waited + delay > self.budget:
+            KUBERNETES_RETRIES_EXHAUSTED.inc()
+            return None
+        KUBERNETES_RETRIES.labels(reason=failure).inc()
+        LOGGER.warning(
+            "Kubernetes API call failed (%s), retrying in %.2fs (retry %d of %d): %r",
+            failure,
+            delay,
+            attempt + 1,
+            self.retries,
+            exception,
+        )
+        return delay
+
+    def call(self, function: Callable[[], T], sleep: Callable[[float], None] = time.sleep) -> T:
+        """Call a function, retrying it according to the policy.
+
+        :param function: Function that calls the Kubernetes API.
+        :param sleep: Function to wait with.
+        :return: Return value of the function.
+        :raises Exception: The last exception raised by the function, if out of retries.
+        """
+        attempt = 0
+        waited = 0.0
+        while True:
+            try:
+                return function()
+            except Exception as exception:  # pylint:disable=broad-exception-caught
+                delay = self.delay(exception, attempt, waited)
+                if delay is None:
+                    raise
+            sleep(delay)
+            attempt += 1
+            waited += delay
+
+    async def call_async(self, function: Callable[[], Awaitable[T]]) -> T:
+        """Await a coroutine function, retrying it according to the policy.
+
+        :param function: Coroutine function that calls the Kubernetes API.
+        :return: Return value of the coroutine.
+        :raises Exception: The last exception raised by the coroutine, if out of retries.
+        """
+        attempt = 0
+        waited = 0.0
+        while True:
+            try:
+                return await function()
+            except Exception as exception:  # pylint:disable=broad-exception-caught
+                delay = self.delay(exception, attempt, waited)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            waited += delay
+
+
+class TimeoutApiClient(client.ApiClient):
+    """Kubernetes API client that times out requests without a timeout of their own.
+
+    The Kubernetes client waits for a response forever by default. Streamed requests, like
+    watches, are not timed out, since they are kept open by the server on purpose.
+    """
+
+    def __init__(self, request_timeout: float, configuration: client.Configuration = None):
+        """Initialize the API client.
+
+        :param request_timeout: Seconds to wait for a connection, and for each read.
+        :param configuration: Configuration of the client, the default if None.
+        """
+        if request_timeout <= 0:
+            raise ValueError(f"Request timeout must be positive, was {request_timeout}")
+        super().__init__(configuration)
+        self.request_timeout = request_timeout
+
+    def request(self, *args, **kwargs):  # pylint:disable=arguments-differ
+        """Make a request, with the default timeout unless it is streamed or has one."""
+        if kwargs.get("_request_timeout") is None and kwargs.get("_preload_content", True):
+            # A single number is only accepted as an integer, but a pair may be floats.
+            kwargs["_request_timeout"] = (self.request_timeout, self.request_timeout)
+        return super().request(*args, **kwargs)
+
+
+class CircuitOpen(Exception):
+    """The Kubernetes API is unhealthy and calls are not made until it has recovered."""
+
+
+class CircuitBreaker:  # pylint:disable=too-many-instance-attributes
+    """Stop calling the Kubernetes API while it is unhealthy.
+
+    The circuit opens when `threshold` calls in a row have failed with transient errors,
+    after their retries. While it is open, calls fail immediately with :exc:`CircuitOpen`.
+    After `reset_timeout` seconds the circuit is half-open and lets one trial call through,
+    while other calls wait for its result, for at most `reset_timeout` seconds. The circuit
+    closes if the trial call succeeds and opens again if it fails.
+
+    The listener is called with the new state on every change, from the thread that caused
+    it, so that consumption can be paused while the circuit is open.
+    """
+
+    def __init__(
+        self,
+        threshold: int,
+        reset_timeout: float,
+        listener: Callable[[str], None] = lambda _: None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize a closed circuit breaker.
+
+        :param threshold: Number of failed calls in a row that opens the circuit.
+        :param reset_timeout: Seconds that the circuit stays open before a trial call.
+        :param listener: Function to call with the new state when the state changes.
+        :param clock: Monotonic clock, in seconds.
+        """
+        if threshold < 1 or reset_timeout <= 0:
+            raise ValueError(
+                "Circuit breaker threshold must be at least 1 and reset timeout positive, "
+                f"were {threshold} and {reset_timeout}"
+            )
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.listener = listener
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.__condition = threading.Condition()
+        self.__opened = 0.0
+        self.__trial = False
+        self.__timer: Optional[threading.Timer] = None
+        CIRCUIT_BREAKER_STATE.state(CLOSED)
+
+    def _change(self, state: str):
+        """Change the state of the circuit. Must be called with the lock held."""
+        self.state = state
+        CIRCUIT_BREAKER_STATE.state(state)
+        self.__condition.notify_all()
+        if state == OPEN:
+            self.__opened = self.clock()
+            LOGGER.error(
+                "%d Kubernetes API calls in a row failed, not calling it for %.1fs",
+                self.failures,
+                self.reset_timeout,
+            )
+            self.stop()
+            self.__timer = threading.Timer(self.reset_timeout, self._half_open)
+            self.__timer.daemon = True
+            self.__timer.start()
+        else:
+            LOGGER.info("Kubernetes API circuit breaker is %s", state.replace("_", "-"))
+        self.listener(state)
+
+    def _half_open(self):
+        """Let a trial call through when the circuit has been open for the reset timeout."""
+        with self.__condition:
+            if self.state == OPEN:
+                self._change(HALF_OPEN)
+
+    def _before(self) -> bool:
+        """Wait until a call may be made.
+
+        :return: Whether the call is the trial call of a half-open circuit.
+        :raises CircuitOpen: If the circuit is open, or opens again while waiting.
+        """
+        with self.__condition:
+            if self.state == OPEN and self.clock() - self.__opened >= self.reset_timeout:
+                self._change(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if not self.__trial:
+                    self.__trial = True
+                    return True
+                # The trial call is bounded by the retry budget and the request timeout, but
+                # the calls waiting for it are bounded too, so that a trial call that hangs
+                # does not hold every worker.
+                self.__condition.wait_for(lambda: self.state != HALF_OPEN, self.reset_timeout)
+            if self.state != CLOSED:
+                CIRCUIT_BREAKER_REJECTIONS.inc()
+                raise CircuitOpen(
+                    f"Not calling the Kubernetes API after {self.failures} failed calls in a row"
+                )
+            return False
+
+    def _after(self, failed: bool, trial: bool):
+        """Record the result of a call.
+
+        :param failed: Whether the call failed with a transient error.
+        :param trial: Whether the call was the trial call of a half-open circuit.
+        """
+        with self.__condition:
+            if trial:
+                self.__trial = False
+            if not failed:
+                self.failures = 0
+                if self.state != CLOSED:
+                    self._change(CLOSED)
+                return
+            self.failures += 1
+            if trial or (self.state == CLOSED and self.failures >= self.threshold):
+                self._change(OPEN)
+
+    def call(self, function: Callable[[], T]) -> T:
+        """Call a function unless the circuit is open, recording whether it failed.
+
+        Only transient failures count as failed calls. Any other exception means that the
+        Kubernetes API is healthy enough to respond.
+
+        :param function: Function that calls the Kubernetes API.
+        :return: Return value of the function.
+        :raises CircuitOpen: If the circuit is open.
+        """
+        trial = self._before()
+        try:
+            result = function()
+        except Exception as exception:
+            self._after(reason(exception) is not None, trial)
+            raise
+        self._after(False, trial)
+        return result
+
+    def stop(self):
+        """Stop the timer that makes the circuit half-open."""
+        if self.__timer is not None:
+            self.__timer.cancel()
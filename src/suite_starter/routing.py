@@ -0,0 +1,159 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Routing of TERCCs to one of several suite runner templates."""
+
+import logging
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+
+import yaml
+
+from .metrics import TERCCS_ROUTED
+from .template import SuiteRunnerTemplate
+
+LOGGER = logging.getLogger(__name__)
+# Condition that matches on the types of the links of a TERCC, instead of on a path.
+LINKS = "links"
+# Condition value that matches any value, as long as the path exists in the TERCC.
+ANY = "*"
+# Name of the suite runner template in metrics when TERCCs are not routed.
+DEFAULT_TEMPLATE = "default"
+
+
+class Route(NamedTuple):
+    """A compiled suite runner template and the TERCCs that are routed to it.
+
+    A TERCC matches the route if it matches every condition. The conditions map a dotted
+    path in the TERCC, like `data.selectionStrategy.tracker`, to the values that are
+    accepted at that path, or to `*` for any value. The special condition `links` lists
+    link types, like `CONTEXT`, that the TERCC must have. A route without conditions
+    matches every TERCC.
+    """
+
+    name: str
+    template: SuiteRunnerTemplate
+    conditions: dict[str, tuple[str, ...]]
+
+    def matches(self, tercc: dict) -> bool:
+        """Check whether a TERCC matches all conditions of this route.
+
+        :param tercc: The TERCC, as JSON.
+        """
+        for path, accepted in self.conditions.items():
+            if path == LINKS:
+                types = {link.get("type") for link in tercc.get("links", [])}
+                if not types.issuperset(accepted):
+                    return False
+                continue
+            value = _lookup(tercc, path)
+            if value is None or (ANY not in accepted and str(value) not in accepted):
+                return False
+        return True
+
+
+def _lookup(data: dict, path: str) -> Any:
+    """Get the value at a dotted path in a TERCC, or None if there is none."""
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or value.get(part) is None:
+            return None
+        value = value[part]
+    return value
+
+
+def _values(value: Any) -> tuple[str, ...]:
+    """Normalize a condition value, a string or a list of strings, to a tuple of strings."""
+    if isinstance(value, list):
+        return tuple(str(item) for item in value)
+    return (str(value),)
+
+
+class TemplateRouter:
+    """Route each TERCC to the first of several suite runner templates that it matches.
+
+    The routes are loaded from a YAML file, where templates are referenced relative to
+    the file and each route can override the configuration from the environment that its
+    template is formatted with, for instance to use another suite runner image::
+
+        routes:
+          - name: gpu
+            template: gpu_template.yaml
+            match:
+              data.selectionStrategy.tracker: [gpu, ml]
+            configuration:
+              docker_image: registry.nordix.org/eiffel/etos-suite-runner:gpu
+          - name: default
+            template: suite_runner_template.yaml
+
+    Every template is compiled and validated when the routes are loaded. The last route
+    shall have no conditions, so that every TERCC is routed to a template.
+    """
+
+    def __init__(self, routes: list[Route]):
+        """Initialize the router.
+
+        :param routes: Routes, in the order that they are matched. Only the last route may,
+                       and must, be without conditions.
+        """
+        if not routes or routes[-1].conditions:
+            raise ValueError("The last suite runner template route must not have conditions")
+        for route in routes[:-1]:
+            if not route.conditions:
+                raise ValueError(f"Route {route.name!r} has no conditions and is not last")
+        names = [route.name for route in routes]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Suite runner template route names are not unique: {names}")
+        self.routes = routes
+
+    @classmethod
+    def load(
+        cls, path: str, compile_template: Callable[[str, dict], SuiteRunnerTemplate]
+    ) -> "TemplateRouter":
+        """Load the routes from a file and compile their templates.
+
+        :param path: Path to the routes file.
+        :param compile_template: Function that loads, compiles and validates a template from
+                                 a path, with a configuration overlay.
+        :return: A router with all templates compiled.
+        """
+        routes_file = Path(path)
+        loaded = yaml.safe_load(routes_file.read_text(encoding="utf-8")) or {}
+        if not isinstance(loaded, dict) or not isinstance(loaded.get("routes"), list):
+            raise ValueError(f"Expected a list of routes in {path!r}")
+        routes = []
+        for index, route in enumerate(loaded["routes"]):
+            if not isinstance(route, dict) or "template" not in route:
+                raise ValueError(f"Route {index} in {path!r} does not have a template")
+            template_path = routes_file.parent.joinpath(route["template"])
+            name = str(route.get("name", template_path.stem))
+            conditions = {
+                str(key): _values(value) for key, value in (route.get("match") or {}).items()
+            }
+            LOGGER.info("Compiling suite runner template %r for route %r", str(template_path), name)
+            template = compile_template(str(template_path), route.get("configuration") or {})
+            routes.append(Route(name, template, conditions))
+        return cls(routes)
+
+    def route(self, tercc: dict) -> Route:
+        """Get the route of a TERCC.
+
+        :param tercc: The TERCC, as JSON.
+        :return: The first route that the TERCC matches.
+        """
+        # The last route has no conditions, so there is always a match.
+        route = next(route for route in self.routes if route.matches(tercc))
+        TERCCS_ROUTED.labels(template=route.name).inc()
+        return route
@@ -0,0 +1,279 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Fair scheduling of suite runner launches."""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, NamedTuple, Optional
+
+from .metrics import SCHEDULER_QUEUE_DEPTH, SCHEDULER_WAIT
+
+DEFAULT_KEY_PATH = "data.selectionStrategy.tracker"
+# Key of TERCCs that do not have a value at the key path.
+UNKNOWN = "unknown"
+# Weight or rate limit for keys that are not configured explicitly.
+ANY = "*"
+# Metric label of the keys that are not configured explicitly.
+OTHER = "other"
+
+
+class RateLimit(NamedTuple):
+    """Token bucket rate limit for the TERCCs of one scheduling key."""
+
+    rate: float
+    burst: float = 1.0
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        """Parse a rate limit on the form `rate[/burst]`, e.g. `0.5/10`.
+
+        :param value: Launches per second, optionally followed by the burst size.
+        """
+        rate, _, burst = value.partition("/")
+        limit = cls(float(rate), float(burst or 1))
+        if limit.rate <= 0 or limit.burst < 1:
+            raise ValueError(f"Rate must be positive and burst at least 1, was {value!r}")
+        return limit
+
+
+class TokenBucket:
+    """Token bucket that refills at `rate` tokens per second, up to `burst` tokens."""
+
+    def __init__(self, limit: RateLimit, now: float):
+        """Initialize a full bucket.
+
+        :param limit: Rate and burst size of the bucket.
+        :param now: Current time.
+        """
+        self.limit = limit
+        self.tokens = limit.burst
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Get the number of seconds until there is a token in the bucket."""
+        self.tokens = min(self.limit.burst, self.tokens + (now - self.updated) * self.limit.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.limit.rate
+
+    def take(self):
+        """Take a token from the bucket."""
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        """Check whether the bucket has refilled to its burst size."""
+        self.delay(now)
+        return self.tokens >= self.limit.burst
+
+
+def _parse_mapping(value: str, parse: Callable) -> dict:
+    """Parse a comma separated list of `key=value` pairs."""
+    mapping = {}
+    for pair in filter(None, (pair.strip() for pair in value.split(","))):
+        key, separator, item = pair.rpartition("=")
+        if not separator:
+            raise ValueError(f"Expected 'key=value', was {pair!r}")
+        mapping[key.strip()] = parse(item.strip())
+    return mapping
+
+
+class FairScheduler:  # pylint:disable=too-many-instance-attributes
+    """Dispatch suite runner launches fairly between the teams, or pipelines, sending TERCCs.
+
+    TERCCs are grouped by a scheduling key, which is read from the TERCC at a dotted path,
+    `data.selectionStrategy.tracker` by default. At most `concurrency` suite runners are
+    launched at a time and the TERCCs waiting for a launch are dispatched by smooth weighted
+    round-robin over the keys, so that a key with weight 2 gets twice as many launches as a
+    key with weight 1 while both have TERCCs waiting. Within a key, TERCCs are launched in
+    the order that they arrived.
+
+    Keys can also be rate limited with a token bucket each. A key that has run out of
+    tokens is skipped until it has a token again, even if there are free launch slots.
+    The bucket of a key is dropped when the key has no TERCCs waiting and the bucket has
+    refilled, since a new bucket would be full as well.
+
+    Keys are read from TERCCs and are not bounded, so metrics are labelled with the key only
+    if it has a weight or rate limit of its own, and with :data:`OTHER` if it does not.
+
+    The scheduler only sees the TERCCs that are being handled by workers, so the number of
+    workers has to be larger than `concurrency` for the scheduler to have TERCCs from more
+    than one key to choose between.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        key_path: str = DEFAULT_KEY_PATH,
+        weights: Optional[dict[str, float]] = None,
+        rate_limits: Optional[dict[str, RateLimit]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize the scheduler.
+
+        :param concurrency: Maximum number of suite runners to launch at a time.
+        :param key_path: Dotted path to the scheduling key in a TERCC.
+        :param weights: Weight of each key. Keys that are not listed get the weight of the
+                        key `*`, or 1.
+        :param rate_limits: Rate limit of each key. Keys that are not listed get the rate
+                            limit of the key `*`, or no rate limit.
+        :param clock: Monotonic clock, in seconds.
+        """
+        if concurrency < 1:
+            raise ValueError(f"Scheduler concurrency must be at least 1, was {concurrency}")
+        self.weights = weights or {}
+        if any(weight <= 0 for weight in self.weights.values()):
+            raise ValueError(f"Scheduler weights must be positive, were {self.weights}")
+        self.concurrency = concurrency
+        self.key_path = key_path.split(".")
+        self.rate_limits = rate_limits or {}
+        self.clock = clock
+        self.labels = (set(self.weights) | set(self.rate_limits) | {UNKNOWN}) - {ANY}
+        self.__condition = threading.Condition()
+        self.__waiting: dict[str, deque] = {}
+        self.__current: dict[str, float] = {}
+        self.__buckets: dict[str, TokenBucket] = {}
+        self.__dispatched: set = set()
+        self.__running = 0
+
+    @classmethod
+    def from_environment(cls) -> Optional["FairScheduler"]:
+        """Load a fair scheduler from environment variables, if it is enabled."""
+        concurrency = int(os.getenv("SUITE_STARTER_SCHEDULER_CONCURRENCY", "0"))
+        if not concurrency:
+            return None
+        return cls(
+            concurrency,
+            key_path=os.getenv("SUITE_STARTER_SCHEDULER_KEY", DEFAULT_KEY_PATH),
+            weights=_parse_mapping(os.getenv("SUITE_STARTER_SCHEDULER_WEIGHTS", ""), float),
+            rate_limits=_parse_mapping(
+                os.getenv("SUITE_STARTER_SCHEDULER_RATE_LIMITS", ""), RateLimit.parse
+            ),
+        )
+
+    def key(self, data: dict) -> str:
+        """Get the scheduling key of a TERCC.
+
+        :param data: The TERCC, as JSON.
+        :return: Value at the key path, or :data:`UNKNOWN` if there is none.
+        """
+        value = data
+        for part in self.key_path:
+            if not isinstance(value, dict) or value.get(part) is None:
+                return UNKNOWN
+            value = value[part]
+        return str(value)
+
+    def _label(self, key: str) -> str:
+        """Get the metric label of a key."""
+        return key if key in self.labels else OTHER
+
+    def _weight(self, key: str) -> float:
+        """Get the weight of a key."""
+        return self.weights.get(key, self.weights.get(ANY, 1.0))
+
+    def _delay(self, key: str, now: float) -> float:
+        """Get the number of seconds until a key is not rate limited."""
+        bucket = self.__buckets.get(key)
+        if bucket is None:
+            limit = self.rate_limits.get(key, self.rate_limits.get(ANY))
+            if limit is None:
+                return 0.0
+            bucket = self.__buckets[key] = TokenBucket(limit, now)
+        return bucket.delay(now)
+
+    def _dispatch(self) -> Optional[float]:
+        """Dispatch waiting TERCCs to free launch slots. Must be called with the lock held.
+
+        :return: Seconds until a rate limited key can be dispatched, if any key is waiting
+                 only because of its rate limit.
+        """
+        timeout = None
+        while self.__running < self.concurrency and self.__waiting:
+            now = self.clock()
+            eligible = []
+            for key in self.__waiting:
+                delay = self._delay(key, now)
+                if delay:
+                    timeout = delay if timeout is None else min(timeout, delay)
+                else:
+                    eligible.append(key)
+            if not eligible:
+                break
+            timeout = None
+            total = 0.0
+            for key in eligible:
+                weight = self._weight(key)
+                self.__current[key] = self.__current.get(key, 0.0) + weight
+                total += weight
+            # max() picks the first key on ties, which is the key that has waited longest.
+            key = max(eligible, key=self.__current.__getitem__)
+            self.__current[key] -= total
+            if key in self.__buckets:
+                self.__buckets[key].take()
+            waiting = self.__waiting[key]
+            self.__dispatched.add(waiting.popleft())
+            if not waiting:
+                del self.__waiting[key]
+                del self.__current[key]
+            SCHEDULER_QUEUE_DEPTH.labels(key=self._label(key)).dec()
+            self.__running += 1
+            self.__condition.notify_all()
+        return timeout
+
+    def acquire(self, key: str):
+        """Wait until a TERCC is dispatched and may launch its suite runner.
+
+        :param key: Scheduling key of the TERCC.
+        """
+        waiter = object()
+        start = self.clock()
+        with self.__condition:
+            self.__waiting.setdefault(key, deque()).append(waiter)
+            SCHEDULER_QUEUE_DEPTH.labels(key=self._label(key)).inc()
+            while True:
+                timeout = self._dispatch()
+                if waiter in self.__dispatched:
+                    self.__dispatched.remove(waiter)
+                    break
+                self.__condition.wait(timeout)
+        SCHEDULER_WAIT.labels(key=self._label(key)).observe(self.clock() - start)
+
+    def release(self):
+        """Free the launch slot of a TERCC that was dispatched by :meth:`acquire`."""
+        with self.__condition:
+            self.__running -= 1
+            self._dispatch()
+            self._evict()
+
+    def _evict(self):
+        """Drop the token buckets of idle keys. Must be called with the lock held."""
+        now = self.clock()
+        for key in [key for key in self.__buckets if key not in self.__waiting]:
+            if self.__buckets[key].full(now):
+                del self.__buckets[key]
+
+    def waiting(self, key: str) -> int:
+        """Get the number of TERCCs waiting to be dispatched for a key."""
+        with self.__condition:
+            return len(self.__waiting.get(key, ()))
+
+    def buckets(self) -> int:
+        """Get the number of keys that have a token bucket."""
+        with self.__condition:
+            return len(self.__buckets)
@@ -0,0 +1,174 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Static environment of the suite runners, shared by all jobs in ConfigMaps."""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable
+
+from kubernetes import client  # pylint:disable=no-name-in-module
+
+from .launched import already_exists
+from .template import SuiteRunnerTemplate
+
+LOGGER = logging.getLogger(__name__)
+
+PREFIX = "suite-runner-env"
+# Keys of a ConfigMap that can be loaded with envFrom.
+KEY_REGEX = re.compile(r"^[-._a-zA-Z0-9]+$")
+
+
+class SharedEnvironment:
+    """Move the static environment variables of suite runner containers to ConfigMaps.
+
+    Environment variables whose values are the same for every suite runner, i.e. that do
+    not contain any dynamic values, are removed from the compiled template and stored in a
+    ConfigMap per container, which the container loads with `envFrom` instead. Every job
+    then only carries a reference to the ConfigMap instead of the variables themselves.
+
+    The ConfigMaps are named after the SHA-256 of their data, so containers with the same
+    static environment share a ConfigMap, and a ConfigMap is never changed after it has
+    been created. ConfigMaps are not deleted when the template changes, since jobs that
+    were rendered from the old template may still be starting.
+
+    A ConfigMap that is deleted from the cluster would break every job that is created
+    after it, so the ConfigMaps are created again, at most every `interval` seconds,
+    whenever :meth:`publish` is called.
+    """
+
+    def __init__(self, interval: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        """Initialize the shared environment, without any ConfigMaps.
+
+        :param interval: Seconds after which a published ConfigMap is created again, in
+                         case it has been deleted. 0 creates every ConfigMap only once.
+        :param clock: Monotonic clock, in seconds.
+        """
+        self.interval = interval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.config_maps: dict[str, dict[str, str]] = {}
+        # Time that each ConfigMap was last created, or found to exist.
+        self.published: dict[str, float] = {}
+
+    def extract(self, suite_runner_template: SuiteRunnerTemplate):
+        """Move the static environment variables of a compiled template to ConfigMaps.
+
+        The ConfigMaps are not created until :meth:`publish` is called.
+
+        :param suite_runner_template: Compiled template to modify.
+        """
+        pod = suite_runner_template.skeleton.get("spec", {}).get("template", {}).get("spec", {})
+        for container in pod.get("initContainers", []) + pod.get("containers", []):
+            env = container.get("env") or []
+            data = self._static(env)
+            shared = [variable for variable in env if variable["name"] in data]
+            reference = {"configMapRef": {"name": self._name(data)}}
+            # A reference is not worth it for a single variable with a short value.
+            if len(json.dumps(shared)) <= len(json.dumps(reference)):
+                continue
+            container["env"] = [variable for variable in env if variable not in shared]
+            if not container["env"]:
+                del container["env"]
+            # Later sources take precedence, so the static variables still override the
+            # ConfigMaps and Secrets that the template loads, like they did in `env`.
+            container.setdefault("envFrom", []).append(reference)
+            with self.lock:
+                self.config_maps[reference["configMapRef"]["name"]] = data
+
+    @staticmethod
+    def _static(env: list[Any]) -> dict[str, str]:
+        """Get the environment variables that can be moved to a ConfigMap.
+
+        Only variables with a plain string value are moved. Variables that are set more
+        than once, or that reference other variables, are kept in the job, since moving
+        them could change which value the container gets.
+        """
+        names = Counter(variable.get("name") for variable in env)
+        data = {}
+        for variable in env:
+            name, value = variable.get("name"), variable.get("value")
+            if set(variable) != {"name", "value"} or not isinstance(value, str):
+                continue
+            if names[name] > 1 or not KEY_REGEX.match(name) or "$(" in value:
+                continue
+            data[name] = value
+        return data
+
+    @staticmethod
+    def _name(data: dict[str, str]) -> str:
+        """Name a ConfigMap after its data."""
+        serialized = json.dumps(data, sort_keys=True, separators=(",", ":"))
+        return f"{PREFIX}-{hashlib.sha256(serialized.encode('utf-8')).hexdigest()[:16]}"
+
+    def manifests(self) -> list[dict]:
+        """Get the ConfigMaps with the shared environment, as Kubernetes manifests."""
+        with self.lock:
+            config_maps = dict(self.config_maps)
+        return [self._manifest(name, data) for name, data in config_maps.items()]
+
+    @staticmethod
+    def _manifest(name: str, data: dict[str, str]) -> dict:
+        """Create the manifest of a ConfigMap with shared environment variables."""
+        return {
+            "apiVersion": "v1",
+            "kind": "ConfigMap",
+            "metadata": {"name": name, "labels": {"app": "suite-runner"}},
+            "data": data,
+        }
+
+    def _due(self, now: float, name: str) -> bool:
+        """Check whether a ConfigMap shall be created, or created again."""
+        published = self.published.get(name)
+        if published is None:
+            return True
+        return 0 < self.interval <= now - published
+
+    def publish(self, core: client.CoreV1Api, namespace: str):
+        """Create the ConfigMaps that have not been created, or not been created recently.
+
+        Must be called before any job is created from a template that the ConfigMaps
+        were extracted from, and is called before every job is created so that deleted
+        ConfigMaps are created again. ConfigMaps that are being created by another thread
+        are skipped.
+
+        :param core: Kubernetes core API to create ConfigMaps with.
+        :param namespace: Namespace to create ConfigMaps in, same as the jobs.
+        """
+        now = self.clock()
+        with self.lock:
+            due = {name: data for name, data in self.config_maps.items() if self._due(now, name)}
+            previous = {name: self.published.get(name) for name in due}
+            self.published.update(dict.fromkeys(due, now))
+        for name, data in due.items():
+            try:
+                core.create_namespaced_config_map(namespace, self._manifest(name, data))
+                LOGGER.info("Created ConfigMap %r with %d environment variables", name, len(data))
+            except Exception as exception:  # pylint:disable=broad-exception-caught
+                if not already_exists(exception):
+                    # Created again by the next call, including those created by this one.
+                    with self.lock:
+                        for unpublished, published in previous.items():
+                            if published is None:
+                                self.published.pop(unpublished, None)
+                            else:
+                                self.published[unpublished] = published
+                    raise
+                LOGGER.debug("ConfigMap %r already exists", name)
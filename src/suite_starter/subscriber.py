@@ -0,0 +1,252 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""RabbitMQ subscriber for the ETOS suite starter."""
+
+import logging
+import os
+import threading
+from typing import NamedTuple
+
+from etos_lib.eiffel.subscriber import TracingRabbitMQSubscriber
+
+from .metrics import CONSUMER_PAUSED, IN_FLIGHT
+
+LOGGER = logging.getLogger(__name__)
+
+
+class FlowControl(NamedTuple):
+    """Flow control settings for the TERCC subscription."""
+
+    prefetch: int
+    max_in_flight: int = 0
+    low_water: int = 0
+
+    @classmethod
+    def from_environment(cls, workers: int) -> "FlowControl":
+        """Load flow control settings from environment variables.
+
+        :param workers: Number of workers, which is the default prefetch count.
+        """
+        prefetch = int(os.getenv("SUITE_STARTER_PREFETCH", str(workers)))
+        max_in_flight = int(os.getenv("SUITE_STARTER_MAX_IN_FLIGHT", "0"))
+        low_water = int(os.getenv("SUITE_STARTER_IN_FLIGHT_LOW_WATER", str(max_in_flight // 2)))
+        if prefetch < 0 or max_in_flight < 0:
+            raise ValueError("Prefetch count and maximum in-flight TERCCs can not be negative")
+        if max_in_flight and not 0 <= low_water < max_in_flight:
+            raise ValueError(
+                f"In-flight low-water mark ({low_water}) must be less than "
+                f"the maximum number of in-flight TERCCs ({max_in_flight})"
+            )
+        return cls(prefetch, max_in_flight, low_water)
+
+
+class DrainReport(NamedTuple):
+    """What happened to the TERCCs in flight when the suite starter was drained."""
+
+    # Launches that finished during the drain and were ACK:ed or NACK:ed by their outcome.
+    finished: int = 0
+    # Prefetched TERCCs that were handed back to RabbitMQ without starting a launch.
+    requeued: int = 0
+    # Launches that were still running at the deadline. Their TERCCs are returned to the
+    # queue by RabbitMQ when the connection is closed.
+    abandoned: int = 0
+
+
+# pylint:disable-next=too-many-instance-attributes
+class SuiteStarterSubscriber(TracingRabbitMQSubscriber):
+    """RabbitMQ subscriber with a bounded pool of workers launching suite runners.
+
+    Every message is handled by a worker thread in the subscriber thread pool and the
+    message is ACK:ed or NACK:ed when the callback of that worker returns, i.e. after
+    the suite runner job has been created. The RabbitMQ consumer thread only hands over
+    messages to the pool.
+
+    RabbitMQ stops delivering messages when `prefetch` messages are unacknowledged. In
+    addition to that, if `max_in_flight` is set in the flow control settings, the
+    subscriber stops consuming when that many messages are being handled and starts
+    consuming again when the number of messages in flight has dropped to `low_water`.
+
+    Consuming can also be held, e.g. while the Kubernetes API is unhealthy, with
+    :meth:`hold` and :meth:`unhold`. Consuming is not resumed while it is held.
+
+    When the suite starter shuts down, :meth:`drain` stops consuming and waits for the
+    launches in flight to finish. Prefetched TERCCs that have not started are NACK:ed
+    and requeued instead of being handled.
+    """
+
+    def __init__(self, *args, workers: int = 10, flow_control: FlowControl = None, **kwargs):
+        """Initialize the subscriber.
+
+        :param workers: Number of suite runner launches to run concurrently.
+        :param flow_control: Prefetch and in-flight limits. Prefetch defaults to `workers`.
+        """
+        super().__init__(*args, **kwargs)
+        if workers < 1:
+            raise ValueError(f"Number of workers must be at least 1, was {workers}")
+        flow_control = flow_control or FlowControl(prefetch=workers)
+        self.flow_control = flow_control
+        self.max_threads = workers
+        self.prefetch_count = flow_control.prefetch
+        # Messages that are waiting for a worker are queued in the thread pool. The queue
+        # must fit all messages that can be in flight, or the consumer thread is blocked.
+        self.max_queue = max(workers, flow_control.prefetch, flow_control.max_in_flight)
+        self.in_flight = 0
+        self.paused = False
+        self.held = False
+        self.draining = False
+        self.drained = 0
+        self.__lock = threading.Lock()
+        self.__requeued = 0
+        self.__idle = threading.Event()
+        LOGGER.info(
+            "Suite starter subscriber will launch at most %d suites concurrently "
+            "(prefetch: %d, max in flight: %d, low-water mark: %d)",
+            workers,
+            *flow_control,
+        )
+
+    def reset_parameters(self):
+        """Reset parameters to default. A new connection starts consuming immediately."""
+        super().reset_parameters()
+        self.paused = False
+        self.held = False
+        CONSUMER_PAUSED.set(0)
+
+    def _cancel(self):
+        """Send a Cancel request to RabbitMQ, unless consuming is already paused."""
+        if self.paused:
+            self._cancel_consumer(None, self._consumer_tag)
+        else:
+            super()._cancel()
+
+    def _on_message(self, _, method, properties, body):
+        """Count a received message as in flight and pause consuming if at the limit."""
+        self.in_flight += 1
+        IN_FLIGHT.inc()
+        max_in_flight = self.flow_control.max_in_flight
+        if max_in_flight and self.in_flight >= max_in_flight and not self.paused:
+            self.pause()
+        super()._on_message(_, method, properties, body)
+
+    def _tracer_call(self, body, method, properties):
+        """Handle a message, unless draining, in which case it is handed back unhandled."""
+        if self.draining:
+            with self.__lock:
+                self.__requeued += 1
+            return False, True
+        return super()._tracer_call(body, method, properties)
+
+    def callback_results(self, delivery_tag, result):
+        """Handle the result of a worker and schedule the message as done."""
+        super().callback_results(delivery_tag, result)
+        self._connection.ioloop.add_callback(self._message_done)
+
+    def callback_error(self, delivery_tag, exception):
+        """Handle an exception raised by a worker and schedule the message as done."""
+        super().callback_error(delivery_tag, exception)
+        self._connection.ioloop.add_callback(self._message_done)
+
+    def _message_done(self):
+        """Count a message as done and resume consuming if at the low-water mark."""
+        self.in_flight -= 1
+        IN_FLIGHT.dec()
+        if self.draining:
+            self.drained += 1
+            if not self.in_flight:
+                self.__idle.set()
+        elif self.paused and not self.held and self.in_flight <= self.flow_control.low_water:
+            self.resume()
+
+    def pause(self):
+        """Stop consuming messages. Must be called from the consumer thread."""
+        LOGGER.info("%d TERCCs in flight, pausing consumption", self.in_flight)
+        self.paused = True
+        CONSUMER_PAUSED.set(1)
+        self._channel.basic_cancel(self._consumer_tag)
+
+    def resume(self):
+        """Start consuming messages again. Must be called from the consumer thread."""
+        LOGGER.info("%d TERCCs in flight, resuming consumption", self.in_flight)
+        self.paused = False
+        CONSUMER_PAUSED.set(0)
+        self._consumer_tag = self._channel.basic_consume(self.queue, self._on_message)
+
+    def hold(self):
+        """Stop consuming messages until :meth:`unhold` is called. Thread-safe."""
+        if self._connection is not None:
+            self._connection.ioloop.add_callback(self._hold)
+
+    def unhold(self):
+        """Start consuming messages again after :meth:`hold`, flow control permitting.
+
+        Thread-safe.
+        """
+        if self._connection is not None:
+            self._connection.ioloop.add_callback(self._unhold)
+
+    def _hold(self):
+        """Hold consuming messages. Must be called from the consumer thread."""
+        if self.held:
+            return
+        LOGGER.warning("Holding consumption of TERCCs")
+        self.held = True
+        if not self.paused:
+            self.pause()
+
+    def _unhold(self):
+        """Stop holding consuming messages. Must be called from the consumer thread."""
+        if not self.held or self.draining:
+            return
+        LOGGER.info("No longer holding consumption of TERCCs")
+        self.held = False
+        if self.paused and (
+            not self.flow_control.max_in_flight or self.in_flight <= self.flow_control.low_water
+        ):
+            self.resume()
+
+    def drain(self, timeout: float) -> DrainReport:
+        """Stop consuming, wait for the messages in flight and close the connection.
+
+        Blocks until all messages in flight have been handled, or for at most `timeout`
+        seconds. Messages that are still being handled when the connection is closed are
+        returned to the queue by RabbitMQ.
+
+        :param timeout: Seconds to wait for the messages in flight.
+        :return: What happened to the messages in flight.
+        """
+        if self._connection is None:
+            return DrainReport()
+        self._connection.ioloop.add_callback(self._drain)
+        self.__idle.wait(timeout)
+        self._connection.ioloop.add_callback(self._close)
+        if self.connection_thread is not None:
+            self.connection_thread.join(timeout=5)
+        with self.__lock:
+            requeued = self.__requeued
+        return DrainReport(self.drained - requeued, requeued, self.in_flight)
+
+    def _drain(self):
+        """Stop consuming for good. Must be called from the consumer thread."""
+        LOGGER.info("Draining %d TERCCs in flight", self.in_flight)
+        self._hold()
+        self.draining = True
+        if not self.in_flight:
+            self.__idle.set()
+
+    def _close(self):
+        """Close the channel and connection. Must be called from the consumer thread."""
+        self._closing = True
+        self._cancel()
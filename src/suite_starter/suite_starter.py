@@ -20,21 +20,84 @@
 import json
 import logging
 import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
+from typing import Any, NamedTuple, Optional
 
+from kubernetes import client  # pylint:disable=no-name-in-module
 from opentelemetry import trace, context
 from opentelemetry.propagate import inject
+from prometheus_client import Histogram, start_http_server
 
 from etos_lib import ETOS
 from etos_lib.kubernetes.jobs import Job
+from etos_lib.lib.exceptions import SubscriberConfigurationMissing
 from etos_lib.logging.logger import FORMAT_CONFIG
 from etos_lib.opentelemetry.semconv import Attributes as SemConvAttributes
 
+from .admission import AdmissionControl
+from .configuration import SuiteRunnerConfiguration, template_fields
+from .journal import ACKED, RECEIVED, SUBMITTED, LaunchJournal
+from .launched import LaunchedSuites, already_exists, job_name as suite_runner_job_name
+from .logs import SUITE_ID, SuiteLogSampler, truncate
+from .metrics import (
+    CONSUMER_LAG,
+    CREATE_JOB_TIME,
+    RENDER_TIME,
+    SUITE_RUNNER_LAUNCH_FAILURES,
+    SUITE_RUNNERS_LAUNCHED,
+    TERCCS_ACKED,
+    TERCCS_NACKED,
+    TERCCS_RECEIVED,
+)
+from .offload import REFERENCE, TerccStore
+from .reload import TemplateWatcher
+from .retry import OPEN, CircuitBreaker, RetryPolicy, TimeoutApiClient
+from .routing import DEFAULT_TEMPLATE, TemplateRouter
+from .scheduler import FairScheduler
+from .shared import SharedEnvironment
+from .subscriber import DrainReport, FlowControl, SuiteStarterSubscriber
+from .template import SuiteRunnerTemplate
+
 LOGGER = logging.getLogger(__name__)
+TEMPLATE_SIZE = "etos.suite_starter.template.size"
+BODY_SIZE = "etos.suite_starter.job.body.size"
+TEMPLATE_ROUTE = "etos.suite_starter.template.route"
 # Remove spam from pika.
 logging.getLogger("pika").setLevel(logging.WARNING)
 
 
+class SuiteRunnerJob(NamedTuple):
+    """A suite runner job rendered from a TERCC, that has not been created yet."""
+
+    name: str
+    body: dict
+    # Name of the template that the job was rendered from.
+    template: str
+    # ConfigMaps with the TERCC, when it is stored out of band, to create before the job.
+    config_maps: list[client.V1ConfigMap]
+
+
+class TimeoutJob(Job):
+    """ETOS job client whose requests to the Kubernetes API time out.
+
+    A request that hangs would otherwise hold a worker, and the trial call of the circuit
+    breaker, forever.
+    """
+
+    request_timeout = 30.0
+    __batch = None
+
+    @property
+    def batch_v1(self) -> client.BatchV1Api:
+        """BatchV1Api for Kubernetes, with a request timeout."""
+        if self.__batch is None:
+            self.__batch = client.BatchV1Api(TimeoutApiClient(self.request_timeout))
+        return self.__batch
+
+
 class SuiteStarter:  # pylint:disable=too-many-instance-attributes
     """Suite starter main program."""
 
@@ -47,22 +110,238 @@ class SuiteStarter:  # pylint:disable=too-many-instance-attributes
         /app/suite_runner_template.yaml.
         """
         self.etos = ETOS("ETOS Suite Starter", os.getenv("HOSTNAME"), "ETOS Suite Starter")
+        self.ready = threading.Event()
 
-        self.suite_runner_template = self._load_template(suite_runner_template_path)
-        self._configure()
-        self._validate_template(self.suite_runner_template)
+        workers = int(os.getenv("SUITE_STARTER_WORKERS", "10"))
+        self.drain_timeout = float(os.getenv("SUITE_STARTER_DRAIN_TIMEOUT", "25"))
+        self.log_field_limit = int(os.getenv("SUITE_STARTER_LOG_FIELD_LIMIT", "256"))
+        self.log_sampler = self._log_sampler()
+        self.configuration = self._configure()
+        # The templates are compiled first, so that an invalid template fails the startup
+        # before any connections are made.
+        self.suite_runner_template_path = suite_runner_template_path
+        self.template_routes = os.getenv("SUITE_STARTER_TEMPLATE_ROUTES")
+        self.shared_environment = self._shared_environment()
+        self.suite_runner_template, self.router = self._compile_templates()
+        self.template_watcher = None
+        self.request_timeout = float(os.getenv("SUITE_STARTER_KUBERNETES_TIMEOUT", "30"))
+        self.job = self._kubernetes_client(workers)
+        self._publish_shared_environment()
+        self.tercc_store = self._tercc_store(
+            int(os.getenv("SUITE_STARTER_TERCC_OFFLOAD_THRESHOLD", "0"))
+        )
+        self.launched = LaunchedSuites(int(os.getenv("SUITE_STARTER_LAUNCHED_CACHE_SIZE", "1024")))
+        self.journal = self._open_journal(os.getenv("SUITE_STARTER_JOURNAL"))
+        self.scheduler = self._fair_scheduler()
+        self.admission = self._admission_control(
+            int(os.getenv("SUITE_STARTER_MAX_ACTIVE_SUITE_RUNNERS", "0"))
+        )
+        self.retry = RetryPolicy.from_environment()
+        self.breaker = self._circuit_breaker(
+            int(os.getenv("SUITE_STARTER_CIRCUIT_BREAKER_THRESHOLD", "0"))
+        )
+        self.tracer = trace.get_tracer(__name__)
 
         self.etos.config.rabbitmq_subscriber_from_environment()
         self.etos.config.rabbitmq_publisher_from_environment()
-        self.etos.start_subscriber()
         self.etos.start_publisher()
+        # Everything that the callback uses, and the callback itself, must be set up before
+        # the subscriber is started, since TERCCs are consumed as soon as it is.
+        self._start_subscriber(workers, FlowControl.from_environment(workers))
+
+    def _start_subscriber(self, workers: int, flow_control: FlowControl):
+        """Start the RabbitMQ subscriber with a pool of workers launching suite runners.
 
+        Works like :meth:`etos_lib.ETOS.start_subscriber`, but uses a subscriber where the
+        concurrency and flow control can be configured.
+
+        :param workers: Number of suite runners to launch concurrently.
+        :param flow_control: Prefetch and in-flight limits for the subscriber.
+        :raises SubscriberConfigurationMissing: If RabbitMQ is not configured.
+        """
+        rabbitmq = self.etos.config.get("rabbitmq_subscriber")
+        if not rabbitmq:
+            raise SubscriberConfigurationMissing
+        self.etos.subscriber = SuiteStarterSubscriber(
+            workers=workers, flow_control=flow_control, **rabbitmq
+        )
+        self.etos.config.set("subscriber", self.etos.subscriber)
+        # The callback must be registered before consuming starts, or TERCCs delivered in
+        # between are ACK:ed by the subscriber without any callback handling them.
         self.etos.subscriber.subscribe(
             "EiffelTestExecutionRecipeCollectionCreatedEvent",
             self.suite_runner_callback,
             can_nack=True,
         )
-        self.tracer = trace.get_tracer(__name__)
+        if not self.etos.debug.disable_receiving_events:
+            self.etos.subscriber.start()
+        self._ready()
+
+    def _ready(self):
+        """Signal that the suite starter has started consuming TERCCs.
+
+        Sets :attr:`ready` and touches the file at `SUITE_STARTER_READY_FILE`, if set, which
+        can be checked by a Kubernetes readiness probe.
+        """
+        self.ready.set()
+        ready_file = os.getenv("SUITE_STARTER_READY_FILE")
+        if ready_file:
+            Path(ready_file).touch()
+        LOGGER.info("Suite starter is ready to launch suite runners")
+
+    def _kubernetes_client(self, pool_size: int) -> Job:
+        """Create the Kubernetes job client that is shared by all suite runner launches.
+
+        The API client keeps its connections to the Kubernetes API alive between launches
+        and the credentials are refreshed by the Kubernetes client library when the service
+        account token is rotated.
+
+        :param pool_size: Number of connections to keep open to the Kubernetes API.
+        :return: A Kubernetes job client.
+        """
+        job = TimeoutJob(in_cluster=bool(os.getenv("DOCKER_CONTEXT")))
+        job.request_timeout = self.request_timeout
+        # The Kubernetes API clients are created from the default configuration, which was
+        # loaded by Job, so the connection pool size has to be set there.
+        configuration = client.Configuration.get_default_copy()
+        configuration.connection_pool_maxsize = pool_size
+        client.Configuration.set_default(configuration)
+        # Create the API client now instead of letting the workers race to create it.
+        job.batch_v1  # pylint:disable=pointless-statement
+        return job
+
+    def _tercc_store(self, threshold: int) -> Optional[TerccStore]:
+        """Create the store for TERCCs that are too large to pass in the job environment.
+
+        :param threshold: Size in bytes above which TERCCs are stored out of band. 0 disables.
+        :return: A TERCC store, or None if disabled.
+        """
+        if not threshold:
+            return None
+        LOGGER.info("Storing TERCCs larger than %d bytes in ConfigMaps", threshold)
+        core = client.CoreV1Api(self.job.batch_v1.api_client)
+        return TerccStore(core, self.job.namespace, threshold)
+
+    @staticmethod
+    def _shared_environment() -> Optional[SharedEnvironment]:
+        """Share the static environment of the suite runners in ConfigMaps, if enabled."""
+        if os.getenv("SUITE_STARTER_SHARED_ENVIRONMENT", "false").lower() != "true":
+            return None
+        interval = float(os.getenv("SUITE_STARTER_SHARED_ENVIRONMENT_INTERVAL", "60"))
+        LOGGER.info("Sharing the static environment of the suite runners in ConfigMaps")
+        return SharedEnvironment(interval)
+
+    def _publish_shared_environment(self, compiled: Any = None) -> Any:
+        """Create the ConfigMaps with the shared environment of the templates, if enabled.
+
+        :param compiled: Template or routes that the ConfigMaps were just extracted from.
+        :return: `compiled`, which can be used once the ConfigMaps have been created.
+        """
+        if self.shared_environment is not None:
+            core = client.CoreV1Api(self.job.batch_v1.api_client)
+            self.shared_environment.publish(core, self.job.namespace)
+        return compiled
+
+    def _fair_scheduler(self) -> Optional[FairScheduler]:
+        """Create the scheduler that launches suite runners fairly between teams, if enabled."""
+        scheduler = FairScheduler.from_environment()
+        if scheduler is not None:
+            LOGGER.info(
+                "Launching at most %d suite runners at a time, scheduled fairly by %r",
+                scheduler.concurrency,
+                ".".join(scheduler.key_path),
+            )
+        return scheduler
+
+    def _admission_control(self, ceiling: int) -> Optional[AdmissionControl]:
+        """Start caching the active suite runners, to limit how many there are at a time.
+
+        :param ceiling: Maximum number of active suite runners. 0 disables admission control.
+        :return: Started admission control, or None if disabled.
+        """
+        if not ceiling:
+            return None
+        admission = AdmissionControl(
+            self.job.batch_v1,
+            self.job.namespace,
+            ceiling,
+            float(os.getenv("SUITE_STARTER_ADMISSION_TIMEOUT", "60")),
+        )
+        admission.start()
+        return admission
+
+    @staticmethod
+    def _log_sampler() -> Optional[SuiteLogSampler]:
+        """Log the launches of only a sample of the suites, if enabled."""
+        sampler = SuiteLogSampler.from_environment()
+        if sampler is not None:
+            LOGGER.addFilter(sampler)
+        return sampler
+
+    @staticmethod
+    def _identify(suite_id: str):
+        """Tag the log messages of the current thread with a suite ID."""
+        FORMAT_CONFIG.identifier = suite_id
+
+    def _suite_logged(self, suite_id: str) -> bool:
+        """Check whether the launch of a suite is logged at INFO level."""
+        if not LOGGER.isEnabledFor(logging.INFO):
+            return False
+        return self.log_sampler is None or self.log_sampler.sampled(suite_id)
+
+    def _circuit_breaker(self, threshold: int) -> Optional[CircuitBreaker]:
+        """Create the circuit breaker that holds consumption while the Kubernetes API is down.
+
+        :param threshold: Number of failed launches in a row that opens the circuit.
+                          0 disables the circuit breaker.
+        :return: A circuit breaker, or None if disabled.
+        """
+        if not threshold:
+            return None
+        reset_timeout = float(os.getenv("SUITE_STARTER_CIRCUIT_BREAKER_RESET_TIMEOUT", "30"))
+        LOGGER.info(
+            "Not calling the Kubernetes API for %.1fs after %d failed launches in a row",
+            reset_timeout,
+            threshold,
+        )
+        return CircuitBreaker(threshold, reset_timeout, self._circuit_changed)
+
+    def _circuit_changed(self, state: str):
+        """Hold consuming TERCCs while the circuit is open and consume again when it is not."""
+        subscriber = self.etos.subscriber
+        if not isinstance(subscriber, SuiteStarterSubscriber):
+            return
+        if state == OPEN:
+            subscriber.hold()
+        else:
+            subscriber.unhold()
+
+    def _open_journal(self, path: Optional[str]) -> Optional[LaunchJournal]:
+        """Open the launch journal and remember the suites that it says have been launched.
+
+        :param path: Path to the journal, or None to not keep a journal.
+        :return: The launch journal, or None if disabled.
+        :raises ValueError: If the launched suites cache is disabled, since nothing would
+                            read the journal.
+        """
+        if not path:
+            return None
+        if not self.launched.size:
+            raise ValueError(
+                "SUITE_STARTER_JOURNAL requires the launched suites cache, "
+                "SUITE_STARTER_LAUNCHED_CACHE_SIZE can not be 0"
+            )
+        journal = LaunchJournal(path, int(os.getenv("SUITE_STARTER_JOURNAL_SIZE", "10000")))
+        submitted = journal.submitted(self.launched.size)
+        for suite_id in submitted:
+            self.launched.add(suite_id)
+        LOGGER.info("Loaded %d launched suites from the journal %r", len(submitted), path)
+        return journal
+
+    def _record(self, event, kind: str):
+        """Append an entry for a TERCC to the launch journal, if there is one."""
+        if self.journal is not None:
+            self.journal.append(event.meta.event_id, kind)
 
     def _load_template(self, suite_runner_template_path: str) -> str:
         """Load the suite runner template file."""
@@ -71,7 +350,94 @@ class SuiteStarter:  # pylint:disable=too-many-instance-attributes
         assert suite_runner_template.exists(), "Suite runner template does not exist"
         return suite_runner_template.read_text(encoding="utf-8")
 
-    def _validate_template(self, suite_runner_template: str):
+    def _compile_templates(
+        self,
+    ) -> tuple[Optional[SuiteRunnerTemplate], Optional[TemplateRouter]]:
+        """Compile the suite runner template, or the routes to templates if there are routes.
+
+        :return: The compiled template and None, or None and the compiled routes.
+        """
+        if self.template_routes:
+            return None, self._compile_router(self.template_routes)
+        return self._compile_template(self.suite_runner_template_path), None
+
+    def _compile_template(
+        self, suite_runner_template_path: str, overlay: Optional[dict] = None
+    ) -> SuiteRunnerTemplate:
+        """Load, compile and validate a suite runner template.
+
+        :param suite_runner_template_path: Path to the template.
+        :param overlay: Configuration that overrides the configuration from the environment
+                        for this template only.
+        :return: The compiled template.
+        :raises ValueError: If the configuration has no value for a field the template uses.
+        """
+        template = self._load_template(suite_runner_template_path)
+        self.configuration.validate(template_fields(template), overlay)
+        configuration = self.configuration.mapping()
+        if overlay:
+            configuration = {**configuration, **overlay}
+        # Configmaps that aren't set (e. g. etos_observability_configmap) are static, so they
+        # are removed from the template once instead of from every job.
+        suite_runner_template = SuiteRunnerTemplate(
+            template,
+            configuration,
+            prune=self.remove_empty_configmaps,
+        )
+        if self.shared_environment is not None:
+            self.shared_environment.extract(suite_runner_template)
+        self._validate_template(suite_runner_template)
+        return suite_runner_template
+
+    def _compile_router(self, template_routes_path: str) -> TemplateRouter:
+        """Load the suite runner template routes and compile and validate all templates."""
+        router = TemplateRouter.load(template_routes_path, self._compile_template)
+        LOGGER.info(
+            "Routing TERCCs to the suite runner templates %s",
+            ", ".join(repr(route.name) for route in router.routes),
+        )
+        return router
+
+    def _swap_template(self, suite_runner_template: SuiteRunnerTemplate):
+        """Use a new suite runner template for all TERCCs received from now on.
+
+        Each TERCC reads the template attribute once, so a job is always rendered from
+        either the old or the new template.
+        """
+        self.suite_runner_template = suite_runner_template
+
+    def _swap_router(self, router: TemplateRouter):
+        """Use new suite runner template routes for all TERCCs received from now on."""
+        self.router = router
+
+    def _start_template_watcher(self):
+        """Reload the suite runner template when it changes, unless disabled by interval 0.
+
+        When routing between templates, the routes file is watched and all templates are
+        reloaded when it changes. Templates mounted from the same ConfigMap as the routes
+        file are replaced together with it. The shared environment of a reloaded template is
+        created before the template is used.
+        """
+        interval = float(os.getenv("SUITE_STARTER_TEMPLATE_RELOAD_INTERVAL", "10"))
+        if interval <= 0:
+            return
+        if self.router is not None:
+            self.template_watcher = TemplateWatcher(
+                self.template_routes,
+                lambda path: self._publish_shared_environment(self._compile_router(path)),
+                self._swap_router,
+                interval,
+            )
+        else:
+            self.template_watcher = TemplateWatcher(
+                self.suite_runner_template_path,
+                lambda path: self._publish_shared_environment(self._compile_template(path)),
+                self._swap_template,
+                interval,
+            )
+        self.template_watcher.start()
+
+    def _validate_template(self, suite_runner_template: SuiteRunnerTemplate):
         """Validate that the suite runner template can be deployed."""
         data = {
             "EiffelTestExecutionRecipeCollectionCreatedEvent": "FakeEvent",
@@ -79,34 +445,35 @@ class SuiteStarter:  # pylint:disable=too-many-instance-attributes
             "job_name": "FakeName",
             "otel_context": "",
         }
-        formatted = suite_runner_template.format(**data, **self.etos.config.get("configuration"))
-        job = Job(in_cluster=bool(os.getenv("DOCKER_CONTEXT")))
-        job.load_yaml(formatted)
-
-    def _configure(self):
-        """Configure ETOS library."""
-        configuration = {
-            "docker_image": os.getenv("SUITE_RUNNER"),
-            "log_listener": os.getenv("LOG_LISTENER"),
-            "etos_configmap": os.getenv("ETOS_CONFIGMAP"),
-            "etos_observability_configmap": os.getenv("ETOS_OBSERVABILITY_CONFIGMAP"),
-            "etos_rabbitmq_secret": os.getenv("ETOS_RABBITMQ_SECRET"),
-            "ttl": os.getenv("ETOS_ESR_TTL", "3600"),
-            "termination_grace_period": os.getenv("ETOS_TERMINATION_GRACE_PERIOD", "300"),
-            "sidecar_image": os.getenv("ETOS_SIDECAR_IMAGE"),
-            "otel_exporter_otlp_endpoint": os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") or "null",
-        }
-        self.etos.config.set("configuration", configuration)
+        body = suite_runner_template.render(**data)
+        assert isinstance(body, dict), "Suite runner template is not a Kubernetes object"
+
+    def _configure(self) -> SuiteRunnerConfiguration:
+        """Load and validate the static configuration of the suite runner templates.
+
+        The configuration is also set in the ETOS library configuration, but the suite
+        starter only reads the snapshot that is returned.
+
+        :return: The static configuration.
+        :raises ValueError: If the configuration is not valid.
+        """
+        configuration = SuiteRunnerConfiguration.from_environment()
+        self.etos.config.set("configuration", dict(configuration.mapping()))
+        LOGGER.info("Static data: %r", configuration)
+        return configuration
 
-    def _get_current_context(self):
-        """Get current OpenTelemetry context."""
-        ctx = context.get_current()
-        LOGGER.info("Current OpenTelemetry context: %s", ctx)
+    def _get_current_context(self, span=None):
+        """Get current OpenTelemetry context.
+
+        :param span: Span to propagate as the parent of the suite runner, instead of the
+                     current span.
+        """
         carrier = {}
         # inject() creates a dict with context reference,
         # e. g. {'traceparent': '00-0be6c260d9cbe9772298eaf19cb90a5b-371353ee8fbd3ced-01'}
-        inject(carrier)
+        inject(carrier, context=None if span is None else trace.set_span_in_context(span))
         env = ",".join(f"{k}={v}" for k, v in carrier.items())
+        LOGGER.debug("Current OpenTelemetry context: %s", env)
         return env
 
     @classmethod
@@ -120,11 +487,92 @@ class SuiteStarter:  # pylint:disable=too-many-instance-attributes
                 else:
                     cls.remove_empty_configmaps(value)
         elif isinstance(data, list):
-            while element_to_remove in data:
-                data.remove(element_to_remove)
+            data[:] = [item for item in data if item != element_to_remove]
             for item in data:
                 cls.remove_empty_configmaps(item)
 
+    def _build_job(self, event, span) -> SuiteRunnerJob:
+        """Build a suite runner job from a TERCC event.
+
+        No requests are sent to Kubernetes, a TERCC that is stored out of band is only
+        stored when the job is created.
+
+        :param event: EiffelTestExecutionRecipeCollectionCreatedEvent (TERCC)
+        :type event: :obj: `eiffellib.events.base_event.EiffelTestExecutionRecipeCollectionCreatedEvent`  # noqa pylint:disable=line-too-long
+        :param span: The span to add suite attributes to.
+        :return: The suite runner job.
+        """
+        suite_id = event.meta.event_id
+        self._identify(suite_id)
+        fields = {SUITE_ID: suite_id}
+        LOGGER.info("Received a TERCC event. Build data for ESR.", extra=fields)
+        tercc = json.dumps(event.json, separators=(",", ":"))
+        offload = self.tercc_store is not None and self.tercc_store.offload(tercc)
+        data = {"EiffelTestExecutionRecipeCollectionCreatedEvent": REFERENCE if offload else tercc}
+        data["suite_id"] = suite_id
+        with self._phase(span, "context"):
+            # The phase span is current here, but the suite runner is a child of the suite.
+            data["otel_context"] = self._get_current_context(span)
+        span.set_attribute(SemConvAttributes.SUITE_ID, suite_id)
+
+        job_name = suite_runner_job_name(suite_id)
+        span.set_attribute(SemConvAttributes.SUITE_RUNNER_JOB_ID, job_name)
+        data["job_name"] = job_name
+
+        # The TERCC can be megabytes, so it is only logged in full at DEBUG level.
+        LOGGER.debug("Dynamic data: %r", data, extra=fields)
+        if self._suite_logged(suite_id):
+            LOGGER.info(
+                "Dynamic data for ESR",
+                extra={
+                    **fields,
+                    "job_name": job_name,
+                    "tercc": truncate(tercc, self.log_field_limit),
+                    "tercc_size": len(tercc),
+                    "tercc_offloaded": bool(offload),
+                    "otel_context": data["otel_context"],
+                },
+            )
+        try:
+            assert data["EiffelTestExecutionRecipeCollectionCreatedEvent"]
+        except AssertionError as exception:
+            LOGGER.critical("Incomplete data for ESR. %r", exception)
+            span.record_exception(exception)
+            span.set_status(trace.Status(trace.StatusCode.ERROR))
+            raise
+
+        template_name, suite_runner_template = self._route(event, span)
+        with self._phase(span, "render", RENDER_TIME.labels(template=template_name)):
+            body = suite_runner_template.render(**data)
+        config_maps = []
+        if offload:
+            with self._phase(span, "offload"):
+                config_maps = self.tercc_store.config_maps(suite_id, tercc)
+                self.tercc_store.mount(body, config_maps)
+        if span.is_recording():
+            span.set_attribute(TEMPLATE_SIZE, len(suite_runner_template.template))
+            span.set_attribute(BODY_SIZE, len(json.dumps(body)))
+        return SuiteRunnerJob(job_name, body, template_name, config_maps)
+
+    def _route(self, event, span) -> tuple[str, SuiteRunnerTemplate]:
+        """Get the suite runner template to render the job of a TERCC from.
+
+        :param event: TERCC to route.
+        :param span: The span to add the route to.
+        :return: Name of the template and the compiled template.
+        """
+        router = self.router
+        if router is None:
+            return DEFAULT_TEMPLATE, self.suite_runner_template
+        route = router.route(event.json)
+        LOGGER.info(
+            "Routed TERCC to the suite runner template %r",
+            route.name,
+            extra={SUITE_ID: event.meta.event_id},
+        )
+        span.set_attribute(TEMPLATE_ROUTE, route.name)
+        return route.name, route.template
+
     def suite_runner_callback(self, event, _):
         """Start a suite runner on a TERCC event.
 
@@ -133,40 +581,204 @@ class SuiteStarter:  # pylint:disable=too-many-instance-attributes
         :return: Whether event was ACK:ed or not.
         :rtype: bool
         """
-        with self.tracer.start_as_current_span("suite", context=context.get_current()) as span:
-            suite_id = event.meta.event_id
-            FORMAT_CONFIG.identifier = suite_id
-            LOGGER.info("Received a TERCC event. Build data for ESR.")
-            data = {"EiffelTestExecutionRecipeCollectionCreatedEvent": json.dumps(event.json)}
-            data["suite_id"] = suite_id
-            data["otel_context"] = self._get_current_context()
-            span.set_attribute(SemConvAttributes.SUITE_ID, suite_id)
-
-            job = Job(in_cluster=bool(os.getenv("DOCKER_CONTEXT")))
-            job_name = job.uniqueify(f"suite-runner-{suite_id}").lower()
-            span.set_attribute(SemConvAttributes.SUITE_RUNNER_JOB_ID, job_name)
-            data["job_name"] = job_name
-
-            LOGGER.info("Dynamic data: %r", data)
-            LOGGER.info("Static data: %r", self.etos.config.get("configuration"))
-            try:
-                assert data["EiffelTestExecutionRecipeCollectionCreatedEvent"]
-            except AssertionError as exception:
-                LOGGER.critical("Incomplete data for ESR. %r", exception)
-                span.record_exception(exception)
-                span.set_status(trace.Status(trace.StatusCode.ERROR))
-                raise
+        self._received(event)
+        try:
+            self._launch(event)
+        except Exception:
+            TERCCS_NACKED.inc()
+            raise
+        self._acked(event)
+        return True
 
-            body = job.load_yaml(
-                self.suite_runner_template.format(**data, **self.etos.config.get("configuration"))
+    def _launch(self, event):
+        """Launch a suite runner for a TERCC, unless it has already been launched."""
+        if self._launched(event):
+            return
+        with self._launch_context(event) as job:
+            created = self._create_job(job)
+            if job.config_maps:
+                self._adopt(job, created)
+
+    def _adopt(self, job: SuiteRunnerJob, created: Any):
+        """Make a created job the owner of its TERCC ConfigMaps, without failing the launch.
+
+        The job has been created, so a failure here must not NACK the TERCC. The ConfigMaps
+        are then left behind when the job is deleted.
+
+        :param job: The suite runner job.
+        :param created: The job returned by the Kubernetes API when it was created.
+        """
+        try:
+            self.retry.call(lambda: self.tercc_store.adopt(job.body, created))
+        except Exception:  # pylint:disable=broad-exception-caught
+            LOGGER.exception(
+                "Failed to make %r the owner of its TERCC ConfigMaps, "
+                "they will not be deleted with it",
+                job.name,
             )
-            # Handle cases when some configmaps aren't set (e. g. etos_observability_configmap):
-            self.remove_empty_configmaps(body)
 
-            LOGGER.info("Starting new executor: %r", job_name)
-            job.create_job(body)
-            LOGGER.info("ESR successfully launched.")
-            return True
+    @contextmanager
+    def _launch_context(self, event):
+        """Trace, schedule, build and count the launch of a suite runner for a TERCC.
+
+        Everything in a launch but the requests to the Kubernetes API, which are sent by
+        the caller with the yielded job. A job that already exists is treated as launched.
+
+        :param event: TERCC to launch a suite runner for.
+        """
+        with self.tracer.start_as_current_span("suite", context=context.get_current()) as span:
+            with self._scheduled(event, span):
+                job = self._build_job(event, span)
+                try:
+                    with (
+                        self._admitted(job.name, span),
+                        self._launching(event, job.name, job.template, span),
+                    ):
+                        yield job
+                except Exception:
+                    SUITE_RUNNER_LAUNCH_FAILURES.labels(template=job.template).inc()
+                    raise
+                SUITE_RUNNERS_LAUNCHED.labels(template=job.template).inc()
+
+    def _create_job(self, job: SuiteRunnerJob):
+        """Create a suite runner job, retrying transient failures of the Kubernetes API.
+
+        The ConfigMaps of a TERCC that is stored out of band are created first, with the
+        same retries and behind the same circuit breaker as the job, and are deleted again
+        if the job can not be created. So are the ConfigMaps with the shared environment,
+        if they have not been created recently, in case they have been deleted.
+
+        :param job: The suite runner job.
+        :return: The created job.
+        :raises CircuitOpen: If the Kubernetes API has failed too many times in a row.
+        """
+        stored = False
+
+        def create_job():
+            nonlocal stored
+            if self.shared_environment is not None:
+                self.retry.call(self._publish_shared_environment)
+            if job.config_maps:
+                stored = True
+                self.retry.call(lambda: self.tercc_store.create(job.config_maps))
+            return self.retry.call(lambda: self.job.create_job(job.body))
+
+        try:
+            if self.breaker is not None:
+                return self.breaker.call(create_job)
+            return create_job()
+        except Exception as exception:
+            # A job that already exists was launched by another replica, or by an earlier
+            # delivery of the TERCC, and mounts the same ConfigMaps.
+            if stored and not already_exists(exception):
+                self.tercc_store.delete(job.config_maps)
+            raise
+
+    def _acked(self, event):
+        """Count and record a TERCC that is about to be ACK:ed."""
+        TERCCS_ACKED.inc()
+        self._record(event, ACKED)
+
+    def _received(self, event):
+        """Count and record a received TERCC and how long it took to reach the suite starter."""
+        self._record(event, RECEIVED)
+        TERCCS_RECEIVED.inc()
+        CONSUMER_LAG.set(max(time.time() - event.meta.time / 1000, 0.0))
+
+    def _launched(self, event) -> bool:
+        """Check whether a suite runner has already been launched for a TERCC by this process.
+
+        A TERCC is redelivered if it was NACK:ed, or if the connection to RabbitMQ was lost
+        before it was ACK:ed. If its suite runner was launched by another replica, creating
+        the job fails because the job name is derived from the suite ID.
+        """
+        if event.meta.event_id not in self.launched:
+            return False
+        self._identify(event.meta.event_id)
+        LOGGER.info(
+            "ESR has already been launched for this TERCC, skipping.",
+            extra={SUITE_ID: event.meta.event_id},
+        )
+        return True
+
+    @contextmanager
+    def _phase(self, span, name: str, histogram: Histogram = None):
+        """Time a phase of a suite runner launch.
+
+        The phase is traced as a child span of the suite span, but only if the suite span is
+        recording. When tracing is disabled or the suite span was not sampled, no spans are
+        created for the phases.
+
+        :param span: The suite span.
+        :param name: Name of the phase.
+        :param histogram: Prometheus histogram to observe the duration of the phase in.
+        """
+        with ExitStack() as stack:
+            if span.is_recording():
+                stack.enter_context(self.tracer.start_as_current_span(name))
+            if histogram is not None:
+                stack.enter_context(histogram.time())
+            yield
+
+    @contextmanager
+    def _scheduled(self, event, span):
+        """Wait for the fair scheduler to dispatch a TERCC, if there is a scheduler.
+
+        :param event: TERCC that is about to launch a suite runner.
+        :param span: The suite span.
+        """
+        if self.scheduler is None:
+            yield
+            return
+        key = self.scheduler.key(event.json)
+        with self._phase(span, "schedule"):
+            self.scheduler.acquire(key)
+        try:
+            yield
+        finally:
+            self.scheduler.release()
+
+    @contextmanager
+    def _admitted(self, job_name: str, span):
+        """Wait for admission control to admit a suite runner, if there is admission control.
+
+        :param job_name: Name of the suite runner job.
+        :param span: The suite span.
+        """
+        if self.admission is None:
+            yield
+            return
+        with self._phase(span, "admission"):
+            self.admission.reserve()
+        launched = None
+        try:
+            yield
+            launched = job_name
+        finally:
+            self.admission.release(launched)
+
+    @contextmanager
+    def _launching(self, event, job_name: str, template: str, span):
+        """Launch a suite runner job, treating a job that already exists as launched.
+
+        :param event: TERCC that the suite runner is launched for.
+        :param job_name: Name of the suite runner job.
+        :param template: Name of the template that the job was rendered from.
+        :param span: The suite span.
+        """
+        fields = {SUITE_ID: event.meta.event_id}
+        LOGGER.info("Starting new executor: %r", job_name, extra=fields)
+        try:
+            with self._phase(span, "create_job", CREATE_JOB_TIME.labels(template=template)):
+                yield
+        except Exception as exception:  # pylint:disable=broad-exception-caught
+            if not already_exists(exception):
+                raise
+            LOGGER.info("ESR %r has already been launched.", job_name, extra=fields)
+        else:
+            LOGGER.info("ESR successfully launched.", extra=fields)
+        self._record(event, SUBMITTED)
+        self.launched.add(event.meta.event_id)
 
     def run(self):
         """Run the SuiteStarter main loop.
@@ -180,14 +792,70 @@ class SuiteStarter:  # pylint:disable=too-many-instance-attributes
             "Suite starter is running and listening to "
             "events in the Eiffel context.\n"
             "Configmap:\n"
-            f"ETOS Suite Runner: {os.getenv('SUITE_RUNNER')}\n"
+            f"ETOS Suite Runner: {self.configuration.docker_image}\n"
         )
-        self.etos.monitor.keep_alive(body)  # Blocking.
+        self._start_metrics_server()
+        self._start_template_watcher()
+        # The ETOS monitor installs its SIGTERM and SIGINT handler when it starts keeping
+        # the suite starter alive, so the handler is wrapped on the monitor to drain the
+        # suite starter before the monitor announces the shutdown and exits.
+        monitor = self.etos.monitor
+        handle_shutdown = monitor._handle_shutdown  # pylint:disable=protected-access
+
+        def shutdown(*args, **kwargs):
+            self.drain()
+            handle_shutdown(*args, **kwargs)
+
+        monitor._handle_shutdown = shutdown  # pylint:disable=protected-access
+        monitor.keep_alive(body)  # Blocking.
+
+    def drain(self) -> DrainReport:
+        """Stop consuming TERCCs and wait for the suite runners being launched.
+
+        Launches in flight are given `SUITE_STARTER_DRAIN_TIMEOUT` seconds to finish.
+        Prefetched TERCCs that have not started are NACK:ed and requeued, and TERCCs
+        whose launches are still running at the deadline are returned to the queue when
+        the connection to RabbitMQ is closed.
+
+        :return: What happened to the TERCCs in flight.
+        """
+        LOGGER.info("Shutting down, draining for at most %.1fs", self.drain_timeout)
+        if self.template_watcher is not None:
+            self.template_watcher.stop()
+        report = DrainReport()
+        if isinstance(self.etos.subscriber, SuiteStarterSubscriber):
+            report = self.etos.subscriber.drain(self.drain_timeout)
+        if self.admission is not None:
+            self.admission.stop()
+        if self.breaker is not None:
+            self.breaker.stop()
+        if self.journal is not None and not report.abandoned:
+            self.journal.close()
+        LOGGER.info(
+            "Drained: %d launches finished, %d TERCCs requeued, %d launches abandoned",
+            *report,
+        )
+        return report
+
+    @staticmethod
+    def _start_metrics_server():
+        """Serve Prometheus metrics over HTTP, unless disabled by setting the port to 0."""
+        port = int(os.getenv("SUITE_STARTER_METRICS_PORT", "8000"))
+        if port:
+            LOGGER.info("Serving Prometheus metrics on port %d", port)
+            start_http_server(port)
 
 
 def main():
     """Entry point allowing external calls."""
-    suite_starter = SuiteStarter()
+    if os.getenv("SUITE_STARTER_ASYNC", "false").lower() == "true":
+        # The asyncio mode has optional dependencies.
+        # pylint:disable=import-outside-toplevel,cyclic-import
+        from .async_suite_starter import AsyncSuiteStarter
+
+        suite_starter = AsyncSuiteStarter()
+    else:
+        suite_starter = SuiteStarter()
     suite_starter.run()
 
 
@@ -196,5 +864,13 @@ def run():
     main()
 
 
+def dry_run():
+    """Entry point for rendering suite runner jobs without RabbitMQ or Kubernetes."""
+    # pylint:disable-next=import-outside-toplevel,cyclic-import
+    from .dryrun import main as render
+
+    raise SystemExit(render())
+
+
 if __name__ == "__main__":
     run()
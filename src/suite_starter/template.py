@@ -0,0 +1,119 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Suite runner template compilation."""
+
+import re
+from typing import Any, Callable, NamedTuple, Optional
+
+import yaml
+
+from .metrics import YAML_LOAD_TIME
+
+# Values that change for every TERCC. Everything else in the template is
+# static once the suite starter has been configured.
+DYNAMIC_KEYS = (
+    "EiffelTestExecutionRecipeCollectionCreatedEvent",
+    "suite_id",
+    "job_name",
+    "otel_context",
+)
+SENTINEL = "__suite_starter_slot_{}__"
+SENTINEL_REGEX = re.compile(SENTINEL.format(r"(\d+)"))
+# Same loader as :meth:`etos_lib.kubernetes.jobs.Job.load_yaml`, but backed by libyaml
+# when it is available, which loads the template several times faster.
+LOADER = getattr(yaml, "CLoader", yaml.Loader)
+
+
+class Slot(NamedTuple):
+    """A string in the template skeleton that contains dynamic values.
+
+    The format string only references dynamic keys, static values have already
+    been substituted when the template was compiled.
+    """
+
+    format_string: str
+
+    def fill(self, data: dict) -> str:
+        """Fill this slot with dynamic data."""
+        return self.format_string.format_map(data)
+
+
+class SuiteRunnerTemplate:  # pylint:disable=too-few-public-methods
+    """Suite runner template, compiled into a Kubernetes job skeleton.
+
+    The template is formatted with the static configuration and parsed as YAML
+    once. Strings that contain any of the `DYNAMIC_KEYS` are kept as slots in the
+    skeleton and filled in when rendering, which means that rendering a job
+    for a TERCC does not need to format or parse the template text again.
+    """
+
+    def __init__(
+        self,
+        template: str,
+        configuration: dict,
+        prune: Optional[Callable[[Any], None]] = None,
+    ):
+        """Compile the suite runner template.
+
+        :param template: Suite runner template text.
+        :param configuration: Static configuration to format the template with.
+        :param prune: Function that removes parts of the parsed template in place, before
+                      it is compiled. Since it only sees static values, the parts it removes
+                      are removed from every job rendered from the template.
+        """
+        self.template = template
+        self.configuration = configuration
+        sentinels = {key: SENTINEL.format(index) for index, key in enumerate(DYNAMIC_KEYS)}
+        formatted = template.format(**sentinels, **configuration)
+        with YAML_LOAD_TIME.time():
+            loaded = yaml.load(formatted, Loader=LOADER)
+        if prune is not None:
+            prune(loaded)
+        self.skeleton = self._compile(loaded)
+
+    @classmethod
+    def _compile(cls, node: Any) -> Any:
+        """Replace all strings containing dynamic sentinels with slots."""
+        if isinstance(node, dict):
+            return {cls._compile(key): cls._compile(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [cls._compile(item) for item in node]
+        if isinstance(node, str) and SENTINEL_REGEX.search(node):
+            escaped = node.replace("{", "{{").replace("}", "}}")
+            format_string = SENTINEL_REGEX.sub(
+                lambda match: f"{{{DYNAMIC_KEYS[int(match.group(1))]}}}", escaped
+            )
+            return Slot(format_string)
+        return node
+
+    @classmethod
+    def _render(cls, node: Any, data: dict) -> Any:
+        """Copy the skeleton, filling in slots with dynamic data."""
+        if isinstance(node, dict):
+            return {cls._render(key, data): cls._render(value, data) for key, value in node.items()}
+        if isinstance(node, list):
+            return [cls._render(item, data) for item in node]
+        if isinstance(node, Slot):
+            return node.fill(data)
+        return node
+
+    def render(self, **data: str) -> dict:
+        """Render a new Kubernetes job body from the template.
+
+        :param data: Dynamic data to render into the template. Must contain all `DYNAMIC_KEYS`.
+        :return: A new job body, which is safe to modify.
+        """
+        return self._render(self.skeleton, data)
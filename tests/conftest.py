@@ -14,3 +14,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Pytest configuration."""
+
+import os
+
+# None of the tests shall connect to RabbitMQ.
+os.environ["ETOS_DISABLE_SENDING_EVENTS"] = "1"  # True
+os.environ["ETOS_DISABLE_RECEIVING_EVENTS"] = "1"  # True
+# The test template uses the log listener image and the RabbitMQ secret, which the suite
+# starter requires to be configured.
+os.environ.setdefault("LOG_LISTENER", "etos-log-listener")
+os.environ.setdefault("ETOS_RABBITMQ_SECRET", "etos-rabbitmq")
@@ -0,0 +1,854 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Fake services for testing and benchmarking the suite starter without a cluster."""
+
+import asyncio
+import contextlib
+import datetime
+import json
+import logging
+import random
+import re
+import ssl
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from queue import SimpleQueue
+from typing import AsyncIterator, Callable, Iterator, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import pika
+from kubernetes import client  # pylint:disable=no-name-in-module
+
+LOGGER = logging.getLogger(__name__)
+
+RESOURCE_PATH = re.compile(
+    r"^/(?:apis/batch|api)/v1/namespaces/(?P<namespace>[^/]+)"
+    r"/(?P<resource>jobs|configmaps)(?:/(?P<name>[^/]+))?$"
+)
+KINDS = {"jobs": "jobs.batch", "configmaps": "configmaps"}
+LIST_KINDS = {"jobs": ("batch/v1", "JobList"), "configmaps": ("v1", "ConfigMapList")}
+
+
+def _selected(body: dict, selector: str) -> bool:
+    """Check whether a resource matches an equality based label selector, e.g. `a=b,c=d`."""
+    labels = body.get("metadata", {}).get("labels") or {}
+    for requirement in filter(None, selector.split(",")):
+        key, _, value = requirement.partition("=")
+        if labels.get(key.strip()) != value.lstrip("=").strip():
+            return False
+    return True
+
+
+def _self_signed_certificate(directory: Path) -> tuple[Path, Path]:
+    """Generate a self-signed certificate for localhost.
+
+    :param directory: Directory to store the certificate and key in.
+    :return: Path to certificate and key files.
+    """
+    # Only needed when running with TLS. pylint:disable=import-outside-toplevel
+    import ipaddress
+
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName(
+                [x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]
+            ),
+            critical=False,
+        )
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    certificate_path = directory.joinpath("tls.crt")
+    key_path = directory.joinpath("tls.key")
+    certificate_path.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    return certificate_path, key_path
+
+
+class _KubernetesHandler(BaseHTTPRequestHandler):
+    """Request handler for the fake Kubernetes API server."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def log_message(self, format, *args):  # pylint:disable=redefined-builtin
+        """Log requests at debug level instead of printing to stderr."""
+        LOGGER.debug(format, *args)
+
+    def setup(self):
+        """Count each new connection to the server."""
+        super().setup()
+        self.server.fake.connection_opened()
+
+    def _respond(self, status: HTTPStatus, body: dict, headers: Optional[dict] = None):
+        """Send a JSON response."""
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _status(
+        self, status: HTTPStatus, reason: str, message: str, headers: Optional[dict] = None
+    ):
+        """Send a Kubernetes Status response."""
+        self._respond(
+            status,
+            {
+                "kind": "Status",
+                "apiVersion": "v1",
+                "status": "Failure",
+                "message": message,
+                "reason": reason,
+                "code": status.value,
+            },
+            headers,
+        )
+
+    def _read_body(self) -> dict:
+        """Read a JSON request body."""
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _match(self) -> Optional[re.Match]:
+        """Match the request path against the resources of the fake, responding if unknown."""
+        match = RESOURCE_PATH.match(self.path.split("?")[0])
+        if match is None:
+            self._status(HTTPStatus.NOT_FOUND, "NotFound", f"{self.path} not found")
+        return match
+
+    def _write_chunk(self, data: bytes):
+        """Write a chunk of a chunked response."""
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _watch(self, resource: str, namespace: str, query: dict):
+        """Stream changes to resources as watch events until the watch times out."""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        selector = query.get("labelSelector", [""])[0]
+        for event in self.server.fake.watch(
+            resource,
+            namespace,
+            int(query.get("resourceVersion", ["0"])[0] or 0),
+            float(query.get("timeoutSeconds", ["300"])[0]),
+        ):
+            if event["type"] == "ERROR" or _selected(event["object"], selector):
+                self._write_chunk(json.dumps(event).encode("utf-8") + b"\n")
+        self._write_chunk(b"")
+
+    def do_GET(self):  # pylint:disable=invalid-name
+        """Get, list or watch resources."""
+        fake = self.server.fake
+        fake.request_received()
+        match = self._match()
+        if match is None:
+            return
+        resource, namespace, name = match.group("resource", "namespace", "name")
+        query = parse_qs(urlsplit(self.path).query)
+        if name is not None:
+            body = fake.get(resource, namespace, name)
+            if body is None:
+                self._status(
+                    HTTPStatus.NOT_FOUND, "NotFound", f'{KINDS[resource]} "{name}" not found'
+                )
+                return
+            self._respond(HTTPStatus.OK, body)
+        elif query.get("watch", ["false"])[0].lower() in ("true", "1"):
+            self._watch(resource, namespace, query)
+        else:
+            items, resource_version = fake.list(resource, namespace)
+            api_version, kind = LIST_KINDS[resource]
+            selector = query.get("labelSelector", [""])[0]
+            self._respond(
+                HTTPStatus.OK,
+                {
+                    "apiVersion": api_version,
+                    "kind": kind,
+                    "metadata": {"resourceVersion": str(resource_version)},
+                    "items": [item for item in items if _selected(item, selector)],
+                },
+            )
+
+    def do_POST(self):  # pylint:disable=invalid-name
+        """Create a resource."""
+        body = self._read_body()
+        fake = self.server.fake
+        fake.request_received()
+        match = self._match()
+        if match is None:
+            return
+        if fake.latency:
+            time.sleep(fake.latency)
+        fault = fake.fault()
+        if fault is not None:
+            status, headers = fault
+            self._status(status, status.phrase.replace(" ", ""), status.description, headers)
+            return
+        resource = match.group("resource")
+        created = fake.add(resource, match.group("namespace"), body)
+        if created is None:
+            name = body.get("metadata", {}).get("name")
+            self._status(
+                HTTPStatus.CONFLICT,
+                "AlreadyExists",
+                f'{KINDS[resource]} "{name}" already exists',
+            )
+            return
+        self._respond(HTTPStatus.CREATED, created)
+
+    def do_PATCH(self):  # pylint:disable=invalid-name
+        """Merge a patch into a resource."""
+        body = self._read_body()
+        fake = self.server.fake
+        fake.request_received()
+        match = self._match()
+        if match is None:
+            return
+        resource, name = match.group("resource"), match.group("name")
+        patched = fake.patch(resource, match.group("namespace"), name, body)
+        if patched is None:
+            self._status(HTTPStatus.NOT_FOUND, "NotFound", f'{KINDS[resource]} "{name}" not found')
+            return
+        self._respond(HTTPStatus.OK, patched)
+
+    def do_DELETE(self):  # pylint:disable=invalid-name
+        """Delete a resource."""
+        self._read_body()
+        fake = self.server.fake
+        fake.request_received()
+        match = self._match()
+        if match is None:
+            return
+        resource, name = match.group("resource"), match.group("name")
+        deleted = fake.delete(resource, match.group("namespace"), name)
+        if deleted is None:
+            self._status(HTTPStatus.NOT_FOUND, "NotFound", f'{KINDS[resource]} "{name}" not found')
+            return
+        self._respond(HTTPStatus.OK, deleted)
+
+
+class _Server(ThreadingHTTPServer):
+    """HTTP server with a reference to the fake it serves."""
+
+    daemon_threads = True
+
+    def __init__(self, fake: "FakeKubernetes", *args, **kwargs):
+        """Store a reference to the fake."""
+        self.fake = fake
+        super().__init__(*args, **kwargs)
+
+
+class FakeKubernetes:  # pylint:disable=too-many-instance-attributes
+    """A fake Kubernetes API server, served over HTTP(S) on localhost.
+
+    Only implements the parts of the API that the suite starter uses, and keeps all
+    objects in memory.
+
+    Usage::
+
+        with FakeKubernetes(tls=True) as fake:
+            api = client.BatchV1Api(client.ApiClient(fake.configuration()))
+            api.create_namespaced_job("default", body)
+    """
+
+    def __init__(self, latency: float = 0.0, tls: bool = False):
+        """Initialize the fake.
+
+        :param latency: Seconds to wait before responding to each create request.
+        :param tls: Serve the API over HTTPS using a self-signed certificate.
+        """
+        self.latency = latency
+        self.tls = tls
+        self.jobs: dict[str, dict[str, dict]] = {}
+        self.configmaps: dict[str, dict[str, dict]] = {}
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        # Notified when a resource changes, for watches.
+        self.changed = threading.Condition(self.lock)
+        self.resource_version = 0
+        self.events: list[tuple[int, str, str, dict]] = []
+        self.compacted = 0
+        self.compactions = 0
+        self.stopping = False
+        self.faults: deque[tuple[HTTPStatus, dict]] = deque()
+        self.error_rate = 0.0
+        self.error: Optional[tuple[HTTPStatus, dict]] = None
+        self.random = random.Random()
+        self.__server: Optional[_Server] = None
+        self.__thread: Optional[threading.Thread] = None
+        self.__directory: Optional[tempfile.TemporaryDirectory] = None
+        self.certificate: Optional[Path] = None
+
+    def __enter__(self) -> "FakeKubernetes":
+        """Start the fake API server."""
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        """Stop the fake API server."""
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        """URL to the fake API server."""
+        assert self.__server is not None, "Fake Kubernetes is not started"
+        host, port = self.__server.server_address[:2]
+        return f"{'https' if self.tls else 'http'}://{host}:{port}"
+
+    def start(self):
+        """Start serving the fake API in a thread."""
+        self.stopping = False
+        self.__server = _Server(self, ("127.0.0.1", 0), _KubernetesHandler)
+        if self.tls:
+            # pylint:disable=consider-using-with
+            self.__directory = tempfile.TemporaryDirectory()
+            self.certificate, key = _self_signed_certificate(Path(self.__directory.name))
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.certificate, key)
+            self.__server.socket = context.wrap_socket(self.__server.socket, server_side=True)
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """Stop the fake API server."""
+        with self.changed:
+            self.stopping = True
+            self.changed.notify_all()
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+        if self.__directory is not None:
+            self.__directory.cleanup()
+            self.__directory = None
+
+    def configuration(self) -> client.Configuration:
+        """Kubernetes client configuration for connecting to the fake API server."""
+        configuration = client.Configuration()
+        configuration.host = self.url
+        configuration.api_key = {"authorization": "Bearer fake"}
+        if self.certificate is not None:
+            configuration.ssl_ca_cert = str(self.certificate)
+        return configuration
+
+    def connection_opened(self):
+        """Count a new connection to the server."""
+        with self.lock:
+            self.connections += 1
+
+    def request_received(self):
+        """Count a new request to the server."""
+        with self.lock:
+            self.requests += 1
+
+    def fail(self, status: HTTPStatus, count: int = 1, retry_after: Optional[str] = None):
+        """Fail the next create requests, like an API server that is throttling or unavailable.
+
+        :param status: Status to respond with, e.g. 429 or 503.
+        :param count: Number of create requests to fail.
+        :param retry_after: Value of the Retry-After header to respond with, if any.
+        """
+        headers = {} if retry_after is None else {"Retry-After": retry_after}
+        with self.lock:
+            self.faults.extend((status, headers) for _ in range(count))
+
+    def fail_randomly(
+        self,
+        status: HTTPStatus,
+        rate: float,
+        retry_after: Optional[str] = None,
+        seed: Optional[int] = None,
+    ):
+        """Fail a share of all create requests, after the faults queued by :meth:`fail`.
+
+        :param status: Status to respond with, e.g. 429 or 503.
+        :param rate: Share of create requests to fail, from 0 to 1.
+        :param retry_after: Value of the Retry-After header to respond with, if any.
+        :param seed: Seed for choosing the requests to fail, for reproducible runs.
+        """
+        if not 0 <= rate <= 1:
+            raise ValueError(f"Error rate must be between 0 and 1, was {rate}")
+        with self.lock:
+            self.error_rate = rate
+            self.error = (status, {} if retry_after is None else {"Retry-After": retry_after})
+            self.random.seed(seed)
+
+    def fault(self) -> Optional[tuple[HTTPStatus, dict]]:
+        """Get the next fault to respond to a create request with, if any."""
+        with self.lock:
+            if self.faults:
+                return self.faults.popleft()
+            if self.error_rate and self.random.random() < self.error_rate:
+                return self.error
+            return None
+
+    def add(self, resource: str, namespace: str, body: dict) -> Optional[dict]:
+        """Add a resource to the fake cluster.
+
+        :param resource: Type of resource to add, "jobs" or "configmaps".
+        :param namespace: Namespace to add the resource to.
+        :param body: Resource to add.
+        :return: The created resource, or None if one with the same name already exists.
+        """
+        name = body.setdefault("metadata", {}).get("name")
+        with self.lock:
+            resources = getattr(self, resource).setdefault(namespace, {})
+            if name in resources:
+                return None
+            body["metadata"]["uid"] = str(uuid.uuid4())
+            body["metadata"]["creationTimestamp"] = datetime.datetime.now(
+                datetime.timezone.utc
+            ).strftime("%Y-%m-%dT%H:%M:%SZ")
+            if resource == "jobs":
+                body.setdefault("status", {})
+            resources[name] = body
+            self._changed("ADDED", resource, namespace, body)
+        return body
+
+    def add_job(self, namespace: str, body: dict) -> Optional[dict]:
+        """Add a job to the fake cluster.
+
+        :param namespace: Namespace to add the job to.
+        :param body: Job to add.
+        :return: The created job, or None if a job with the same name already exists.
+        """
+        return self.add("jobs", namespace, body)
+
+    def patch(self, resource: str, namespace: str, name: str, patch: dict) -> Optional[dict]:
+        """Merge a patch into a resource in the fake cluster.
+
+        Dictionaries are merged recursively and all other values, including lists, are
+        replaced, which is enough for the patches the suite starter sends.
+
+        :param resource: Type of resource to patch, "jobs" or "configmaps".
+        :param namespace: Namespace of the resource.
+        :param name: Name of the resource.
+        :param patch: Patch to merge into the resource.
+        :return: The patched resource, or None if it does not exist.
+        """
+
+        def merge(target: dict, source: dict):
+            for key, value in source.items():
+                if isinstance(value, dict) and isinstance(target.get(key), dict):
+                    merge(target[key], value)
+                else:
+                    target[key] = value
+
+        with self.lock:
+            body = getattr(self, resource).get(namespace, {}).get(name)
+            if body is not None:
+                merge(body, patch)
+                self._changed("MODIFIED", resource, namespace, body)
+        return body
+
+    def _changed(self, event_type: str, resource: str, namespace: str, body: dict):
+        """Record a change to a resource for watches. Must be called with the lock held."""
+        self.resource_version += 1
+        body["metadata"]["resourceVersion"] = str(self.resource_version)
+        # Copy the resource, since it can be changed again before the event is sent.
+        event = {"type": event_type, "object": json.loads(json.dumps(body))}
+        self.events.append((self.resource_version, resource, namespace, event))
+        self.changed.notify_all()
+
+    def get(self, resource: str, namespace: str, name: str) -> Optional[dict]:
+        """Get a resource from the fake cluster.
+
+        :param resource: Type of resource to get, "jobs" or "configmaps".
+        :param namespace: Namespace of the resource.
+        :param name: Name of the resource.
+        :return: The resource, or None if it does not exist.
+        """
+        with self.lock:
+            return getattr(self, resource).get(namespace, {}).get(name)
+
+    def list(self, resource: str, namespace: str) -> tuple[list[dict], int]:
+        """List the resources of a type in a namespace of the fake cluster.
+
+        :param resource: Type of resources to list, "jobs" or "configmaps".
+        :param namespace: Namespace to list resources in.
+        :return: The resources and the resource version to watch for changes from.
+        """
+        with self.lock:
+            return list(getattr(self, resource).get(namespace, {}).values()), self.resource_version
+
+    def delete(self, resource: str, namespace: str, name: str) -> Optional[dict]:
+        """Delete a resource from the fake cluster.
+
+        :param resource: Type of resource to delete, "jobs" or "configmaps".
+        :param namespace: Namespace of the resource.
+        :param name: Name of the resource.
+        :return: The deleted resource, or None if it did not exist.
+        """
+        with self.lock:
+            body = getattr(self, resource).get(namespace, {}).pop(name, None)
+            if body is not None:
+                self._changed("DELETED", resource, namespace, body)
+        return body
+
+    def finish_job(self, namespace: str, name: str, condition: str = "Complete") -> Optional[dict]:
+        """Finish a job in the fake cluster, like the job controller does.
+
+        :param namespace: Namespace of the job.
+        :param name: Name of the job.
+        :param condition: Condition that the job finished with, "Complete" or "Failed".
+        :return: The finished job, or None if it does not exist.
+        """
+        counter = "succeeded" if condition == "Complete" else "failed"
+        status = {counter: 1, "conditions": [{"type": condition, "status": "True"}]}
+        return self.patch("jobs", namespace, name, {"status": status})
+
+    def compact(self):
+        """Forget all changes so far, which expires all watches, like etcd compaction does."""
+        with self.changed:
+            self.events.clear()
+            self.compacted = self.resource_version
+            self.compactions += 1
+            self.changed.notify_all()
+
+    def watch(
+        self, resource: str, namespace: str, resource_version: int, timeout: float
+    ) -> Iterator[dict]:
+        """Watch for changes to resources of a type in a namespace of the fake cluster.
+
+        :param resource: Type of resources to watch, "jobs" or "configmaps".
+        :param namespace: Namespace to watch resources in.
+        :param resource_version: Resource version to watch for changes after.
+        :param timeout: Seconds to watch for before returning.
+        :return: Iterator of watch events. If the resource version has been compacted, or
+                 is compacted while watching, the last event is an error with status 410 Gone.
+        """
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            compactions = self.compactions
+        while True:
+            with self.changed:
+                if resource_version < self.compacted or compactions != self.compactions:
+                    events = None
+                else:
+                    events = [
+                        event
+                        for version, kind, where, event in self.events
+                        if version > resource_version and kind == resource and where == namespace
+                    ]
+                    resource_version = self.resource_version
+                    remaining = deadline - time.monotonic()
+                    if not events:
+                        if self.stopping or remaining <= 0:
+                            return
+                        self.changed.wait(remaining)
+                        continue
+            if events is None:
+                yield {
+                    "type": "ERROR",
+                    "object": {
+                        "kind": "Status",
+                        "apiVersion": "v1",
+                        "status": "Failure",
+                        "message": "too old resource version",
+                        "reason": "Expired",
+                        "code": HTTPStatus.GONE.value,
+                    },
+                }
+                return
+            yield from events
+
+
+class InMemoryMessage:
+    """A message in an :obj:`InMemoryQueue`, with the same interface as an aio-pika message."""
+
+    def __init__(self, queue: "InMemoryQueue", body: bytes, headers: Optional[dict] = None):
+        """Initialize the message.
+
+        :param queue: Queue that the message was published to.
+        :param body: Message body.
+        :param headers: Message headers.
+        """
+        self.queue = queue
+        self.body = body
+        self.headers = headers or {}
+        self.redelivered = False
+        self.published = time.monotonic()
+        self.acked: Optional[float] = None
+
+    async def ack(self):
+        """Acknowledge the message."""
+        self.acked = time.monotonic()
+        self.queue.acked.append(self)
+
+    async def nack(self, requeue: bool = True):
+        """Negatively acknowledge the message, requeueing it if requested."""
+        self.queue.nacked.append(self)
+        if requeue:
+            self.queue.requeue(self)
+
+    async def reject(self, requeue: bool = False):
+        """Reject the message, requeueing it if requested."""
+        self.queue.rejected.append(self)
+        if requeue:
+            self.queue.requeue(self)
+
+
+class InMemoryQueue:
+    """An in-memory stand-in for an AMQP queue, consumed like an aio-pika queue.
+
+    Messages are delivered in the order they were published. Requeued messages are
+    delivered again unless the queue has been closed, and iterating over the queue
+    stops once it is closed and all messages have been delivered.
+    """
+
+    def __init__(self):
+        """Initialize an empty queue."""
+        self.__messages: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+        self.acked: list[InMemoryMessage] = []
+        self.nacked: list[InMemoryMessage] = []
+        self.rejected: list[InMemoryMessage] = []
+
+    def publish(self, body: bytes, headers: Optional[dict] = None) -> InMemoryMessage:
+        """Publish a message to the queue."""
+        message = InMemoryMessage(self, body, headers)
+        self.__messages.put_nowait(message)
+        return message
+
+    def requeue(self, message: InMemoryMessage):
+        """Requeue a message for redelivery, unless the queue is closed."""
+        if not self.closed:
+            message.redelivered = True
+            self.__messages.put_nowait(message)
+
+    def close(self):
+        """Close the queue, consumers stop when all published messages are delivered."""
+        self.closed = True
+        self.__messages.put_nowait(None)
+
+    @contextlib.asynccontextmanager
+    async def iterator(self) -> AsyncIterator[AsyncIterator[InMemoryMessage]]:
+        """Iterate over messages in the queue, like :meth:`aio_pika.Queue.iterator`."""
+        yield self.__iterate()
+
+    async def __iterate(self) -> AsyncIterator[InMemoryMessage]:
+        """Yield messages until the queue is closed and empty."""
+        while not (self.closed and self.__messages.empty()):
+            message = await self.__messages.get()
+            if message is not None:
+                yield message
+
+
+class InMemoryBroker:  # pylint:disable=too-many-instance-attributes
+    """An in-memory stand-in for a RabbitMQ connection and channel, for the threaded subscriber.
+
+    Serves as both the connection and the channel of a :obj:`pika.SelectConnection`: it runs
+    an I/O loop thread, in which messages are delivered to the consumer and the callbacks
+    added with `ioloop.add_callback` are run. Like RabbitMQ, at most `prefetch_count`
+    messages are delivered without being acknowledged.
+
+    Usage::
+
+        with InMemoryBroker() as broker:
+            broker.attach(subscriber)
+            broker.publish(body)
+    """
+
+    CONSUMER_TAG = "in-memory"
+
+    def __init__(self, exchange: str = "amq.fanout"):
+        """Initialize a broker with an empty queue.
+
+        :param exchange: Name of the exchange that messages are delivered from.
+        """
+        self.exchange = exchange
+        self.ioloop = self
+        self.prefetch_count = 0
+        self.acked: list[tuple[bytes, float]] = []
+        self.rejected: list[bytes] = []
+        self.requeued = 0
+        self.deliveries: Counter[bytes] = Counter()
+        self.closed = False
+        self.done = threading.Condition()
+        self.__tasks: SimpleQueue = SimpleQueue()
+        self.__ready: deque = deque()
+        self.__unacked: dict[int, tuple[bytes, float]] = {}
+        self.__delivery_tag = 0
+        self.__consumer: Optional[Callable] = None
+        self.__thread = threading.Thread(target=self._loop, name="InMemoryBroker", daemon=True)
+
+    def __enter__(self) -> "InMemoryBroker":
+        """Start the I/O loop."""
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *_):
+        """Stop the I/O loop."""
+        self.__tasks.put(None)
+        self.__thread.join()
+
+    def _loop(self):
+        """Run callbacks until stopped."""
+        while True:
+            callback = self.__tasks.get()
+            if callback is None:
+                return
+            callback()
+
+    def add_callback(self, callback: Callable):
+        """Run a callback in the I/O loop thread, like `pika.SelectConnection.ioloop`."""
+        self.__tasks.put(callback)
+
+    def attach(self, subscriber):
+        """Make a RabbitMQ subscriber consume from this broker instead of RabbitMQ.
+
+        :param subscriber: A :obj:`eiffellib.subscribers.RabbitMQSubscriber` that has not
+                           been started.
+        """
+        # pylint:disable=protected-access
+        subscriber._connection = self
+        subscriber._channel = self
+        subscriber._on_start()
+        self.add_callback(
+            lambda: self.basic_qos(subscriber.prefetch_count, callback=subscriber._start)
+        )
+
+    def publish(self, body: bytes):
+        """Publish a message to the queue, from any thread."""
+        published = time.monotonic()
+        self.add_callback(lambda: self._enqueue(body, published))
+
+    def _enqueue(self, body: bytes, published: float):
+        """Queue a message and deliver it if the consumer has room."""
+        self.__ready.append((body, published))
+        self._deliver()
+
+    def _deliver(self):
+        """Deliver queued messages to the consumer, up to the prefetch count."""
+        while self.__consumer is not None and self.__ready:
+            if self.prefetch_count and len(self.__unacked) >= self.prefetch_count:
+                return
+            self.__delivery_tag += 1
+            body, _ = self.__unacked[self.__delivery_tag] = self.__ready.popleft()
+            self.deliveries[body] += 1
+            method = pika.spec.Basic.Deliver(
+                consumer_tag=self.CONSUMER_TAG,
+                delivery_tag=self.__delivery_tag,
+                exchange=self.exchange,
+            )
+            self.__consumer(self, method, pika.BasicProperties(headers={}), body)
+
+    def _settle(self, delivery_tag: int) -> tuple[bytes, float]:
+        """Remove an unacknowledged message and deliver more."""
+        if self.closed:
+            raise pika.exceptions.ChannelWrongStateError("Channel is closed.")
+        self.add_callback(self._deliver)
+        return self.__unacked.pop(delivery_tag)
+
+    def basic_qos(self, prefetch_count: int, callback: Optional[Callable] = None):
+        """Set the prefetch count."""
+        self.prefetch_count = prefetch_count
+        if callback is not None:
+            callback(None)
+
+    def basic_consume(self, _, on_message_callback: Callable) -> str:
+        """Start delivering messages to a consumer."""
+        self.__consumer = on_message_callback
+        self.add_callback(self._deliver)
+        return self.CONSUMER_TAG
+
+    def basic_cancel(self, consumer_tag: str, callback: Optional[Callable] = None):
+        """Stop delivering messages to the consumer."""
+        self.__consumer = None
+        if callback is not None:
+            callback(None, consumer_tag)
+
+    def close(self):
+        """Close the channel, returning unacknowledged messages to the queue like RabbitMQ."""
+        self.closed = True
+        self.__consumer = None
+        self.__ready.extendleft(reversed(self.__unacked.values()))
+        self.__unacked.clear()
+
+    @property
+    def ready(self) -> int:
+        """Get the number of messages in the queue that have not been delivered."""
+        return len(self.__ready)
+
+    @property
+    def unacked(self) -> int:
+        """Get the number of messages that have been delivered but not acknowledged."""
+        return len(self.__unacked)
+
+    def add_on_cancel_callback(self, _):
+        """Ignore remote cancellation callbacks, the consumer is never cancelled remotely."""
+
+    def basic_ack(self, delivery_tag: int):
+        """Acknowledge a message."""
+        body, published = self._settle(delivery_tag)
+        with self.done:
+            self.acked.append((body, time.monotonic() - published))
+            self.done.notify_all()
+
+    def basic_reject(self, delivery_tag: int, requeue: bool = True):
+        """Reject a message, requeueing it if requested."""
+        body, published = self._settle(delivery_tag)
+        if requeue:
+            self.requeued += 1
+            self.__ready.append((body, published))
+            return
+        with self.done:
+            self.rejected.append(body)
+            self.done.notify_all()
+
+    def settled(self) -> int:
+        """Get the number of messages that have been acknowledged or rejected."""
+        return len(self.acked) + len(self.rejected)
+
+    def wait(self, count: int, timeout: Optional[float] = None) -> bool:
+        """Wait until a number of messages have been acknowledged or rejected."""
+        with self.done:
+            return self.done.wait_for(lambda: self.settled() >= count, timeout)
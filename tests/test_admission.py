@@ -0,0 +1,218 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for admission control of suite runners."""
+
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from unittest import TestCase
+
+from eiffellib.events import EiffelTestExecutionRecipeCollectionCreatedEvent
+from etos_lib.lib.config import Config
+from kubernetes import client
+from mock import patch
+
+from suite_starter.admission import AdmissionControl, AdmissionTimeout
+from suite_starter.suite_starter import SuiteStarter
+
+from .fakes import FakeKubernetes
+from .helpers import step
+
+BASE_PATH = Path(__file__).parent
+
+
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    """Wait until a predicate is true."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def job(name: str, app: str = "suite-runner") -> dict:
+    """Create a minimal job."""
+    return {
+        "apiVersion": "batch/v1",
+        "kind": "Job",
+        "metadata": {"name": name, "labels": {"app": app}},
+        "spec": {"template": {"spec": {"containers": [], "restartPolicy": "Never"}}},
+    }
+
+
+class TestAdmissionControl(TestCase):
+    """Tests for AdmissionControl."""
+
+    def setUp(self):
+        self.fake = FakeKubernetes()
+        self.fake.start()
+        self.addCleanup(self.fake.stop)
+        self.batch_v1 = client.BatchV1Api(client.ApiClient(self.fake.configuration()))
+
+    def _admission_control(self, ceiling: int, timeout: float) -> AdmissionControl:
+        """Start admission control against the fake Kubernetes API."""
+        admission = AdmissionControl(self.batch_v1, "etos", ceiling, timeout, watch_timeout=1)
+        admission.start()
+        self.addCleanup(admission.stop)
+        return admission
+
+    def test_active_suite_runners(self):
+        """Test that admission control caches the active suite runner jobs.
+
+        Approval criteria:
+            - Only suite runner jobs that have not finished shall be counted as active.
+            - The cache shall be updated from the watch, without listing jobs again.
+
+        Test steps:
+            1. Create suite runner jobs, a finished suite runner job and another job.
+            2. Start admission control and verify that the active suite runners are counted.
+            3. Create a suite runner job and finish another one.
+            4. Verify that the cache was updated without listing the jobs again.
+        """
+        step("Create suite runner jobs, a finished suite runner job and another job.")
+        for name in ("suite-runner-a", "suite-runner-b", "suite-runner-c"):
+            self.fake.add_job("etos", job(name))
+        self.fake.finish_job("etos", "suite-runner-c", "Failed")
+        self.fake.add_job("etos", job("other", app="other"))
+
+        step("Start admission control and verify that the active suite runners are counted.")
+        admission = self._admission_control(ceiling=10, timeout=1)
+        self.assertTrue(wait_until(lambda: len(admission) == 2))
+        requests = self.fake.requests
+
+        step("Create a suite runner job and finish another one.")
+        self.fake.add_job("etos", job("suite-runner-d"))
+        self.fake.finish_job("etos", "suite-runner-a")
+        self.fake.delete("jobs", "etos", "suite-runner-b")
+
+        step("Verify that the cache was updated without listing the jobs again.")
+        self.assertTrue(wait_until(lambda: len(admission) == 1))
+        self.assertLessEqual(self.fake.requests - requests, 1)
+
+    def test_ceiling(self):
+        """Test that suite runners are admitted only when there is room below the ceiling.
+
+        Approval criteria:
+            - A suite runner shall be admitted while fewer than the ceiling are active.
+            - A suite runner shall wait for an active suite runner to finish.
+            - A suite runner that is not admitted within the timeout shall be denied.
+
+        Test steps:
+            1. Start admission control with a ceiling of 2 and one active suite runner.
+            2. Reserve room for a suite runner and launch it.
+            3. Verify that the next suite runner is denied after the timeout.
+            4. Reserve room for a suite runner while another one finishes.
+            5. Verify that the suite runner was admitted when the other one finished.
+        """
+        step("Start admission control with a ceiling of 2 and one active suite runner.")
+        self.fake.add_job("etos", job("suite-runner-a"))
+        admission = self._admission_control(ceiling=2, timeout=0.2)
+
+        step("Reserve room for a suite runner and launch it.")
+        admission.reserve()
+        self.fake.add_job("etos", job("suite-runner-b"))
+        admission.release("suite-runner-b")
+
+        step("Verify that the next suite runner is denied after the timeout.")
+        with self.assertRaises(AdmissionTimeout):
+            admission.reserve()
+
+        step("Reserve room for a suite runner while another one finishes.")
+        admission.timeout = 5
+        thread = threading.Thread(target=admission.reserve)
+        thread.start()
+        time.sleep(0.1)
+        self.assertTrue(thread.is_alive())
+        self.fake.finish_job("etos", "suite-runner-a")
+
+        step("Verify that the suite runner was admitted when the other one finished.")
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        admission.release(None)
+        self.assertEqual(len(admission), 1)
+
+    def test_expired_watch(self):
+        """Test that admission control lists the jobs again when its watch expires.
+
+        Approval criteria:
+            - Admission control shall recover from an expired watch and keep the cache updated.
+
+        Test steps:
+            1. Start admission control.
+            2. Expire the watch and create a suite runner job.
+            3. Verify that the suite runner job is counted as active.
+        """
+        step("Start admission control.")
+        admission = self._admission_control(ceiling=10, timeout=1)
+        self.assertTrue(wait_until(lambda: self.fake.requests >= 2))
+
+        step("Expire the watch and create a suite runner job.")
+        self.fake.compact()
+        self.fake.add_job("etos", job("suite-runner-a"))
+
+        step("Verify that the suite runner job is counted as active.")
+        self.assertTrue(wait_until(lambda: len(admission) == 1))
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    def test_suite_starter_admission(self, load_config):
+        """Test that suite starter NACKs TERCCs when too many suite runners are active.
+
+        Approval criteria:
+            - A TERCC shall be NACK:ed when its suite runner is not admitted in time.
+            - The TERCC shall launch its suite runner when it is redelivered with room.
+
+        Test steps:
+            1. Initialize SuiteStarter with admission control and a ceiling of 1.
+            2. Launch a suite runner and deliver another TERCC.
+            3. Verify that the second TERCC was not launched.
+            4. Finish the first suite runner and redeliver the second TERCC.
+            5. Verify that the second suite runner was launched.
+        """
+        os.environ["ETOS_CONFIGMAP"] = "etos"
+        os.environ["SUITE_RUNNER"] = "ESR"
+        Config().reset()
+        load_config.side_effect = lambda: client.Configuration.set_default(
+            self.fake.configuration()
+        )
+        step("Initialize SuiteStarter with admission control and a ceiling of 1.")
+        suite_starter = SuiteStarter(str(BASE_PATH.joinpath("esr_template.yaml")))
+        suite_starter.job.namespace = "etos"
+        suite_starter.admission = self._admission_control(ceiling=1, timeout=0.2)
+        terccs = []
+        for _ in range(2):
+            tercc = EiffelTestExecutionRecipeCollectionCreatedEvent()
+            tercc.data.add("selectionStrategy", {"tracker": "Admission", "id": str(uuid.uuid4())})
+            tercc.data.add("batches", [])
+            terccs.append(tercc)
+
+        step("Launch a suite runner and deliver another TERCC.")
+        self.assertTrue(suite_starter.suite_runner_callback(terccs[0], None))
+        with self.assertRaises(AdmissionTimeout):
+            suite_starter.suite_runner_callback(terccs[1], None)
+
+        step("Verify that the second TERCC was not launched.")
+        self.assertEqual(list(self.fake.jobs["etos"]), [f"suite-runner-{terccs[0].meta.event_id}"])
+
+        step("Finish the first suite runner and redeliver the second TERCC.")
+        self.fake.finish_job("etos", f"suite-runner-{terccs[0].meta.event_id}")
+        suite_starter.admission.timeout = 5
+        self.assertTrue(suite_starter.suite_runner_callback(terccs[1], None))
+
+        step("Verify that the second suite runner was launched.")
+        self.assertIn(f"suite-runner-{terccs[1].meta.event_id}", self.fake.jobs["etos"])
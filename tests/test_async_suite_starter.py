@@ -0,0 +1,244 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for the asyncio ETOS suite starter."""
+
+import asyncio
+import json
+import os
+import uuid
+from pathlib import Path
+from unittest import TestCase
+
+from eiffellib.events import (
+    EiffelActivityTriggeredEvent,
+    EiffelTestExecutionRecipeCollectionCreatedEvent,
+)
+from etos_lib.lib.config import Config
+from kubernetes_asyncio import client
+from mock import AsyncMock, patch
+
+from suite_starter.async_suite_starter import TERCC, AsyncSuiteStarter
+
+from .fakes import FakeKubernetes, InMemoryQueue
+from .helpers import step
+
+BASE_PATH = Path(__file__).parent
+
+
+def _tercc() -> EiffelTestExecutionRecipeCollectionCreatedEvent:
+    """Generate a test execution recipe collection created event for test."""
+    tercc = EiffelTestExecutionRecipeCollectionCreatedEvent()
+    tercc.data.add("selectionStrategy", {"tracker": "Async", "id": str(uuid.uuid4())})
+    tercc.data.add("batches", [])
+    tercc.links.add("CAUSE", str(uuid.uuid4()))
+    return tercc
+
+
+class TestAsyncSuiteStarter(TestCase):
+    """Tests for AsyncSuiteStarter."""
+
+    def setUp(self):
+        os.environ["ETOS_CONFIGMAP"] = "etos"
+        os.environ["SUITE_RUNNER"] = "ESR"
+        Config().reset()
+        self.suite_starter = AsyncSuiteStarter(str(BASE_PATH.joinpath("esr_template.yaml")))
+        self.suite_starter.namespace = "etos"
+
+    def _consume(self, queue: InMemoryQueue, fake: FakeKubernetes):
+        """Consume all messages from a queue, creating jobs in a fake Kubernetes API."""
+
+        async def consume():
+            configuration = client.Configuration(host=fake.url)
+            async with client.ApiClient(configuration) as api_client:
+                self.suite_starter.batch_v1 = client.BatchV1Api(api_client)
+                await self.suite_starter.consume(queue)
+
+        asyncio.run(consume())
+
+    def test_async_suite_starter(self):
+        """Test that the asyncio suite starter launches suite runners for TERCCs.
+
+        Approval criteria:
+            - A job shall be created for each TERCC and the TERCC shall be ACK:ed.
+            - Other events shall be ACK:ed without creating a job.
+            - Malformed messages shall be rejected.
+
+        Test steps:
+            1. Publish TERCCs, another event and a malformed message to an in-memory queue.
+            2. Consume the queue with the asyncio suite starter against a fake Kubernetes API.
+            3. Verify that jobs were created for the TERCCs and that messages were handled.
+        """
+
+        async def publish() -> InMemoryQueue:
+            queue = InMemoryQueue()
+            for _ in range(20):
+                queue.publish(json.dumps(_tercc().json).encode("utf-8"))
+            activity = EiffelActivityTriggeredEvent()
+            activity.data.add("name", "Not a TERCC")
+            queue.publish(json.dumps(activity.json).encode("utf-8"))
+            queue.publish(b"not json")
+            queue.close()
+            return queue
+
+        with FakeKubernetes(latency=0.05) as fake:
+            step("Publish TERCCs, another event and a malformed message to an in-memory queue.")
+            queue = asyncio.run(publish())
+
+            step("Consume the queue with the asyncio suite starter against a fake Kubernetes API.")
+            self._consume(queue, fake)
+
+        step("Verify that jobs were created for the TERCCs and that messages were handled.")
+        self.assertEqual(len(fake.jobs["etos"]), 20)
+        self.assertEqual(len(queue.acked), 21)
+        self.assertEqual(len(queue.rejected), 1)
+        self.assertEqual(len(queue.nacked), 0)
+        tercc_ids = {
+            json.loads(message.body)["meta"]["id"]
+            for message in queue.acked
+            if json.loads(message.body)["meta"]["type"] == TERCC
+        }
+        job_ids = {job["metadata"]["labels"]["id"] for job in fake.jobs["etos"].values()}
+        self.assertEqual(job_ids, tercc_ids)
+
+    def test_async_suite_starter_unsupported(self):
+        """Test that the asyncio suite starter warns about features that it does not support.
+
+        Approval criteria:
+            - Limiting the TERCCs in flight shall be disabled with a warning.
+
+        Test steps:
+            1. Initialize the asyncio suite starter with an in-flight limit.
+            2. Verify that the limit was disabled with a warning.
+        """
+        step("Initialize the asyncio suite starter with an in-flight limit.")
+        with patch.dict(os.environ, {"SUITE_STARTER_MAX_IN_FLIGHT": "4"}):
+            with self.assertLogs("suite_starter.async_suite_starter", "WARNING") as logs:
+                AsyncSuiteStarter(str(BASE_PATH.joinpath("esr_template.yaml")))
+
+        step("Verify that the limit was disabled with a warning.")
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("in flight", logs.records[0].getMessage())
+
+    def test_async_suite_starter_log_identifier(self):
+        """Test that the asyncio suite starter tags log messages with the suite ID of each task.
+
+        Approval criteria:
+            - Log messages shall be tagged with the suite ID of the TERCC being launched,
+              also when other TERCCs are launched while its job is created.
+
+        Test steps:
+            1. Publish TERCCs to an in-memory queue.
+            2. Consume the queue with the asyncio suite starter against a slow Kubernetes API.
+            3. Verify that the messages logged after the jobs were created have the right IDs.
+        """
+        step("Publish TERCCs to an in-memory queue.")
+        queue = InMemoryQueue()
+        for _ in range(5):
+            queue.publish(json.dumps(_tercc().json).encode("utf-8"))
+        queue.close()
+
+        with FakeKubernetes(latency=0.05) as fake:
+            step("Consume the queue with the asyncio suite starter against a slow Kubernetes API.")
+            with self.assertLogs("suite_starter.suite_starter", "INFO") as logs:
+                self._consume(queue, fake)
+
+        step("Verify that the messages logged after the jobs were created have the right IDs.")
+        launched = [record for record in logs.records if record.msg == "ESR successfully launched."]
+        self.assertEqual(len(launched), 5)
+        for record in launched:
+            self.assertEqual(record.identifier, record.suite_id)
+
+    def test_async_suite_starter_failure(self):
+        """Test that the asyncio suite starter requeues TERCCs when a job can not be created.
+
+        Approval criteria:
+            - A TERCC shall be NACK:ed and requeued if its job could not be created.
+
+        Test steps:
+            1. Publish a TERCC to an in-memory queue.
+            2. Consume the queue with a Kubernetes API that fails to create jobs.
+            3. Verify that the TERCC was NACK:ed.
+        """
+
+        async def consume() -> InMemoryQueue:
+            step("Publish a TERCC to an in-memory queue.")
+            queue = InMemoryQueue()
+            queue.publish(json.dumps(_tercc().json).encode("utf-8"))
+            queue.close()
+
+            step("Consume the queue with a Kubernetes API that fails to create jobs.")
+            self.suite_starter.batch_v1 = AsyncMock()
+            self.suite_starter.batch_v1.create_namespaced_job.side_effect = RuntimeError("Failed")
+            await self.suite_starter.consume(queue)
+            return queue
+
+        queue = asyncio.run(consume())
+
+        step("Verify that the TERCC was NACK:ed.")
+        self.assertEqual(len(queue.nacked), 1)
+        self.assertEqual(len(queue.acked), 0)
+
+    def test_async_suite_starter_drain(self):
+        """Test that the asyncio suite starter drains the TERCCs in flight when stopped.
+
+        Approval criteria:
+            - Launches that finish before the deadline shall be ACK:ed.
+            - TERCCs that are waiting for a worker shall be NACK:ed and requeued.
+            - Launches that are still running at the deadline shall be abandoned.
+
+        Test steps:
+            1. Consume TERCCs with two workers and a Kubernetes API that never responds once.
+            2. Stop the suite starter and let one launch finish.
+            3. Verify the drain report and that the TERCCs were handled accordingly.
+        """
+        self.suite_starter.workers = 2
+        self.suite_starter.drain_timeout = 0.2
+
+        async def consume():
+            step("Consume TERCCs with two workers and a Kubernetes API that never responds once.")
+            queue = InMemoryQueue()
+            for _ in range(4):
+                queue.publish(json.dumps(_tercc().json).encode("utf-8"))
+            started = asyncio.Semaphore(0)
+            release = asyncio.Event()
+            hanging = []
+
+            async def create_namespaced_job(*_, **__):
+                started.release()
+                if hanging:
+                    await release.wait()
+                else:
+                    hanging.append(True)
+                    await asyncio.Event().wait()
+
+            self.suite_starter.batch_v1 = AsyncMock()
+            self.suite_starter.batch_v1.create_namespaced_job.side_effect = create_namespaced_job
+            consumer = asyncio.create_task(self.suite_starter.consume(queue))
+            for _ in range(2):
+                await started.acquire()
+
+            step("Stop the suite starter and let one launch finish.")
+            self.suite_starter.stop()
+            await asyncio.sleep(0.05)
+            release.set()
+            return queue, await consumer
+
+        queue, report = asyncio.run(consume())
+
+        step("Verify the drain report and that the TERCCs were handled accordingly.")
+        self.assertEqual(tuple(report), (1, 1, 1))
+        self.assertEqual(len(queue.acked), 1)
+        self.assertEqual(len(queue.nacked), 1)
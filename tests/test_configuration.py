@@ -0,0 +1,125 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for the static configuration of the suite runner templates."""
+
+import os
+from pathlib import Path
+from unittest import TestCase
+
+from etos_lib.lib.config import Config
+from mock import patch
+
+from suite_starter.configuration import SuiteRunnerConfiguration, template_fields
+from suite_starter.suite_starter import SuiteStarter
+
+from .helpers import step
+
+BASE_PATH = Path(__file__).parent
+
+
+class TestSuiteRunnerConfiguration(TestCase):
+    """Tests for SuiteRunnerConfiguration."""
+
+    def test_from_environment(self):
+        """Test that the configuration is loaded from the environment into a snapshot.
+
+        Approval criteria:
+            - Values shall be loaded from the environment, with defaults for unset values.
+            - The configuration mapping shall be read-only.
+
+        Test steps:
+            1. Load the configuration with a suite runner image and a TTL.
+            2. Verify the loaded values and the defaults.
+            3. Verify that the configuration mapping can not be modified.
+        """
+        step("Load the configuration with a suite runner image and a TTL.")
+        environment = {"SUITE_RUNNER": "ESR", "ETOS_ESR_TTL": "60"}
+        with patch.dict(os.environ, environment):
+            os.environ.pop("ETOS_SIDECAR_IMAGE", None)
+            configuration = SuiteRunnerConfiguration.from_environment()
+
+        step("Verify the loaded values and the defaults.")
+        self.assertEqual(configuration.docker_image, "ESR")
+        self.assertEqual(configuration.ttl, "60")
+        self.assertEqual(configuration.termination_grace_period, "300")
+        self.assertIsNone(configuration.sidecar_image)
+
+        step("Verify that the configuration mapping can not be modified.")
+        with self.assertRaises(TypeError):
+            configuration.mapping()["docker_image"] = "other"  # type: ignore[index]
+
+    def test_validate(self):
+        """Test that the configuration is validated against the fields a template uses.
+
+        Approval criteria:
+            - A field that the template uses and that is not set shall be rejected.
+            - Optional ConfigMap references and fields set by an overlay shall be accepted.
+
+        Test steps:
+            1. Load a configuration without a log listener image.
+            2. Verify that a template using the log listener image is rejected.
+            3. Verify that optional and overlaid fields are accepted.
+        """
+        step("Load a configuration without a log listener image.")
+        configuration = SuiteRunnerConfiguration(docker_image="ESR")
+        template = "image: {docker_image}\nlisteners: [{log_listener}]\nmap: {etos_configmap}\n"
+        fields = template_fields(template + "empty: {{}}\ntercc: {suite_id}")
+        self.assertEqual(fields, {"docker_image", "log_listener", "etos_configmap", "suite_id"})
+
+        step("Verify that a template using the log listener image is rejected.")
+        with self.assertRaisesRegex(ValueError, "LOG_LISTENER must be set"):
+            configuration.validate(fields)
+
+        step("Verify that optional and overlaid fields are accepted.")
+        configuration.validate(fields, {"log_listener": "listener"})
+        configuration.validate(fields - {"log_listener"})
+
+    @patch("suite_starter.suite_starter.Job")
+    def test_invalid_configuration(self, job):
+        """Test that suite starter fails fast on an invalid configuration.
+
+        Approval criteria:
+            - Suite starter shall not start without a suite runner image.
+            - Suite starter shall not start with a TTL that is not a number.
+            - Suite starter shall not start without an image that the template uses.
+            - Suite starter shall fail before connecting to Kubernetes.
+
+        Test steps:
+            1. Initialize SuiteStarter without SUITE_RUNNER.
+            2. Initialize SuiteStarter with a TTL that is not a number.
+            3. Initialize SuiteStarter without an image that the template uses.
+            4. Verify that no Kubernetes client was created.
+        """
+        Config().reset()
+        template = str(BASE_PATH.joinpath("esr_template.yaml"))
+        step("Initialize SuiteStarter without SUITE_RUNNER.")
+        with patch.dict(os.environ, {"SUITE_RUNNER": ""}):
+            with self.assertRaisesRegex(ValueError, "SUITE_RUNNER"):
+                SuiteStarter(template)
+
+        step("Initialize SuiteStarter with a TTL that is not a number.")
+        with patch.dict(os.environ, {"SUITE_RUNNER": "ESR", "ETOS_ESR_TTL": "1h"}):
+            with self.assertRaisesRegex(ValueError, "ETOS_ESR_TTL"):
+                SuiteStarter(template)
+
+        step("Initialize SuiteStarter without an image that the template uses.")
+        with patch.dict(os.environ, {"SUITE_RUNNER": "ESR", "LOG_LISTENER": ""}):
+            os.environ.pop("LOG_LISTENER")
+            with self.assertRaisesRegex(ValueError, "LOG_LISTENER"):
+                SuiteStarter(template)
+
+        step("Verify that no Kubernetes client was created.")
+        job.assert_not_called()
@@ -0,0 +1,163 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for rendering suite runner jobs without RabbitMQ or Kubernetes."""
+
+import io
+import json
+import logging
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from unittest import TestCase
+
+import yaml
+from eiffellib.events import EiffelTestExecutionRecipeCollectionCreatedEvent
+from mock import patch
+
+from suite_starter.dryrun import main
+
+from .helpers import step
+
+BASE_PATH = Path(__file__).parent
+
+
+def tercc() -> EiffelTestExecutionRecipeCollectionCreatedEvent:
+    """Create a TERCC."""
+    event = EiffelTestExecutionRecipeCollectionCreatedEvent()
+    event.data.add("selectionStrategy", {"tracker": "Dry run", "id": str(uuid.uuid4())})
+    event.data.add("batches", [])
+    return event
+
+
+class TestDryRun(TestCase):
+    """Tests for the dry run of the suite starter."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()  # pylint:disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.terccs = [tercc() for _ in range(3)]
+        self.input = self.directory.joinpath("terccs.jsonl")
+        lines = [json.dumps(event.json) for event in self.terccs]
+        lines.insert(1, '{"meta": {"type": "EiffelActivityTriggeredEvent"}}')
+        self.input.write_text("\n".join(lines) + "\n\n", encoding="utf-8")
+        environment = {"SUITE_RUNNER": "ESR", "ETOS_CONFIGMAP": "etos"}
+        patcher = patch.dict(os.environ, environment)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # The dry run only logs warnings from the suite starter.
+        self.addCleanup(logging.getLogger("suite_starter").setLevel, logging.NOTSET)
+
+    def _main(self, *argv: str) -> tuple[int, str, dict]:
+        """Run the dry run and get its exit code, stdout and timing statistics."""
+        template = str(BASE_PATH.joinpath("esr_template.yaml"))
+        argv = ("--template", template, "--input", str(self.input), *argv)
+        with patch("sys.stdout", new=io.StringIO()) as stdout:
+            with patch("sys.stderr", new=io.StringIO()) as stderr:
+                code = main(list(argv))
+        return code, stdout.getvalue(), json.loads(stderr.getvalue().splitlines()[-1])
+
+    def test_render_to_stdout(self):
+        """Test that TERCCs are rendered into job manifests on stdout.
+
+        Approval criteria:
+            - A job manifest shall be written for each TERCC, in the order of the input.
+            - A line that is not a TERCC shall be reported and fail the dry run.
+            - Timing statistics shall be reported for each stage.
+
+        Test steps:
+            1. Render a file with three TERCCs and another event in one process.
+            2. Verify that a job manifest was written for each TERCC.
+            3. Verify that the other event failed the dry run.
+            4. Verify that timing statistics were reported for each stage.
+        """
+        step("Render a file with three TERCCs and another event in one process.")
+        code, stdout, summary = self._main("--jobs", "1")
+
+        step("Verify that a job manifest was written for each TERCC.")
+        jobs = list(yaml.safe_load_all(stdout))
+        self.assertEqual(
+            [job["metadata"]["name"] for job in jobs],
+            [f"suite-runner-{event.meta.event_id}" for event in self.terccs],
+        )
+        self.assertEqual(jobs[0]["spec"]["template"]["spec"]["containers"][0]["image"], "ESR")
+
+        step("Verify that the other event failed the dry run.")
+        self.assertEqual(code, 1)
+        self.assertEqual((summary["terccs"], summary["failed"]), (4, 1))
+
+        step("Verify that timing statistics were reported for each stage.")
+        for stage in ("parse", "render", "serialize"):
+            self.assertGreater(summary[stage]["total_s"], 0)
+
+    def test_render_to_directory(self):
+        """Test that TERCCs are rendered into a directory by worker processes.
+
+        Approval criteria:
+            - A job manifest shall be written to the directory for each TERCC.
+
+        Test steps:
+            1. Render TERCCs with two worker processes into a directory as JSON.
+            2. Verify that a job manifest was written for each TERCC.
+        """
+        step("Render TERCCs with two worker processes into a directory as JSON.")
+        self.input.write_text(
+            "\n".join(json.dumps(event.json) for event in self.terccs), encoding="utf-8"
+        )
+        output = self.directory.joinpath("jobs")
+        code, stdout, summary = self._main(
+            "--jobs", "2", "--output", str(output), "--format", "json"
+        )
+
+        step("Verify that a job manifest was written for each TERCC.")
+        self.assertEqual(code, 0)
+        self.assertEqual(stdout, "")
+        self.assertEqual(summary["jobs"], 2)
+        for event in self.terccs:
+            job = json.loads(
+                output.joinpath(f"suite-runner-{event.meta.event_id}.json").read_text("utf-8")
+            )
+            self.assertEqual(job["kind"], "Job")
+
+    def test_render_shared_environment(self):
+        """Test that the shared environment of the jobs is rendered together with them.
+
+        Approval criteria:
+            - The ConfigMaps that the jobs load their shared environment from shall be rendered.
+
+        Test steps:
+            1. Render TERCCs with a shared environment.
+            2. Verify that the ConfigMaps that the jobs reference were rendered first.
+        """
+        step("Render TERCCs with a shared environment.")
+        with patch.dict(os.environ, {"SUITE_STARTER_SHARED_ENVIRONMENT": "true"}):
+            _, stdout, _ = self._main("--jobs", "1")
+
+        step("Verify that the ConfigMaps that the jobs reference were rendered first.")
+        manifests = list(yaml.safe_load_all(stdout))
+        config_maps = [manifest for manifest in manifests if manifest["kind"] == "ConfigMap"]
+        self.assertEqual(manifests[: len(config_maps)], config_maps)
+        names = {config_map["metadata"]["name"] for config_map in config_maps}
+        references = {
+            source["configMapRef"]["name"]
+            for job in manifests[len(config_maps) :]
+            for container in job["spec"]["template"]["spec"]["containers"]
+            for source in container["envFrom"]
+            if source.get("configMapRef", {}).get("name", "").startswith("suite-runner-env-")
+        }
+        self.assertEqual(len(manifests) - len(config_maps), len(self.terccs))
+        self.assertEqual(references, names)
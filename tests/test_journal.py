@@ -0,0 +1,156 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for the launch journal."""
+
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from unittest import TestCase
+
+from eiffellib.events import EiffelTestExecutionRecipeCollectionCreatedEvent
+from etos_lib.lib.config import Config
+from mock import patch
+
+from suite_starter.journal import ACKED, RECEIVED, SUBMITTED, LaunchJournal
+from suite_starter.suite_starter import SuiteStarter
+
+from .helpers import step
+
+BASE_PATH = Path(__file__).parent
+
+
+class TestLaunchJournal(TestCase):
+    """Tests for LaunchJournal."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()  # pylint:disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name).joinpath("journal.db"))
+
+    def test_submitted_after_reopen(self):
+        """Test that submitted suites are read back from a reopened journal.
+
+        Approval criteria:
+            - Suites that had their jobs submitted shall be read back, oldest first.
+            - Suites that were only received shall not be read back.
+
+        Test steps:
+            1. Append entries for three suites to a journal and close it.
+            2. Reopen the journal.
+            3. Verify that the submitted suites are read back.
+        """
+        step("Append entries for three suites to a journal and close it.")
+        journal = LaunchJournal(self.path)
+        for suite_id, kinds in (
+            ("first", (RECEIVED, SUBMITTED, ACKED)),
+            ("second", (RECEIVED,)),
+            ("third", (RECEIVED, SUBMITTED)),
+        ):
+            for kind in kinds:
+                journal.append(suite_id, kind)
+        journal.close()
+
+        step("Reopen the journal.")
+        journal = LaunchJournal(self.path)
+        self.addCleanup(journal.close)
+
+        step("Verify that the submitted suites are read back.")
+        self.assertEqual(journal.submitted(10), ["first", "third"])
+        self.assertEqual(journal.submitted(1), ["third"])
+
+    def test_compaction(self):
+        """Test that the journal keeps a bounded number of entries.
+
+        Approval criteria:
+            - The journal shall not grow much beyond its size.
+            - The latest entries shall be kept.
+
+        Test steps:
+            1. Append many more entries than the size of the journal.
+            2. Verify that the journal was compacted and kept the latest entries.
+        """
+        journal = LaunchJournal(self.path, size=100)
+        self.addCleanup(journal.close)
+        step("Append many more entries than the size of the journal.")
+        for index in range(1000):
+            journal.append(str(index), SUBMITTED)
+
+        step("Verify that the journal was compacted and kept the latest entries.")
+        self.assertLessEqual(len(journal), 110)
+        self.assertEqual(journal.submitted(3), ["997", "998", "999"])
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    @patch("suite_starter.suite_starter.Job.create_job")
+    def test_suite_starter_restart(self, mock_job, _):
+        """Test that a restarted suite starter does not relaunch suites from its journal.
+
+        Approval criteria:
+            - A TERCC redelivered after a restart shall be ACK:ed without creating a job.
+
+        Test steps:
+            1. Launch a suite runner for a TERCC with a journal.
+            2. Restart the suite starter with the same journal.
+            3. Redeliver the TERCC and verify that no job was created.
+        """
+        os.environ["ETOS_CONFIGMAP"] = "etos"
+        os.environ["SUITE_RUNNER"] = "ESR"
+        Config().reset()
+        template = str(BASE_PATH.joinpath("esr_template.yaml"))
+        tercc = EiffelTestExecutionRecipeCollectionCreatedEvent()
+        tercc.data.add("selectionStrategy", {"tracker": "Journal", "id": str(uuid.uuid4())})
+        tercc.data.add("batches", [])
+        with patch.dict(os.environ, {"SUITE_STARTER_JOURNAL": self.path}):
+            step("Launch a suite runner for a TERCC with a journal.")
+            suite_starter = SuiteStarter(template)
+            self.assertTrue(suite_starter.suite_runner_callback(tercc, None))
+            self.assertEqual(mock_job.call_count, 1)
+            suite_starter.journal.close()
+
+            step("Restart the suite starter with the same journal.")
+            suite_starter = SuiteStarter(template)
+            self.addCleanup(suite_starter.journal.close)
+
+        step("Redeliver the TERCC and verify that no job was created.")
+        self.assertTrue(suite_starter.suite_runner_callback(tercc, None))
+        self.assertEqual(mock_job.call_count, 1)
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    def test_suite_starter_without_cache(self, _):
+        """Test that suite starter refuses to keep a journal that would never be read.
+
+        Approval criteria:
+            - SuiteStarter shall not start with a journal and a disabled launched suites cache.
+
+        Test steps:
+            1. Initialize SuiteStarter with a journal and the launched suites cache disabled.
+            2. Verify that the configuration was rejected.
+        """
+        os.environ["ETOS_CONFIGMAP"] = "etos"
+        os.environ["SUITE_RUNNER"] = "ESR"
+        Config().reset()
+        template = str(BASE_PATH.joinpath("esr_template.yaml"))
+        step("Initialize SuiteStarter with a journal and the launched suites cache disabled.")
+        environment = {
+            "SUITE_STARTER_JOURNAL": self.path,
+            "SUITE_STARTER_LAUNCHED_CACHE_SIZE": "0",
+        }
+        with patch.dict(os.environ, environment):
+            with self.assertRaises(ValueError) as context:
+                SuiteStarter(template)
+
+        step("Verify that the configuration was rejected.")
+        self.assertIn("SUITE_STARTER_LAUNCHED_CACHE_SIZE", str(context.exception))
@@ -0,0 +1,69 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for duplicate suppression of suite runner launches."""
+
+from unittest import TestCase
+
+from suite_starter.launched import LaunchedSuites
+
+from .helpers import step
+
+
+class TestLaunchedSuites(TestCase):
+    """Tests for LaunchedSuites."""
+
+    def test_least_recently_used(self):
+        """Test that the least recently used suite ID is forgotten when the cache is full.
+
+        Approval criteria:
+            - The cache shall hold at most `size` suite IDs.
+            - Looking up a suite ID shall mark it as recently used.
+
+        Test steps:
+            1. Add two suite IDs to a cache of size 2 and look up the first.
+            2. Add a third suite ID.
+            3. Verify that the second suite ID was forgotten.
+        """
+        launched = LaunchedSuites(2)
+        step("Add two suite IDs to a cache of size 2 and look up the first.")
+        launched.add("first")
+        launched.add("second")
+        self.assertIn("first", launched)
+
+        step("Add a third suite ID.")
+        launched.add("third")
+
+        step("Verify that the second suite ID was forgotten.")
+        self.assertEqual(len(launched), 2)
+        self.assertIn("first", launched)
+        self.assertIn("third", launched)
+        self.assertNotIn("second", launched)
+
+    def test_disabled(self):
+        """Test that a cache of size 0 remembers nothing.
+
+        Approval criteria:
+            - A cache of size 0 shall not remember any suite IDs.
+
+        Test steps:
+            1. Add a suite ID to a cache of size 0.
+            2. Verify that the suite ID was not remembered.
+        """
+        launched = LaunchedSuites(0)
+        step("Add a suite ID to a cache of size 0.")
+        launched.add("first")
+        step("Verify that the suite ID was not remembered.")
+        self.assertNotIn("first", launched)
@@ -0,0 +1,142 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for logging of suite runner launches."""
+
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from unittest import TestCase
+
+from eiffellib.events import EiffelTestExecutionRecipeCollectionCreatedEvent
+from etos_lib.lib.config import Config
+from mock import patch
+
+from suite_starter.logs import SuiteLogSampler, truncate
+from suite_starter.scheduler import RateLimit
+from suite_starter.suite_starter import SuiteStarter
+
+from .helpers import step
+
+BASE_PATH = Path(__file__).parent
+
+
+class TestLogs(TestCase):
+    """Tests for logging of suite runner launches."""
+
+    def test_truncate(self):
+        """Test that large payloads are truncated with their size and a digest.
+
+        Approval criteria:
+            - A payload within the limit shall be logged as is.
+            - A payload beyond the limit shall be truncated, with its size and digest.
+
+        Test steps:
+            1. Truncate a payload within the limit and verify that it is unchanged.
+            2. Truncate two payloads beyond the limit that start the same.
+            3. Verify that they are truncated, with their sizes and different digests.
+        """
+        step("Truncate a payload within the limit and verify that it is unchanged.")
+        self.assertEqual(truncate("a" * 10, 10), "a" * 10)
+
+        step("Truncate two payloads beyond the limit that start the same.")
+        first = truncate("a" * 100, 10)
+        second = truncate("a" * 99 + "b", 10)
+
+        step("Verify that they are truncated, with their sizes and different digests.")
+        self.assertTrue(first.startswith("a" * 10 + "... (100 characters, blake2b "))
+        self.assertLess(len(first), 60)
+        self.assertNotEqual(first, second)
+
+    def test_sampler(self):
+        """Test that the log sampler logs all or nothing of a rate of suites.
+
+        Approval criteria:
+            - The launches of at most the burst of suites shall be logged at once.
+            - Every record of a suite shall be logged if the suite is sampled.
+            - Warnings and records that do not belong to a suite shall always be logged.
+
+        Test steps:
+            1. Create a sampler of 1 suite per second with a burst of 2.
+            2. Log records of three suites at INFO level.
+            3. Verify that the records of the first two suites were logged.
+            4. Verify that warnings and records without a suite were logged.
+            5. Verify that the third suite is sampled when the bucket has refilled.
+        """
+        step("Create a sampler of 1 suite per second with a burst of 2.")
+        now = [0.0]
+        sampler = SuiteLogSampler(RateLimit(1, 2), clock=lambda: now[0])
+
+        def record(level: int, **fields):
+            record = logging.LogRecord("test", level, __file__, 1, "message", (), None)
+            record.__dict__.update(fields)
+            return record
+
+        step("Log records of three suites at INFO level.")
+        logged = [
+            sampler.filter(record(logging.INFO, suite_id=suite_id))
+            for suite_id in ("a", "b", "c", "a", "b", "c")
+        ]
+
+        step("Verify that the records of the first two suites were logged.")
+        self.assertEqual(logged, [True, True, False, True, True, False])
+        self.assertEqual(sampler.dropped, 2)
+
+        step("Verify that warnings and records without a suite were logged.")
+        self.assertTrue(sampler.filter(record(logging.WARNING, suite_id="c")))
+        self.assertTrue(sampler.filter(record(logging.INFO)))
+
+        step("Verify that the third suite is sampled when the bucket has refilled.")
+        now[0] = 10.0
+        self.assertTrue(sampler.sampled("d"))
+        self.assertFalse(sampler.sampled("c"))
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    @patch("suite_starter.suite_starter.Job.create_job")
+    def test_suite_starter_logs(self, *_):
+        """Test that suite starter logs a truncated TERCC as a structured field.
+
+        Approval criteria:
+            - The TERCC shall only be logged in full at DEBUG level.
+            - The TERCC shall be logged truncated, with its size, at INFO level.
+
+        Test steps:
+            1. Initialize SuiteStarter and a large TERCC.
+            2. Launch a suite runner for the TERCC, logging at INFO level.
+            3. Verify that the TERCC was logged truncated in a structured field.
+        """
+        step("Initialize SuiteStarter and a large TERCC.")
+        os.environ["ETOS_CONFIGMAP"] = "etos"
+        os.environ["SUITE_RUNNER"] = "ESR"
+        Config().reset()
+        with patch.dict(os.environ, {"SUITE_STARTER_LOG_FIELD_LIMIT": "64"}):
+            suite_starter = SuiteStarter(str(BASE_PATH.joinpath("esr_template.yaml")))
+        tercc = EiffelTestExecutionRecipeCollectionCreatedEvent()
+        tercc.data.add("selectionStrategy", {"tracker": "Logs", "id": str(uuid.uuid4())})
+        tercc.data.add("batches", [{"name": "x" * 10000}])
+        size = len(json.dumps(tercc.json, separators=(",", ":")))
+
+        step("Launch a suite runner for the TERCC, logging at INFO level.")
+        with self.assertLogs("suite_starter.suite_starter", logging.INFO) as logs:
+            self.assertTrue(suite_starter.suite_runner_callback(tercc, None))
+
+        step("Verify that the TERCC was logged truncated in a structured field.")
+        self.assertTrue(all(len(record.getMessage()) < 1000 for record in logs.records))
+        (record,) = [record for record in logs.records if hasattr(record, "tercc")]
+        self.assertEqual(record.suite_id, tercc.meta.event_id)
+        self.assertEqual(record.tercc_size, size)
+        self.assertLess(len(record.tercc), 200)
@@ -0,0 +1,124 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for hot reload of the suite runner template."""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from etos_lib.lib.config import Config
+from mock import patch
+
+from suite_starter.reload import TemplateWatcher
+from suite_starter.suite_starter import SuiteStarter
+
+from .helpers import step
+
+BASE_PATH = Path(__file__).parent
+
+
+class TestTemplateWatcher(TestCase):
+    """Tests for TemplateWatcher."""
+
+    def setUp(self):
+        os.environ["ETOS_CONFIGMAP"] = "etos"
+        os.environ["SUITE_RUNNER"] = "ESR"
+        Config().reset()
+        directory = tempfile.TemporaryDirectory()  # pylint:disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.text = BASE_PATH.joinpath("esr_template.yaml").read_text(encoding="utf-8")
+        self.path = Path(directory.name).joinpath("suite_runner_template.yaml")
+        self.path.write_text(self.text, encoding="utf-8")
+        with patch("suite_starter.suite_starter.Job._load_config"):
+            self.suite_starter = SuiteStarter(str(self.path))
+        self.watcher = TemplateWatcher(
+            str(self.path),
+            self.suite_starter._compile_template,  # pylint:disable=protected-access
+            self.suite_starter._swap_template,  # pylint:disable=protected-access
+            interval=0.01,
+        )
+
+    def _write(self, text: str):
+        """Replace the template file the way a ConfigMap volume does, with a new inode."""
+        new = self.path.with_suffix(".new")
+        new.write_text(text, encoding="utf-8")
+        new.replace(self.path)
+
+    def test_reload(self):
+        """Test that a changed template is swapped in.
+
+        Approval criteria:
+            - An unchanged template shall not be reloaded.
+            - A changed, valid template shall be used for new jobs.
+
+        Test steps:
+            1. Poll the unchanged template.
+            2. Change the template and poll it.
+            3. Verify that the new template is used.
+        """
+        old = self.suite_starter.suite_runner_template
+        step("Poll the unchanged template.")
+        self.assertFalse(self.watcher.poll())
+        self.assertIs(self.suite_starter.suite_runner_template, old)
+
+        step("Change the template and poll it.")
+        self._write(self.text.replace("etos-sa", "etos-reloaded-sa"))
+        self.assertTrue(self.watcher.poll())
+
+        step("Verify that the new template is used.")
+        self.assertIsNot(self.suite_starter.suite_runner_template, old)
+        self.assertIn("etos-reloaded-sa", self.suite_starter.suite_runner_template.template)
+
+    def test_invalid_template(self):
+        """Test that the old template is kept when the new one is invalid.
+
+        Approval criteria:
+            - An invalid template shall not be swapped in.
+
+        Test steps:
+            1. Replace the template with one that is not a Kubernetes object and poll it.
+            2. Verify that the old template is still used.
+        """
+        old = self.suite_starter.suite_runner_template
+        step("Replace the template with one that is not a Kubernetes object and poll it.")
+        self._write("just a string")
+        self.assertFalse(self.watcher.poll())
+
+        step("Verify that the old template is still used.")
+        self.assertIs(self.suite_starter.suite_runner_template, old)
+
+    def test_background_reload(self):
+        """Test that the template is reloaded by the watcher thread.
+
+        Approval criteria:
+            - A changed template shall be swapped in without polling from the event path.
+
+        Test steps:
+            1. Start the watcher and change the template.
+            2. Verify that the new template is swapped in.
+        """
+        step("Start the watcher and change the template.")
+        self.watcher.start()
+        self.addCleanup(self.watcher.stop)
+        self._write(self.text.replace("etos-sa", "etos-reloaded-sa"))
+
+        step("Verify that the new template is swapped in.")
+        deadline = time.monotonic() + 5
+        while "etos-reloaded-sa" not in self.suite_starter.suite_runner_template.template:
+            self.assertLess(time.monotonic(), deadline, "Template was not reloaded")
+            time.sleep(0.01)
@@ -0,0 +1,430 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for retries and the circuit breaker of Kubernetes API calls."""
+
+import os
+import threading
+import time
+import uuid
+from http import HTTPStatus
+from pathlib import Path
+from unittest import TestCase
+
+from eiffellib.events import EiffelTestExecutionRecipeCollectionCreatedEvent
+from etos_lib.lib.config import Config
+from kubernetes import client
+from kubernetes.client.exceptions import ApiException
+from mock import MagicMock, patch
+from prometheus_client import REGISTRY
+from urllib3.exceptions import MaxRetryError
+
+from suite_starter.retry import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpen,
+    RetryPolicy,
+    TimeoutApiClient,
+    reason,
+    retry_after,
+)
+from suite_starter.suite_starter import SuiteStarter
+
+from .fakes import FakeKubernetes
+from .helpers import step
+
+BASE_PATH = Path(__file__).parent
+RETRIES = "suite_starter_kubernetes_retries_total"
+
+
+def api_exception(status: int, headers: dict = None) -> ApiException:
+    """Create an exception like the one raised by the Kubernetes client on an HTTP error."""
+    exception = ApiException(status=status, reason=HTTPStatus(status).phrase)
+    exception.headers = headers
+    return exception
+
+
+class TestRetryPolicy(TestCase):
+    """Tests for RetryPolicy."""
+
+    def test_transient_failures(self):
+        """Test that only transient failures of the Kubernetes API are retried.
+
+        Approval criteria:
+            - Throttling, server errors and connection errors shall be transient.
+            - Client errors, such as a job that already exists, shall not be transient.
+            - Retry-After headers in seconds and as dates shall be read.
+
+        Test steps:
+            1. Verify the reason of different failures.
+            2. Verify the Retry-After of different failures.
+        """
+        step("Verify the reason of different failures.")
+        self.assertEqual(reason(api_exception(429)), "429")
+        self.assertEqual(reason(api_exception(503)), "503")
+        self.assertEqual(reason(MaxRetryError(None, "/", "Connection refused")), "connection")
+        self.assertIsNone(reason(api_exception(409)))
+        self.assertIsNone(reason(api_exception(422)))
+        self.assertIsNone(reason(ValueError("Invalid job")))
+
+        step("Verify the Retry-After of different failures.")
+        self.assertEqual(retry_after(api_exception(429, {"Retry-After": "2"})), 2)
+        self.assertEqual(
+            retry_after(api_exception(503, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})), 0
+        )
+        self.assertIsNone(retry_after(api_exception(503, {"Retry-After": "soon"})))
+        self.assertIsNone(retry_after(api_exception(503)))
+
+    def test_backoff(self):
+        """Test that retries back off exponentially within the budget.
+
+        Approval criteria:
+            - The maximum delay shall double for each retry, up to the maximum delay.
+            - A Retry-After header shall be waited for, even beyond the maximum delay.
+            - The call shall give up when out of retries or budget.
+
+        Test steps:
+            1. Call a function that always fails with a server error.
+            2. Verify that the delays doubled up to the maximum and that the call gave up.
+            3. Call a function that is throttled with Retry-After and then succeeds.
+            4. Verify that the Retry-After was waited for and the result returned.
+            5. Verify that the call gives up when the Retry-After exceeds the budget.
+        """
+        policy = RetryPolicy(4, base_delay=1, max_delay=3, budget=60, jitter=lambda: 1.0)
+        retries = REGISTRY.get_sample_value(RETRIES, {"reason": "503"}) or 0
+        delays = []
+
+        step("Call a function that always fails with a server error.")
+        function = MagicMock(side_effect=api_exception(503))
+        with self.assertRaises(ApiException):
+            policy.call(function, sleep=delays.append)
+
+        step("Verify that the delays doubled up to the maximum and that the call gave up.")
+        self.assertEqual(delays, [1, 2, 3, 3])
+        self.assertEqual(function.call_count, 5)
+        self.assertEqual(REGISTRY.get_sample_value(RETRIES, {"reason": "503"}) - retries, 4)
+
+        step("Call a function that is throttled with Retry-After and then succeeds.")
+        delays.clear()
+        function = MagicMock(side_effect=[api_exception(429, {"Retry-After": "10"}), "job"])
+        result = policy.call(function, sleep=delays.append)
+
+        step("Verify that the Retry-After was waited for and the result returned.")
+        self.assertEqual(result, "job")
+        self.assertEqual(delays, [10])
+
+        step("Verify that the call gives up when the Retry-After exceeds the budget.")
+        function = MagicMock(side_effect=api_exception(429, {"Retry-After": "61"}))
+        with self.assertRaises(ApiException):
+            policy.call(function, sleep=delays.append)
+        self.assertEqual(function.call_count, 1)
+
+    def test_no_retry(self):
+        """Test that failures that are not transient are raised immediately.
+
+        Approval criteria:
+            - A client error shall not be retried.
+
+        Test steps:
+            1. Call a function that fails with a conflict.
+            2. Verify that the function was called once.
+        """
+        step("Call a function that fails with a conflict.")
+        function = MagicMock(side_effect=api_exception(409))
+        with self.assertRaises(ApiException):
+            RetryPolicy(3).call(function, sleep=self.fail)
+
+        step("Verify that the function was called once.")
+        function.assert_called_once()
+
+    def test_from_environment(self):
+        """Test that the retry policy is configured from the environment.
+
+        Approval criteria:
+            - Retries, delays and budget shall be read from the environment.
+            - Negative values shall be rejected.
+
+        Test steps:
+            1. Load the retry policy with configuration.
+            2. Verify that the retry policy is configured.
+            3. Verify that negative retries are rejected.
+        """
+        step("Load the retry policy with configuration.")
+        environment = {
+            "SUITE_STARTER_RETRIES": "5",
+            "SUITE_STARTER_RETRY_BASE_DELAY": "0.1",
+            "SUITE_STARTER_RETRY_MAX_DELAY": "2",
+            "SUITE_STARTER_RETRY_BUDGET": "10",
+        }
+        with patch.dict(os.environ, environment):
+            policy = RetryPolicy.from_environment()
+
+        step("Verify that the retry policy is configured.")
+        self.assertEqual(
+            (policy.retries, policy.base_delay, policy.max_delay, policy.budget), (5, 0.1, 2, 10)
+        )
+
+        step("Verify that negative retries are rejected.")
+        with patch.dict(os.environ, {"SUITE_STARTER_RETRIES": "-1"}):
+            with self.assertRaises(ValueError):
+                RetryPolicy.from_environment()
+
+
+class TestCircuitBreaker(TestCase):
+    """Tests for CircuitBreaker."""
+
+    def setUp(self):
+        self.now = 0.0
+        self.states = []
+
+    def _breaker(self, threshold: int) -> CircuitBreaker:
+        """Create a circuit breaker with a fake clock, which never half-opens by itself."""
+        breaker = CircuitBreaker(threshold, 3600, self.states.append, clock=lambda: self.now)
+        self.addCleanup(breaker.stop)
+        return breaker
+
+    def test_open_and_close(self):
+        """Test that the circuit opens after failures in a row and closes after a trial.
+
+        Approval criteria:
+            - The circuit shall open after `threshold` transient failures in a row.
+            - Failures that are not transient shall not count.
+            - Calls shall be rejected while the circuit is open.
+            - A successful trial call shall close the circuit, a failed one open it again.
+
+        Test steps:
+            1. Fail calls with transient and other errors, up to the threshold.
+            2. Verify that the circuit opened and rejects calls.
+            3. Fail a trial call after the reset timeout.
+            4. Verify that the circuit opened again.
+            5. Make a successful trial call after the reset timeout.
+            6. Verify that the circuit closed.
+        """
+        breaker = self._breaker(threshold=2)
+        failing = MagicMock(side_effect=api_exception(503))
+
+        step("Fail calls with transient and other errors, up to the threshold.")
+        with self.assertRaises(ApiException):
+            breaker.call(failing)
+        with self.assertRaises(ApiException):
+            breaker.call(MagicMock(side_effect=api_exception(409)))
+        self.assertEqual(breaker.state, CLOSED)
+        for _ in range(2):
+            with self.assertRaises(ApiException):
+                breaker.call(failing)
+
+        step("Verify that the circuit opened and rejects calls.")
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(self.states, [OPEN])
+        with self.assertRaises(CircuitOpen):
+            breaker.call(self.fail)
+
+        step("Fail a trial call after the reset timeout.")
+        self.now += 3600
+        with self.assertRaises(ApiException):
+            breaker.call(failing)
+
+        step("Verify that the circuit opened again.")
+        self.assertEqual(self.states, [OPEN, HALF_OPEN, OPEN])
+
+        step("Make a successful trial call after the reset timeout.")
+        self.now += 3600
+        self.assertEqual(breaker.call(lambda: "job"), "job")
+
+        step("Verify that the circuit closed.")
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(self.states, [OPEN, HALF_OPEN, OPEN, HALF_OPEN, CLOSED])
+
+    def test_half_open(self):
+        """Test that only one trial call is made while the circuit is half-open.
+
+        Approval criteria:
+            - Other calls shall wait for the result of the trial call.
+            - The circuit shall half-open by itself after the reset timeout.
+
+        Test steps:
+            1. Open a circuit with a short reset timeout and wait for it to half-open.
+            2. Start a trial call and another call.
+            3. Verify that the other call waits for the trial call.
+            4. Finish the trial call and verify that the other call was made.
+        """
+        step("Open a circuit with a short reset timeout and wait for it to half-open.")
+        half_open = threading.Event()
+
+        def listener(state):
+            if state == HALF_OPEN:
+                half_open.set()
+
+        breaker = CircuitBreaker(1, 0.5, listener)
+        self.addCleanup(breaker.stop)
+        with self.assertRaises(ApiException):
+            breaker.call(MagicMock(side_effect=api_exception(500)))
+        self.assertTrue(half_open.wait(5))
+
+        step("Start a trial call and another call.")
+        release = threading.Event()
+        self.addCleanup(release.set)
+        calls = []
+        trial = threading.Thread(target=breaker.call, args=(release.wait,))
+        trial.start()
+        other = threading.Thread(target=breaker.call, args=(lambda: calls.append("other"),))
+        other.start()
+
+        step("Verify that the other call waits for the trial call.")
+        other.join(0.1)
+        self.assertTrue(other.is_alive())
+        self.assertEqual(calls, [])
+
+        step("Finish the trial call and verify that the other call was made.")
+        release.set()
+        trial.join(5)
+        other.join(5)
+        self.assertEqual(calls, ["other"])
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_half_open_timeout(self):
+        """Test that calls wait for a trial call that hangs for at most the reset timeout.
+
+        Approval criteria:
+            - A call waiting for the trial call shall fail with CircuitOpen after the reset
+              timeout, even if the trial call has not finished.
+
+        Test steps:
+            1. Open a circuit with a short reset timeout and wait for it to half-open.
+            2. Start a trial call that hangs.
+            3. Verify that another call fails after the reset timeout.
+        """
+        step("Open a circuit with a short reset timeout and wait for it to half-open.")
+        half_open = threading.Event()
+
+        def listener(state):
+            if state == HALF_OPEN:
+                half_open.set()
+
+        breaker = CircuitBreaker(1, 0.1, listener)
+        self.addCleanup(breaker.stop)
+        with self.assertRaises(ApiException):
+            breaker.call(MagicMock(side_effect=api_exception(500)))
+        self.assertTrue(half_open.wait(5))
+
+        step("Start a trial call that hangs.")
+        release = threading.Event()
+        trial = threading.Thread(target=breaker.call, args=(release.wait,))
+        trial.start()
+        self.addCleanup(trial.join, 5)
+        self.addCleanup(release.set)
+
+        step("Verify that another call fails after the reset timeout.")
+        start = time.monotonic()
+        with self.assertRaises(CircuitOpen):
+            breaker.call(self.fail)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertTrue(trial.is_alive())
+
+    def test_request_timeout(self):
+        """Test that requests to the Kubernetes API time out.
+
+        Approval criteria:
+            - A request that gets no response within the timeout shall fail as transient.
+
+        Test steps:
+            1. Create a job in a Kubernetes API that responds slower than the timeout.
+            2. Verify that the request failed with a transient error.
+        """
+        with FakeKubernetes(latency=1.0) as fake:
+            step("Create a job in a Kubernetes API that responds slower than the timeout.")
+            batch_v1 = client.BatchV1Api(TimeoutApiClient(0.1, fake.configuration()))
+            start = time.monotonic()
+            with self.assertRaises(Exception) as context:
+                batch_v1.create_namespaced_job("etos", {"metadata": {"name": "job"}})
+
+        step("Verify that the request failed with a transient error.")
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(reason(context.exception), "connection")
+
+
+class TestSuiteStarterRetry(TestCase):
+    """Tests for retries and the circuit breaker in the suite starter."""
+
+    def setUp(self):
+        self.fake = FakeKubernetes()
+        self.fake.start()
+        self.addCleanup(self.fake.stop)
+        os.environ["ETOS_CONFIGMAP"] = "etos"
+        os.environ["SUITE_RUNNER"] = "ESR"
+        Config().reset()
+
+    @staticmethod
+    def _tercc() -> EiffelTestExecutionRecipeCollectionCreatedEvent:
+        """Create a TERCC."""
+        tercc = EiffelTestExecutionRecipeCollectionCreatedEvent()
+        tercc.data.add("selectionStrategy", {"tracker": "Retry", "id": str(uuid.uuid4())})
+        tercc.data.add("batches", [])
+        return tercc
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    def test_suite_starter_retry(self, load_config):
+        """Test that suite starter retries creating a job while the API is throttling.
+
+        Approval criteria:
+            - A job shall be created after the Kubernetes API stops throttling.
+            - The Retry-After header of the Kubernetes API shall be waited for.
+            - Consuming shall be held when the circuit breaker opens.
+
+        Test steps:
+            1. Initialize SuiteStarter with a circuit breaker and throttle the fake API.
+            2. Deliver a TERCC.
+            3. Verify that the job was created after waiting for Retry-After.
+            4. Make the fake API unavailable and deliver a TERCC.
+            5. Verify that the TERCC was NACK:ed and consuming was held.
+        """
+        load_config.side_effect = lambda: client.Configuration.set_default(
+            self.fake.configuration()
+        )
+        step("Initialize SuiteStarter with a circuit breaker and throttle the fake API.")
+        environment = {
+            "SUITE_STARTER_RETRIES": "2",
+            "SUITE_STARTER_RETRY_BASE_DELAY": "0",
+            "SUITE_STARTER_CIRCUIT_BREAKER_THRESHOLD": "1",
+        }
+        with patch.dict(os.environ, environment):
+            suite_starter = SuiteStarter(str(BASE_PATH.joinpath("esr_template.yaml")))
+        self.addCleanup(suite_starter.breaker.stop)
+        suite_starter.job.namespace = "etos"
+        suite_starter.etos.subscriber.hold = MagicMock()
+        self.fake.fail(HTTPStatus.TOO_MANY_REQUESTS, count=2, retry_after="0.1")
+
+        step("Deliver a TERCC.")
+        tercc = self._tercc()
+        start = time.monotonic()
+        self.assertTrue(suite_starter.suite_runner_callback(tercc, None))
+
+        step("Verify that the job was created after waiting for Retry-After.")
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertIn(f"suite-runner-{tercc.meta.event_id}", self.fake.jobs["etos"])
+        self.assertEqual(self.fake.requests, 3)
+
+        step("Make the fake API unavailable and deliver a TERCC.")
+        self.fake.fail(HTTPStatus.SERVICE_UNAVAILABLE, count=3)
+        with self.assertRaises(ApiException):
+            suite_starter.suite_runner_callback(self._tercc(), None)
+
+        step("Verify that the TERCC was NACK:ed and consuming was held.")
+        self.assertEqual(suite_starter.breaker.state, OPEN)
+        suite_starter.etos.subscriber.hold.assert_called_once()
+        with self.assertRaises(CircuitOpen):
+            suite_starter.suite_runner_callback(self._tercc(), None)
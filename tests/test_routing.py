@@ -0,0 +1,209 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for routing TERCCs to suite runner templates."""
+
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from unittest import TestCase
+
+from eiffellib.events import EiffelTestExecutionRecipeCollectionCreatedEvent
+from etos_lib.lib.config import Config
+from mock import patch
+from prometheus_client import REGISTRY
+
+from suite_starter.routing import Route, TemplateRouter
+from suite_starter.suite_starter import SuiteStarter
+
+from .helpers import step
+
+BASE_PATH = Path(__file__).parent
+
+ROUTES = """
+routes:
+  - name: gpu
+    template: esr_template.yaml
+    match:
+      data.selectionStrategy.tracker: [gpu, ml]
+    configuration:
+      docker_image: ESR-GPU
+  - name: context
+    template: esr_template.yaml
+    match:
+      links: CONTEXT
+      data.batchesUri: "*"
+  - template: esr_template.yaml
+"""
+
+
+def tercc(tracker: str, *link_types: str) -> EiffelTestExecutionRecipeCollectionCreatedEvent:
+    """Create a TERCC with a tracker and links."""
+    event = EiffelTestExecutionRecipeCollectionCreatedEvent()
+    event.data.add("selectionStrategy", {"tracker": tracker, "id": str(uuid.uuid4())})
+    event.data.add("batchesUri", "http://internet.se")
+    for link_type in link_types:
+        event.links.add(link_type, str(uuid.uuid4()))
+    return event
+
+
+class TestTemplateRouter(TestCase):
+    """Tests for TemplateRouter."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()  # pylint:disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        os.environ["ETOS_CONFIGMAP"] = "etos"
+        os.environ["SUITE_RUNNER"] = "ESR"
+        Config().reset()
+        self.directory.joinpath("esr_template.yaml").write_text(
+            BASE_PATH.joinpath("esr_template.yaml").read_text(encoding="utf-8"),
+            encoding="utf-8",
+        )
+        self.routes = self.directory.joinpath("routes.yaml")
+        self.routes.write_text(ROUTES, encoding="utf-8")
+
+    def test_route(self):
+        """Test that TERCCs are routed to the first route whose conditions they match.
+
+        Approval criteria:
+            - A TERCC shall be routed to the first route that it matches all conditions of.
+            - A TERCC that matches no conditional route shall be routed to the last route.
+
+        Test steps:
+            1. Create routes with conditions on a path, on links and a default route.
+            2. Route TERCCs with different trackers and links.
+            3. Verify that every TERCC was routed to the expected route.
+        """
+        step("Create routes with conditions on a path, on links and a default route.")
+        router = TemplateRouter(
+            [
+                Route("gpu", None, {"data.selectionStrategy.tracker": ("gpu", "ml")}),
+                Route("context", None, {"links": ("CONTEXT",), "data.batchesUri": ("*",)}),
+                Route("default", None, {}),
+            ]
+        )
+
+        step("Route TERCCs with different trackers and links.")
+        routes = [
+            router.route(tercc("ml").json).name,
+            router.route(tercc("ml", "CONTEXT").json).name,
+            router.route(tercc("other", "CONTEXT", "CAUSE").json).name,
+            router.route(tercc("other", "CAUSE").json).name,
+        ]
+
+        step("Verify that every TERCC was routed to the expected route.")
+        self.assertEqual(routes, ["gpu", "gpu", "context", "default"])
+
+    def test_invalid_routes(self):
+        """Test that routes that would leave TERCCs without a template are rejected.
+
+        Approval criteria:
+            - The last route shall be required to have no conditions.
+            - Only the last route shall be allowed to have no conditions.
+            - Route names shall be required to be unique.
+
+        Test steps:
+            1. Verify that routes where the last route has conditions are rejected.
+            2. Verify that routes with a default route before the last are rejected.
+            3. Verify that routes with duplicate names are rejected.
+        """
+        step("Verify that routes where the last route has conditions are rejected.")
+        with self.assertRaises(ValueError):
+            TemplateRouter([Route("gpu", None, {"data.batchesUri": ("*",)})])
+        with self.assertRaises(ValueError):
+            TemplateRouter([])
+
+        step("Verify that routes with a default route before the last are rejected.")
+        with self.assertRaises(ValueError):
+            TemplateRouter([Route("a", None, {}), Route("b", None, {})])
+
+        step("Verify that routes with duplicate names are rejected.")
+        with self.assertRaises(ValueError):
+            TemplateRouter([Route("a", None, {"links": ("CAUSE",)}), Route("a", None, {})])
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    @patch("suite_starter.suite_starter.Job.create_job")
+    def test_suite_starter_routes(self, mock_job, _):
+        """Test that suite starter renders each TERCC from the template of its route.
+
+        Approval criteria:
+            - Every template shall be compiled with its own configuration overlay.
+            - Each TERCC shall be launched from the template that it was routed to.
+            - The TERCCs routed, rendered and launched for each template shall be counted.
+            - Suite runners that could not be launched shall be counted by template.
+
+        Test steps:
+            1. Initialize SuiteStarter with routes to two templates.
+            2. Launch suite runners for TERCCs that match different routes.
+            3. Verify that the jobs use the suite runner image of their routes.
+            4. Launch a suite runner when jobs can not be created.
+            5. Verify that the TERCCs were counted by route.
+        """
+
+        def samples() -> dict:
+            return {
+                (metric, name): REGISTRY.get_sample_value(metric, {"template": name}) or 0
+                for metric in (
+                    "suite_starter_terccs_routed_total",
+                    "suite_starter_render_seconds_count",
+                    "suite_starter_suite_runners_launched_total",
+                    "suite_starter_suite_runner_launch_failures_total",
+                )
+                for name in ("gpu", "esr_template")
+            }
+
+        step("Initialize SuiteStarter with routes to two templates.")
+        with patch.dict(os.environ, {"SUITE_STARTER_TEMPLATE_ROUTES": str(self.routes)}):
+            suite_starter = SuiteStarter(str(self.directory.joinpath("missing.yaml")))
+        self.assertEqual(
+            [route.name for route in suite_starter.router.routes],
+            ["gpu", "context", "esr_template"],
+        )
+        before = samples()
+
+        step("Launch suite runners for TERCCs that match different routes.")
+        for event in (tercc("gpu"), tercc("other"), tercc("gpu")):
+            self.assertTrue(suite_starter.suite_runner_callback(event, None))
+
+        step("Verify that the jobs use the suite runner image of their routes.")
+        images = [
+            call.args[0]["spec"]["template"]["spec"]["containers"][0]["image"]
+            for call in mock_job.call_args_list
+        ]
+        self.assertEqual(images, ["ESR-GPU", "ESR", "ESR-GPU"])
+
+        step("Launch a suite runner when jobs can not be created.")
+        mock_job.side_effect = Exception("Failed")
+        with self.assertRaises(Exception):
+            suite_starter.suite_runner_callback(tercc("gpu"), None)
+
+        step("Verify that the TERCCs were counted by route.")
+        after = samples()
+        self.assertEqual(
+            {key: after[key] - before[key] for key in after},
+            {
+                ("suite_starter_terccs_routed_total", "gpu"): 3,
+                ("suite_starter_terccs_routed_total", "esr_template"): 1,
+                ("suite_starter_render_seconds_count", "gpu"): 3,
+                ("suite_starter_render_seconds_count", "esr_template"): 1,
+                ("suite_starter_suite_runners_launched_total", "gpu"): 2,
+                ("suite_starter_suite_runners_launched_total", "esr_template"): 1,
+                ("suite_starter_suite_runner_launch_failures_total", "gpu"): 1,
+                ("suite_starter_suite_runner_launch_failures_total", "esr_template"): 0,
+            },
+        )
@@ -0,0 +1,229 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for the fair scheduler."""
+
+import os
+import threading
+import time
+from unittest import TestCase
+
+from mock import patch
+from prometheus_client import REGISTRY
+
+from suite_starter.scheduler import ANY, OTHER, UNKNOWN, FairScheduler, RateLimit, TokenBucket
+
+from .helpers import step
+
+QUEUE_DEPTH = "suite_starter_scheduler_queue_depth"
+WAIT_COUNT = "suite_starter_scheduler_wait_seconds_count"
+
+
+class TestFairScheduler(TestCase):
+    """Tests for FairScheduler."""
+
+    @staticmethod
+    def _launch_all(scheduler: FairScheduler, keys: list[str]) -> list[str]:
+        """Queue TERCCs for keys while the only launch slot is taken and launch them.
+
+        :return: Keys in the order that they were dispatched.
+        """
+        dispatched = []
+        scheduler.acquire("holder")
+
+        def launch(key):
+            scheduler.acquire(key)
+            dispatched.append(key)
+            scheduler.release()
+
+        threads = []
+        for key in keys:
+            waiting = scheduler.waiting(key)
+            thread = threading.Thread(target=launch, args=(key,))
+            thread.start()
+            threads.append(thread)
+            while scheduler.waiting(key) == waiting:
+                time.sleep(0.001)
+        scheduler.release()
+        for thread in threads:
+            thread.join(timeout=10)
+        return dispatched
+
+    def test_round_robin(self):
+        """Test that a key with many TERCCs does not delay the TERCCs of other keys.
+
+        Approval criteria:
+            - TERCCs shall be dispatched round-robin between keys.
+            - Keys shall get launches in proportion to their weights.
+
+        Test steps:
+            1. Queue 20 TERCCs for one key and then 2 TERCCs each for two other keys.
+            2. Verify that the other keys were dispatched in the first rounds.
+            3. Queue TERCCs for two keys with weights 3 and 1.
+            4. Verify that the keys were dispatched 3 to 1.
+        """
+        step("Queue 20 TERCCs for one key and then 2 TERCCs each for two other keys.")
+        dispatched = self._launch_all(FairScheduler(1), ["busy"] * 20 + ["a", "a", "b", "b"])
+
+        step("Verify that the other keys were dispatched in the first rounds.")
+        self.assertEqual(len(dispatched), 24)
+        self.assertEqual(sorted(dispatched[:6]), ["a", "a", "b", "b", "busy", "busy"])
+
+        step("Queue TERCCs for two keys with weights 3 and 1.")
+        scheduler = FairScheduler(1, weights={"heavy": 3, "light": 1})
+        dispatched = self._launch_all(scheduler, ["heavy"] * 12 + ["light"] * 12)
+
+        step("Verify that the keys were dispatched 3 to 1.")
+        self.assertEqual(dispatched[:8].count("heavy"), 6)
+        self.assertEqual(REGISTRY.get_sample_value(QUEUE_DEPTH, {"key": "heavy"}), 0)
+        self.assertEqual(REGISTRY.get_sample_value(WAIT_COUNT, {"key": "light"}), 12)
+
+    def test_unbounded_keys(self):
+        """Test that keys read from TERCCs do not grow the metrics or the scheduler state.
+
+        Approval criteria:
+            - Keys without a weight or rate limit of their own shall be labelled 'other'.
+            - Token buckets of keys without waiting TERCCs shall be dropped when refilled.
+
+        Test steps:
+            1. Launch a TERCC each for many keys that are rate limited by '*'.
+            2. Verify that the keys were labelled 'other' in the metrics.
+            3. Verify that the token buckets of the keys were dropped.
+        """
+        now = [0.0]
+        scheduler = FairScheduler(
+            2,
+            weights={"configured": 2},
+            rate_limits={ANY: RateLimit(1, 1)},
+            clock=lambda: now[0],
+        )
+        before = REGISTRY.get_sample_value(WAIT_COUNT, {"key": OTHER}) or 0
+
+        step("Launch a TERCC each for many keys that are rate limited by '*'.")
+        for index in range(50):
+            scheduler.acquire(f"tenant-{index}")
+            now[0] += 1.0
+            scheduler.release()
+
+        step("Verify that the keys were labelled 'other' in the metrics.")
+        self.assertEqual(REGISTRY.get_sample_value(WAIT_COUNT, {"key": OTHER}) - before, 50)
+        self.assertIsNone(REGISTRY.get_sample_value(WAIT_COUNT, {"key": "tenant-0"}))
+
+        step("Verify that the token buckets of the keys were dropped.")
+        self.assertEqual(scheduler.buckets(), 0)
+
+    def test_rate_limit(self):
+        """Test that a rate limited key is launched at most at its rate.
+
+        Approval criteria:
+            - A key shall be launched at most its burst at once and then at its rate.
+            - Other keys shall not wait for a rate limited key.
+
+        Test steps:
+            1. Queue 5 TERCCs for a key limited to 20 per second with a burst of 2.
+            2. Queue a TERCC for a key without a rate limit.
+            3. Verify that the TERCCs took at least 3 / 20 seconds to launch.
+            4. Verify that the key without a rate limit did not wait for the limited key.
+        """
+        scheduler = FairScheduler(10, rate_limits={"limited": RateLimit(20, 2)})
+        launched = {}
+
+        def launch(key, index):
+            scheduler.acquire(key)
+            launched[(key, index)] = time.monotonic()
+            scheduler.release()
+
+        start = time.monotonic()
+        step("Queue 5 TERCCs for a key limited to 20 per second with a burst of 2.")
+        threads = [threading.Thread(target=launch, args=("limited", index)) for index in range(5)]
+        step("Queue a TERCC for a key without a rate limit.")
+        threads.append(threading.Thread(target=launch, args=("free", 0)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        step("Verify that the TERCCs took at least 3 / 20 seconds to launch.")
+        self.assertEqual(len(launched), 6)
+        self.assertGreaterEqual(max(launched.values()) - start, 0.14)
+
+        step("Verify that the key without a rate limit did not wait for the limited key.")
+        self.assertLess(launched[("free", 0)] - start, 0.1)
+
+    def test_token_bucket(self):
+        """Test that a token bucket refills at its rate up to its burst.
+
+        Approval criteria:
+            - A full bucket shall allow a burst without delay.
+            - An empty bucket shall allow one more when a token has been refilled.
+
+        Test steps:
+            1. Take a burst of tokens from a full bucket.
+            2. Verify the delay until the next token at different times.
+        """
+        step("Take a burst of tokens from a full bucket.")
+        bucket = TokenBucket(RateLimit(rate=2, burst=3), now=100.0)
+        for _ in range(3):
+            self.assertEqual(bucket.delay(100.0), 0)
+            bucket.take()
+
+        step("Verify the delay until the next token at different times.")
+        self.assertAlmostEqual(bucket.delay(100.0), 0.5)
+        self.assertAlmostEqual(bucket.delay(100.25), 0.25)
+        self.assertEqual(bucket.delay(110.0), 0)
+        self.assertEqual(bucket.tokens, 3)
+
+    def test_from_environment(self):
+        """Test that the scheduler is configured from the environment.
+
+        Approval criteria:
+            - The scheduler shall be disabled unless a concurrency is configured.
+            - Key path, weights and rate limits shall be read from the environment.
+
+        Test steps:
+            1. Load the scheduler without configuration.
+            2. Verify that there is no scheduler.
+            3. Load the scheduler with configuration.
+            4. Verify that the scheduler is configured and reads keys from TERCCs.
+        """
+        step("Load the scheduler without configuration.")
+        with patch.dict(os.environ, {}, clear=True):
+            scheduler = FairScheduler.from_environment()
+
+        step("Verify that there is no scheduler.")
+        self.assertIsNone(scheduler)
+
+        step("Load the scheduler with configuration.")
+        environment = {
+            "SUITE_STARTER_SCHEDULER_CONCURRENCY": "4",
+            "SUITE_STARTER_SCHEDULER_KEY": "meta.source.name",
+            "SUITE_STARTER_SCHEDULER_WEIGHTS": "nightly=0.5, release=4",
+            "SUITE_STARTER_SCHEDULER_RATE_LIMITS": "nightly=0.1/10,*=2",
+        }
+        with patch.dict(os.environ, environment):
+            scheduler = FairScheduler.from_environment()
+
+        step("Verify that the scheduler is configured and reads keys from TERCCs.")
+        self.assertEqual(scheduler.concurrency, 4)
+        self.assertEqual(scheduler.weights, {"nightly": 0.5, "release": 4.0})
+        self.assertEqual(
+            scheduler.rate_limits, {"nightly": RateLimit(0.1, 10), "*": RateLimit(2, 1)}
+        )
+        self.assertEqual(scheduler.key({"meta": {"source": {"name": "nightly"}}}), "nightly")
+        self.assertEqual(scheduler.key({"meta": {"source": {}}}), UNKNOWN)
+        environment["SUITE_STARTER_SCHEDULER_RATE_LIMITS"] = "nightly=0"
+        with patch.dict(os.environ, environment):
+            with self.assertRaises(ValueError):
+                FairScheduler.from_environment()
@@ -0,0 +1,344 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for the suite starter RabbitMQ subscriber."""
+
+import json
+import os
+import threading
+import time
+from unittest import TestCase
+
+from eiffellib.events import EiffelTestExecutionRecipeCollectionCreatedEvent
+from mock import MagicMock, patch
+
+from suite_starter.metrics import IN_FLIGHT
+from suite_starter.subscriber import FlowControl, SuiteStarterSubscriber
+
+from .fakes import InMemoryBroker
+from .helpers import step
+
+
+class TestSuiteStarterSubscriber(TestCase):
+    """Tests for SuiteStarterSubscriber."""
+
+    # The subscriber is driven without a RabbitMQ connection.
+    # pylint:disable=protected-access
+
+    def _subscriber(self, flow_control: FlowControl) -> SuiteStarterSubscriber:
+        """Create a subscriber with a mocked channel, handing over messages immediately."""
+        subscriber = SuiteStarterSubscriber(
+            workers=2,
+            flow_control=flow_control,
+            host="localhost",
+            queue="suite-starter",
+            exchange="amq.fanout",
+        )
+        subscriber._channel = MagicMock()
+        subscriber._connection = MagicMock()
+        subscriber._connection.ioloop.add_callback.side_effect = lambda callback: callback()
+        subscriber._consumer_tag = "tag"
+        setattr(subscriber, "_RabbitMQSubscriber__workers", MagicMock())
+        return subscriber
+
+    def test_flow_control_from_environment(self):
+        """Test that flow control settings are loaded from the environment.
+
+        Approval criteria:
+            - Prefetch shall default to the number of workers and in-flight limit be disabled.
+            - The low-water mark shall default to half of the in-flight limit.
+            - A low-water mark that is not below the in-flight limit shall be rejected.
+
+        Test steps:
+            1. Load flow control settings without environment variables.
+            2. Load flow control settings with a maximum number of TERCCs in flight.
+            3. Verify that an invalid low-water mark is rejected.
+        """
+        step("Load flow control settings without environment variables.")
+        with patch.dict(os.environ):
+            for name in ("SUITE_STARTER_PREFETCH", "SUITE_STARTER_MAX_IN_FLIGHT"):
+                os.environ.pop(name, None)
+            self.assertEqual(FlowControl.from_environment(5), FlowControl(5, 0, 0))
+
+        step("Load flow control settings with a maximum number of TERCCs in flight.")
+        with patch.dict(
+            os.environ, {"SUITE_STARTER_PREFETCH": "20", "SUITE_STARTER_MAX_IN_FLIGHT": "10"}
+        ):
+            self.assertEqual(FlowControl.from_environment(5), FlowControl(20, 10, 5))
+
+        step("Verify that an invalid low-water mark is rejected.")
+        with patch.dict(
+            os.environ,
+            {"SUITE_STARTER_MAX_IN_FLIGHT": "10", "SUITE_STARTER_IN_FLIGHT_LOW_WATER": "10"},
+        ):
+            with self.assertRaises(ValueError):
+                FlowControl.from_environment(5)
+
+    def test_pause_and_resume(self):
+        """Test that consuming is paused at the in-flight limit and resumed at low water.
+
+        Approval criteria:
+            - Consuming shall be paused when the maximum number of TERCCs are in flight.
+            - Consuming shall be resumed when the in-flight count drops to the low-water mark.
+            - The in-flight gauge shall follow the number of TERCCs in flight.
+
+        Test steps:
+            1. Receive TERCCs up to the in-flight limit.
+            2. Verify that consuming was paused.
+            3. Finish TERCCs down to the low-water mark.
+            4. Verify that consuming was resumed.
+        """
+        subscriber = self._subscriber(FlowControl(prefetch=4, max_in_flight=4, low_water=1))
+        gauge = IN_FLIGHT._value.get()
+        with patch("etos_lib.eiffel.subscriber.TracingRabbitMQSubscriber._on_message"):
+            step("Receive TERCCs up to the in-flight limit.")
+            for tag in range(4):
+                subscriber._on_message(None, tag, None, b"{}")
+
+            step("Verify that consuming was paused.")
+            self.assertTrue(subscriber.paused)
+            subscriber._channel.basic_cancel.assert_called_once_with("tag")
+            self.assertEqual(IN_FLIGHT._value.get() - gauge, 4)
+
+        step("Finish TERCCs down to the low-water mark.")
+        subscriber.callback_results(0, (True, False))
+        subscriber.callback_error(1, RuntimeError("Failed"))
+        self.assertTrue(subscriber.paused)
+        subscriber.callback_results(2, (True, False))
+
+        step("Verify that consuming was resumed.")
+        self.assertFalse(subscriber.paused)
+        subscriber._channel.basic_consume.assert_called_once()
+        self.assertEqual(subscriber.in_flight, 1)
+        self.assertEqual(IN_FLIGHT._value.get() - gauge, 1)
+
+    def test_no_in_flight_limit(self):
+        """Test that consuming is never paused without an in-flight limit.
+
+        Approval criteria:
+            - Consuming shall not be paused when the in-flight limit is disabled.
+            - The thread pool queue shall fit all prefetched messages.
+
+        Test steps:
+            1. Receive more TERCCs than the prefetch count.
+            2. Verify that consuming was not paused.
+        """
+        subscriber = self._subscriber(FlowControl(prefetch=8))
+        self.assertEqual(subscriber.max_queue, 8)
+        with patch("etos_lib.eiffel.subscriber.TracingRabbitMQSubscriber._on_message"):
+            step("Receive more TERCCs than the prefetch count.")
+            for tag in range(10):
+                subscriber._on_message(None, tag, None, b"{}")
+
+        step("Verify that consuming was not paused.")
+        self.assertFalse(subscriber.paused)
+        subscriber._channel.basic_cancel.assert_not_called()
+
+    def test_hold(self):
+        """Test that consuming is held until released, regardless of in-flight TERCCs.
+
+        Approval criteria:
+            - Consuming shall be paused when it is held.
+            - Consuming shall not be resumed at the low-water mark while it is held.
+            - Consuming shall be resumed when it is no longer held.
+
+        Test steps:
+            1. Receive a TERCC and hold consuming.
+            2. Finish the TERCC and verify that consuming was not resumed.
+            3. Stop holding consuming and verify that it was resumed.
+        """
+        subscriber = self._subscriber(FlowControl(prefetch=4, max_in_flight=4, low_water=1))
+        with patch("etos_lib.eiffel.subscriber.TracingRabbitMQSubscriber._on_message"):
+            step("Receive a TERCC and hold consuming.")
+            subscriber._on_message(None, 0, None, b"{}")
+            subscriber.hold()
+            self.assertTrue(subscriber.paused)
+            subscriber._channel.basic_cancel.assert_called_once_with("tag")
+
+        step("Finish the TERCC and verify that consuming was not resumed.")
+        subscriber.callback_results(0, (False, True))
+        self.assertTrue(subscriber.paused)
+        subscriber._channel.basic_consume.assert_not_called()
+
+        step("Stop holding consuming and verify that it was resumed.")
+        subscriber.unhold()
+        self.assertFalse(subscriber.held)
+        self.assertFalse(subscriber.paused)
+        subscriber._channel.basic_consume.assert_called_once()
+
+    def test_consume_from_broker(self):
+        """Test that the subscriber handles all TERCCs from a broker with flow control.
+
+        Approval criteria:
+            - All TERCCs shall be handled and ACK:ed.
+            - At most `workers` TERCCs shall be handled at once.
+            - Consuming shall be paused and resumed when TERCCs are in flight.
+
+        Test steps:
+            1. Attach a subscriber with an in-flight limit to an in-memory broker.
+            2. Publish more TERCCs than the in-flight limit.
+            3. Verify that all TERCCs were ACK:ed, at most two at a time.
+        """
+        step("Attach a subscriber with an in-flight limit to an in-memory broker.")
+        subscriber = SuiteStarterSubscriber(
+            workers=2,
+            flow_control=FlowControl(prefetch=4, max_in_flight=3, low_water=1),
+            host="localhost",
+            queue="suite-starter",
+            exchange="amq.fanout",
+        )
+        lock = threading.Lock()
+        running = []
+        concurrency = []
+
+        def callback(*_):
+            with lock:
+                running.append(None)
+                concurrency.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+            return True
+
+        subscriber.subscribe(
+            "EiffelTestExecutionRecipeCollectionCreatedEvent", callback, can_nack=True
+        )
+        with patch.object(SuiteStarterSubscriber, "pause", wraps=subscriber.pause) as pause:
+            with InMemoryBroker() as broker:
+                broker.attach(subscriber)
+
+                step("Publish more TERCCs than the in-flight limit.")
+                for _ in range(20):
+                    tercc = EiffelTestExecutionRecipeCollectionCreatedEvent()
+                    tercc.data.add("selectionStrategy", {"id": "broker"})
+                    tercc.data.add("batches", [])
+                    broker.publish(tercc.serialized.encode("utf-8"))
+
+                step("Verify that all TERCCs were ACK:ed, at most two at a time.")
+                self.assertTrue(broker.wait(20, timeout=10))
+        self.assertEqual(len(broker.acked), 20)
+        self.assertEqual(broker.rejected, [])
+        self.assertEqual(broker.requeued, 0)
+        self.assertEqual(max(concurrency), 2)
+        self.assertGreater(pause.call_count, 0)
+        self.assertFalse(subscriber.paused)
+
+    def test_drain(self):
+        """Test that the subscriber drains the messages in flight.
+
+        Approval criteria:
+            - Consuming shall stop when draining.
+            - Launches that finish before the deadline shall be ACK:ed.
+            - Prefetched messages that have not started shall be requeued without handling.
+            - Launches still running at the deadline shall be returned to the queue.
+
+        Test steps:
+            1. Consume messages with two workers, whose callbacks block.
+            2. Drain the subscriber and let one callback finish.
+            3. Verify the drain report and that the messages are back in the queue.
+        """
+        step("Consume messages with two workers, whose callbacks block.")
+        subscriber = SuiteStarterSubscriber(
+            workers=2,
+            flow_control=FlowControl(prefetch=6),
+            host="localhost",
+            queue="suite-starter",
+            exchange="amq.fanout",
+        )
+        started = threading.Semaphore(0)
+        release = threading.Semaphore(0)
+        self.addCleanup(release.release, 2)
+
+        def callback(*_):
+            started.release()
+            release.acquire()  # pylint:disable=consider-using-with
+            return True
+
+        subscriber.subscribe(
+            "EiffelTestExecutionRecipeCollectionCreatedEvent", callback, can_nack=True
+        )
+        with InMemoryBroker() as broker:
+            broker.attach(subscriber)
+            for _ in range(6):
+                tercc = EiffelTestExecutionRecipeCollectionCreatedEvent()
+                tercc.data.add("selectionStrategy", {"id": "drain"})
+                tercc.data.add("batches", [])
+                broker.publish(tercc.serialized.encode("utf-8"))
+            for _ in range(2):
+                self.assertTrue(started.acquire(timeout=5))  # pylint:disable=consider-using-with
+
+            step("Drain the subscriber and let one callback finish.")
+            reports = []
+            drain = threading.Thread(target=lambda: reports.append(subscriber.drain(0.5)))
+            drain.start()
+            while not subscriber.draining:
+                time.sleep(0.01)
+            release.release()
+            drain.join(timeout=5)
+
+        step("Verify the drain report and that the messages are back in the queue.")
+        self.assertEqual(tuple(reports[0]), (1, 4, 1))
+        self.assertEqual(len(broker.acked), 1)
+        self.assertEqual(broker.requeued, 4)
+        self.assertTrue(broker.closed)
+        self.assertEqual(broker.ready, 5)
+
+    def test_redelivery(self):
+        """Test that a TERCC that could not be handled is redelivered by the broker.
+
+        Approval criteria:
+            - A TERCC that could not be handled shall be NACK:ed and requeued.
+            - A requeued TERCC shall be delivered again and ACK:ed when it is handled.
+
+        Test steps:
+            1. Consume TERCCs with a callback that fails the first delivery of one TERCC.
+            2. Verify that the TERCC was requeued, delivered twice and ACK:ed.
+        """
+        step("Consume TERCCs with a callback that fails the first delivery of one TERCC.")
+        subscriber = SuiteStarterSubscriber(
+            workers=2,
+            flow_control=FlowControl(prefetch=2),
+            host="localhost",
+            queue="suite-starter",
+            exchange="amq.fanout",
+        )
+        terccs = []
+        for _ in range(3):
+            tercc = EiffelTestExecutionRecipeCollectionCreatedEvent()
+            tercc.data.add("selectionStrategy", {"id": "redelivery"})
+            tercc.data.add("batches", [])
+            terccs.append(tercc.serialized.encode("utf-8"))
+        failing = [json.loads(terccs[0])["meta"]["id"]]
+
+        def callback(event, *_):
+            if event.meta.event_id in failing:
+                failing.remove(event.meta.event_id)
+                return False
+            return True
+
+        subscriber.subscribe(
+            "EiffelTestExecutionRecipeCollectionCreatedEvent", callback, can_nack=True
+        )
+        with InMemoryBroker() as broker:
+            broker.attach(subscriber)
+            for body in terccs:
+                broker.publish(body)
+            self.assertTrue(broker.wait(3, timeout=10))
+
+        step("Verify that the TERCC was requeued, delivered twice and ACK:ed.")
+        self.assertEqual(broker.requeued, 1)
+        self.assertEqual([broker.deliveries[body] for body in terccs], [2, 1, 1])
+        self.assertEqual(sorted(body for body, _ in broker.acked), sorted(terccs))
+        self.assertEqual(broker.unacked, 0)
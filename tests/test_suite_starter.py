@@ -15,32 +15,43 @@
 # limitations under the License.
 """Test module for ETOS suite starter."""
 
+import base64
+import gzip
 import os
+import tempfile
+import time
 import uuid
 import json
-import logging
+from http import HTTPStatus
 from unittest import TestCase
 from pathlib import Path
 from mock import patch
 
 from eiffellib.events import EiffelTestExecutionRecipeCollectionCreatedEvent
 from etos_lib.lib.config import Config
-
+from etos_lib.lib.exceptions import SubscriberConfigurationMissing
+from kubernetes import client
+from kubernetes.client.exceptions import ApiException
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import ALWAYS_OFF
+from prometheus_client import REGISTRY
+
+from suite_starter.retry import CircuitOpen
+from suite_starter.subscriber import SuiteStarterSubscriber
 from suite_starter.suite_starter import SuiteStarter
 
+from .fakes import FakeKubernetes, InMemoryBroker
+from .helpers import step
+
 # It's okay since it's tests. pylint:disable=broad-exception-raised
-LOGGER = logging.getLogger("TESTS")
 BASE_PATH = Path(__file__).parent
 
 os.environ["ETOS_DISABLE_SENDING_EVENTS"] = "1"  # True
 os.environ["ETOS_DISABLE_RECEIVING_EVENTS"] = "1"  # True
 
 
-def step(msg):
-    """Test step printer."""
-    LOGGER.info("STEP: %s", msg)
-
-
 class TestSuiteStarter(TestCase):
     """Tests for SuiteStarter."""
 
@@ -205,3 +216,603 @@ class TestSuiteStarter(TestCase):
             "Docker image sent to ESR is not correct. "
             f"Expected {self.suite_runner!r}, Was {image[2]!r}",
         )
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    def test_suite_starter_workers(self, _):
+        """Test that suite starter consumes TERCCs with the configured number of workers.
+
+        Approval criteria:
+            - SuiteStarter shall start a subscriber with as many workers as configured.
+            - The subscriber shall not prefetch more TERCCs than there are workers.
+
+        Test steps:
+            1. Initialize SuiteStarter with 3 workers configured.
+            2. Verify that the subscriber is configured with 3 workers.
+        """
+        step("Initialize SuiteStarter with 3 workers configured.")
+        template = BASE_PATH.joinpath("esr_template.yaml")
+        with patch.dict(os.environ, {"SUITE_STARTER_WORKERS": "3"}):
+            suite_starter = SuiteStarter(str(template))
+
+        step("Verify that the subscriber is configured with 3 workers.")
+        self.assertEqual(suite_starter.etos.subscriber.max_threads, 3)
+        self.assertEqual(suite_starter.etos.subscriber.prefetch_count, 3)
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    def test_suite_starter_subscriber_configuration_missing(self, _):
+        """Test that suite starter does not start without a RabbitMQ configuration.
+
+        Approval criteria:
+            - SuiteStarter shall raise SubscriberConfigurationMissing without a configuration.
+            - No subscriber shall be started.
+
+        Test steps:
+            1. Initialize SuiteStarter without a RabbitMQ subscriber configuration.
+            2. Verify that SubscriberConfigurationMissing was raised and no subscriber started.
+        """
+        step("Initialize SuiteStarter without a RabbitMQ subscriber configuration.")
+        template = BASE_PATH.joinpath("esr_template.yaml")
+        with patch.object(Config, "rabbitmq_subscriber_from_environment"):
+            with self.assertRaises(SubscriberConfigurationMissing):
+                SuiteStarter(str(template))
+
+        step("Verify that SubscriberConfigurationMissing was raised and no subscriber started.")
+        self.assertFalse(Config().get("subscriber"))
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    def test_suite_starter_shutdown(self, _):
+        """Test that suite starter drains the TERCCs in flight before it shuts down.
+
+        Approval criteria:
+            - On SIGTERM, the suite starter shall be drained before the ETOS monitor shuts down.
+
+        Test steps:
+            1. Run SuiteStarter until it receives SIGTERM.
+            2. Verify that the suite starter was drained before the monitor shut down.
+        """
+        step("Run SuiteStarter until it receives SIGTERM.")
+        template = BASE_PATH.joinpath("esr_template.yaml")
+        suite_starter = SuiteStarter(str(template))
+        calls = []
+        monitor = suite_starter.etos.monitor
+
+        def keep_alive(_):
+            monitor._handle_shutdown(15, None)  # pylint:disable=protected-access
+
+        with patch.object(monitor, "_handle_shutdown", side_effect=lambda *_: calls.append("exit")):
+            with patch.object(suite_starter, "drain", side_effect=lambda: calls.append("drain")):
+                with patch.object(monitor, "keep_alive", side_effect=keep_alive):
+                    with patch.dict(os.environ, {"SUITE_STARTER_METRICS_PORT": "0"}):
+                        suite_starter.run()
+        suite_starter.template_watcher.stop()
+
+        step("Verify that the suite starter was drained before the monitor shut down.")
+        self.assertEqual(calls, ["drain", "exit"])
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    def test_suite_starter_ready(self, _):
+        """Test that suite starter signals that it is ready once it consumes TERCCs.
+
+        Approval criteria:
+            - SuiteStarter shall be ready once it has been initialized.
+            - SuiteStarter shall touch the ready file, if configured.
+
+        Test steps:
+            1. Initialize SuiteStarter with a ready file configured.
+            2. Verify that the suite starter is ready and that the ready file exists.
+        """
+        step("Initialize SuiteStarter with a ready file configured.")
+        template = BASE_PATH.joinpath("esr_template.yaml")
+        with tempfile.TemporaryDirectory() as directory:
+            ready_file = Path(directory).joinpath("ready")
+            with patch.dict(os.environ, {"SUITE_STARTER_READY_FILE": str(ready_file)}):
+                suite_starter = SuiteStarter(str(template))
+
+            step("Verify that the suite starter is ready and that the ready file exists.")
+            self.assertTrue(suite_starter.ready.is_set())
+            self.assertTrue(ready_file.exists())
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    @patch("suite_starter.suite_starter.Job.create_job")
+    def test_suite_starter_backlog(self, mock_job, _):
+        """Test that suite starter launches suite runners for TERCCs queued before it started.
+
+        Approval criteria:
+            - TERCCs delivered as soon as the subscriber starts shall all be launched.
+
+        Test steps:
+            1. Queue TERCCs in a broker before the suite starter is started.
+            2. Initialize SuiteStarter, consuming from the broker as soon as it starts.
+            3. Verify that a suite runner was launched for every queued TERCC.
+        """
+        with InMemoryBroker() as broker:
+            step("Queue TERCCs in a broker before the suite starter is started.")
+            terccs = [self._generate_tercc() for _ in range(4)]
+            for tercc in terccs:
+                broker.publish(tercc.serialized.encode("utf-8"))
+
+            step("Initialize SuiteStarter, consuming from the broker as soon as it starts.")
+
+            def start(subscriber):
+                broker.attach(subscriber)
+                # RabbitMQ delivers the backlog as soon as consuming starts, which can be
+                # before `start` returns. Handle all of it before returning.
+                self.assertTrue(broker.wait(len(terccs), timeout=10))
+
+            template = BASE_PATH.joinpath("esr_template.yaml")
+            with patch.dict(os.environ, {"ETOS_DISABLE_RECEIVING_EVENTS": ""}):
+                with patch.object(SuiteStarterSubscriber, "start", start):
+                    SuiteStarter(str(template))
+
+        step("Verify that a suite runner was launched for every queued TERCC.")
+        self.assertEqual(broker.requeued, 0)
+        self.assertEqual(
+            sorted(call.args[0]["metadata"]["labels"]["id"] for call in mock_job.call_args_list),
+            sorted(tercc.meta.event_id for tercc in terccs),
+        )
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    @patch("suite_starter.suite_starter.Job.create_job")
+    def test_suite_starter_fair_scheduler(self, mock_job, _):
+        """Test that suite starter launches suite runners through the fair scheduler.
+
+        Approval criteria:
+            - SuiteStarter shall wait for the scheduler, keyed on the TERCC tracker.
+            - SuiteStarter shall free the launch slot when the suite runner has been launched.
+
+        Test steps:
+            1. Initialize SuiteStarter with a fair scheduler configured.
+            2. Launch suite runners for two TERCCs.
+            3. Verify that the TERCCs were scheduled by their tracker and launched.
+        """
+        step("Initialize SuiteStarter with a fair scheduler configured.")
+        template = BASE_PATH.joinpath("esr_template.yaml")
+        environment = {
+            "SUITE_STARTER_SCHEDULER_CONCURRENCY": "1",
+            "SUITE_STARTER_SCHEDULER_WEIGHTS": "Suite Builder=2",
+        }
+        with patch.dict(os.environ, environment):
+            suite_starter = SuiteStarter(str(template))
+        waited = REGISTRY.get_sample_value(
+            "suite_starter_scheduler_wait_seconds_count", {"key": "Suite Builder"}
+        )
+
+        step("Launch suite runners for two TERCCs.")
+        for tercc in (self._generate_tercc(), self._generate_tercc()):
+            self.assertTrue(suite_starter.suite_runner_callback(tercc, tercc.meta.event_id))
+
+        step("Verify that the TERCCs were scheduled by their tracker and launched.")
+        self.assertEqual(mock_job.call_count, 2)
+        self.assertEqual(
+            REGISTRY.get_sample_value(
+                "suite_starter_scheduler_wait_seconds_count", {"key": "Suite Builder"}
+            ),
+            (waited or 0) + 2,
+        )
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    def test_suite_starter_kubernetes_client(self, load_config):
+        """Test that suite starter reuses the Kubernetes client and its connections.
+
+        Approval criteria:
+            - SuiteStarter shall load the Kubernetes configuration once.
+            - SuiteStarter shall launch all suite runners over a single connection.
+
+        Test steps:
+            1. Initialize SuiteStarter against a fake Kubernetes API.
+            2. Execute SuiteStarter with three TERCCs as input.
+            3. Verify that the configuration was loaded once and one connection was opened.
+        """
+        with FakeKubernetes() as fake:
+            step("Initialize SuiteStarter against a fake Kubernetes API.")
+            load_config.side_effect = lambda: client.Configuration.set_default(fake.configuration())
+            template = BASE_PATH.joinpath("esr_template.yaml")
+            suite_starter = SuiteStarter(str(template))
+            suite_starter.job.namespace = "etos"
+
+            step("Execute SuiteStarter with three TERCCs as input.")
+            for _ in range(3):
+                tercc = self._generate_tercc()
+                self.assertTrue(suite_starter.suite_runner_callback(tercc, tercc.meta.event_id))
+
+            step("Verify that the configuration was loaded once and one connection was opened.")
+            self.assertEqual(load_config.call_count, 1)
+            self.assertEqual(len(fake.jobs["etos"]), 3)
+            self.assertEqual(fake.connections, 1)
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    def test_suite_starter_duplicate_tercc(self, load_config):
+        """Test that suite starter launches one suite runner per TERCC across replicas.
+
+        Approval criteria:
+            - The suite runner job name shall be derived from the suite ID only.
+            - A TERCC delivered to two replicas shall create one job and be ACK:ed by both.
+            - A TERCC redelivered to the same replica shall not reach the Kubernetes API.
+
+        Test steps:
+            1. Initialize two SuiteStarter replicas against a fake Kubernetes API.
+            2. Deliver the same TERCC to both replicas.
+            3. Verify that one job was created, named after the suite ID.
+            4. Redeliver the TERCC to the first replica.
+            5. Verify that no request was sent to the Kubernetes API.
+        """
+        with FakeKubernetes() as fake:
+            step("Initialize two SuiteStarter replicas against a fake Kubernetes API.")
+            load_config.side_effect = lambda: client.Configuration.set_default(fake.configuration())
+            template = BASE_PATH.joinpath("esr_template.yaml")
+            replicas = [SuiteStarter(str(template)), SuiteStarter(str(template))]
+            for replica in replicas:
+                replica.job.namespace = "etos"
+
+            step("Deliver the same TERCC to both replicas.")
+            tercc = self._generate_tercc()
+            for replica in replicas:
+                self.assertTrue(replica.suite_runner_callback(tercc, tercc.meta.event_id))
+
+            step("Verify that one job was created, named after the suite ID.")
+            self.assertEqual(list(fake.jobs["etos"]), [f"suite-runner-{tercc.meta.event_id}"])
+            self.assertEqual(fake.requests, 2)
+
+            step("Redeliver the TERCC to the first replica.")
+            self.assertTrue(replicas[0].suite_runner_callback(tercc, tercc.meta.event_id))
+
+            step("Verify that no request was sent to the Kubernetes API.")
+            self.assertEqual(fake.requests, 2)
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    @patch("suite_starter.suite_starter.Job.create_job")
+    def test_suite_starter_metrics(self, mock_job, _):
+        """Test that suite starter exposes metrics for the TERCCs it handles.
+
+        Approval criteria:
+            - TERCCs shall be counted as received and as ACK:ed or NACK:ed.
+            - Rendering and job creation shall be timed, by template.
+            - Launched suite runners and failed launches shall be counted, by template.
+            - The consumer lag shall be set from the time of the TERCC.
+
+        Test steps:
+            1. Execute SuiteStarter with a TERCC as input.
+            2. Execute SuiteStarter with a TERCC as input when jobs can not be created.
+            3. Verify that the metrics were updated.
+        """
+
+        def sample(name: str) -> float:
+            labels = {"template": "default"} if name in labelled else {}
+            return REGISTRY.get_sample_value(f"suite_starter_{name}", labels) or 0.0
+
+        labelled = (
+            "render_seconds_count",
+            "create_job_seconds_count",
+            "suite_runners_launched_total",
+            "suite_runner_launch_failures_total",
+        )
+        names = ("terccs_received_total", "terccs_acked_total", "terccs_nacked_total", *labelled)
+        before = {name: sample(name) for name in names}
+        template = BASE_PATH.joinpath("esr_template.yaml")
+        suite_starter = SuiteStarter(str(template))
+
+        step("Execute SuiteStarter with a TERCC as input.")
+        tercc = self._generate_tercc()
+        tercc.meta.time -= 5000
+        suite_starter.suite_runner_callback(tercc, tercc.meta.event_id)
+
+        step("Execute SuiteStarter with a TERCC as input when jobs can not be created.")
+        mock_job.side_effect = Exception("Failed")
+        tercc = self._generate_tercc()
+        with self.assertRaises(Exception):
+            suite_starter.suite_runner_callback(tercc, tercc.meta.event_id)
+
+        step("Verify that the metrics were updated.")
+        increase = {name: sample(name) - before[name] for name in names}
+        self.assertEqual(
+            increase,
+            {
+                "terccs_received_total": 2,
+                "terccs_acked_total": 1,
+                "terccs_nacked_total": 1,
+                "render_seconds_count": 2,
+                "create_job_seconds_count": 2,
+                "suite_runners_launched_total": 1,
+                "suite_runner_launch_failures_total": 1,
+            },
+        )
+        self.assertGreaterEqual(sample("consumer_lag_seconds"), 0.0)
+        self.assertLess(sample("consumer_lag_seconds"), 5.0)
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    @patch("suite_starter.suite_starter.Job.create_job")
+    def test_suite_starter_phase_spans(self, *_):
+        """Test that suite starter traces each phase of a launch when the span is sampled.
+
+        Approval criteria:
+            - Each phase of a launch shall be a child span of the suite span.
+            - The suite span shall have the size of the template and of the job body.
+            - The suite span shall be propagated to the suite runner as its parent.
+            - No spans shall be created when the suite span is not sampled.
+
+        Test steps:
+            1. Execute SuiteStarter with a TERCC as input, with a sampled tracer.
+            2. Verify that the phases were traced as children of the suite span.
+            3. Verify that the suite span was propagated to the suite runner.
+            4. Execute SuiteStarter with a TERCC as input, with a tracer sampling nothing.
+            5. Verify that no spans were created.
+        """
+        template = BASE_PATH.joinpath("esr_template.yaml")
+        suite_starter = SuiteStarter(str(template))
+        render = patch.object(
+            suite_starter.suite_runner_template,
+            "render",
+            wraps=suite_starter.suite_runner_template.render,
+        ).start()
+        self.addCleanup(patch.stopall)
+
+        step("Execute SuiteStarter with a TERCC as input, with a sampled tracer.")
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        suite_starter.tracer = provider.get_tracer(__name__)
+        tercc = self._generate_tercc()
+        suite_starter.suite_runner_callback(tercc, tercc.meta.event_id)
+
+        step("Verify that the phases were traced as children of the suite span.")
+        spans = {span.name: span for span in exporter.get_finished_spans()}
+        self.assertEqual(
+            set(spans),
+            {"suite", "context", "render", "create_job"},
+        )
+        suite = spans.pop("suite")
+        for span in spans.values():
+            self.assertEqual(span.parent.span_id, suite.context.span_id)
+        self.assertEqual(
+            suite.attributes["etos.suite_starter.template.size"],
+            len(template.read_text(encoding="utf-8")),
+        )
+        self.assertGreater(suite.attributes["etos.suite_starter.job.body.size"], 0)
+
+        step("Verify that the suite span was propagated to the suite runner.")
+        traceparent = render.call_args.kwargs["otel_context"].split("-")
+        self.assertEqual(traceparent[1], f"{suite.context.trace_id:032x}")
+        self.assertEqual(traceparent[2], f"{suite.context.span_id:016x}")
+
+        step("Execute SuiteStarter with a TERCC as input, with a tracer sampling nothing.")
+        exporter.clear()
+        provider = TracerProvider(sampler=ALWAYS_OFF)
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        suite_starter.tracer = provider.get_tracer(__name__)
+        tercc = self._generate_tercc()
+        suite_starter.suite_runner_callback(tercc, tercc.meta.event_id)
+
+        step("Verify that no spans were created.")
+        self.assertEqual(exporter.get_finished_spans(), ())
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    def test_suite_starter_tercc_offload(self, load_config):
+        """Test that suite starter stores TERCCs above the threshold in ConfigMaps.
+
+        Approval criteria:
+            - A TERCC below the threshold shall be passed in the job environment.
+            - A TERCC above the threshold shall be stored compressed in a ConfigMap.
+            - The ConfigMap shall be mounted where the TERCC is referenced and owned by the job.
+            - The ConfigMap shall be deleted if the job can not be created.
+            - No ConfigMap shall be created while the circuit breaker is open.
+
+        Test steps:
+            1. Initialize SuiteStarter with a threshold against a fake Kubernetes API.
+            2. Execute SuiteStarter with a small and a large TERCC as input.
+            3. Verify that the small TERCC was passed in the job environment.
+            4. Verify that the large TERCC was stored in a ConfigMap owned by its job.
+            5. Execute SuiteStarter with a large TERCC when the job can not be created.
+            6. Execute SuiteStarter with a large TERCC when the circuit breaker is open.
+            7. Verify that no ConfigMaps were left behind.
+        """
+
+        def large_tercc():
+            tercc = self._generate_tercc()
+            tercc.data.add("batches", [{"name": "large", "recipes": ["x" * 100] * 100}])
+            return tercc
+
+        with FakeKubernetes() as fake:
+            step("Initialize SuiteStarter with a threshold against a fake Kubernetes API.")
+            load_config.side_effect = lambda: client.Configuration.set_default(fake.configuration())
+            with patch.dict(
+                os.environ,
+                {
+                    "SUITE_STARTER_TERCC_OFFLOAD_THRESHOLD": "2000",
+                    "SUITE_STARTER_CIRCUIT_BREAKER_THRESHOLD": "1",
+                    "SUITE_STARTER_RETRIES": "0",
+                },
+            ):
+                suite_starter = SuiteStarter(str(BASE_PATH.joinpath("esr_template.yaml")))
+            self.addCleanup(suite_starter.breaker.stop)
+            suite_starter.job.namespace = "etos"
+            suite_starter.tercc_store.namespace = "etos"
+
+            step("Execute SuiteStarter with a small and a large TERCC as input.")
+            small = self._generate_tercc()
+            large = large_tercc()
+            for tercc in (small, large):
+                self.assertTrue(suite_starter.suite_runner_callback(tercc, tercc.meta.event_id))
+            config_maps = dict(fake.configmaps["etos"])
+
+            step("Execute SuiteStarter with a large TERCC when the job can not be created.")
+            with patch.object(
+                suite_starter.job,
+                "create_job",
+                side_effect=ApiException(status=HTTPStatus.SERVICE_UNAVAILABLE),
+            ):
+                with self.assertRaises(ApiException):
+                    tercc = large_tercc()
+                    suite_starter.suite_runner_callback(tercc, tercc.meta.event_id)
+
+            step("Execute SuiteStarter with a large TERCC when the circuit breaker is open.")
+            with self.assertRaises(CircuitOpen):
+                tercc = large_tercc()
+                suite_starter.suite_runner_callback(tercc, tercc.meta.event_id)
+
+            step("Verify that no ConfigMaps were left behind.")
+            self.assertEqual(fake.configmaps["etos"], config_maps)
+
+        step("Verify that the small TERCC was passed in the job environment.")
+        job = fake.jobs["etos"][f"suite-runner-{small.meta.event_id}"]
+        environment = self._kubernetes_env_to_dict(job)
+        self.assertEqual(json.loads(environment["TERCC"]), small.json)
+        self.assertNotIn("etos-tercc", str(job["spec"]["template"]["spec"]["volumes"]))
+
+        step("Verify that the large TERCC was stored in a ConfigMap owned by its job.")
+        job = fake.jobs["etos"][f"suite-runner-{large.meta.event_id}"]
+        environment = self._kubernetes_env_to_dict(job)
+        self.assertEqual(environment["TERCC"], "file:///etos/tercc")
+        (config_map,) = fake.configmaps["etos"].values()
+        data = gzip.decompress(base64.b64decode(config_map["binaryData"]["tercc.json.gz.0000"]))
+        self.assertEqual(json.loads(data), large.json)
+        self.assertEqual(
+            config_map["metadata"]["ownerReferences"][0]["uid"], job["metadata"]["uid"]
+        )
+        volume = job["spec"]["template"]["spec"]["volumes"][-1]
+        self.assertEqual(
+            volume["projected"]["sources"],
+            [{"configMap": {"name": config_map["metadata"]["name"]}}],
+        )
+        for container in job["spec"]["template"]["spec"]["containers"]:
+            if any(variable["name"] == "TERCC" for variable in container.get("env", [])):
+                self.assertIn(
+                    volume["name"], [mount["name"] for mount in container["volumeMounts"]]
+                )
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    def test_suite_starter_tercc_adopt_failure(self, load_config):
+        """Test that suite starter ACKs a TERCC whose job can not own its ConfigMaps.
+
+        Approval criteria:
+            - Making the job the owner of its ConfigMaps shall be retried.
+            - A TERCC shall be ACK:ed when its job was created, even if that fails.
+            - The offload threshold shall be compared to the size of the TERCC in bytes.
+
+        Test steps:
+            1. Initialize SuiteStarter with a threshold against a fake Kubernetes API.
+            2. Execute SuiteStarter with a large TERCC when ConfigMaps can not be patched.
+            3. Verify that the TERCC was ACK:ed and that its job was created.
+            4. Verify that the threshold is compared to the size in bytes.
+        """
+        with FakeKubernetes() as fake:
+            step("Initialize SuiteStarter with a threshold against a fake Kubernetes API.")
+            load_config.side_effect = lambda: client.Configuration.set_default(fake.configuration())
+            with patch.dict(
+                os.environ,
+                {
+                    "SUITE_STARTER_TERCC_OFFLOAD_THRESHOLD": "1",
+                    "SUITE_STARTER_RETRIES": "1",
+                    "SUITE_STARTER_RETRY_BASE_DELAY": "0",
+                },
+            ):
+                suite_starter = SuiteStarter(str(BASE_PATH.joinpath("esr_template.yaml")))
+            suite_starter.job.namespace = "etos"
+            suite_starter.tercc_store.namespace = "etos"
+
+            step("Execute SuiteStarter with a large TERCC when ConfigMaps can not be patched.")
+            tercc = self._generate_tercc()
+            with patch.object(
+                suite_starter.tercc_store,
+                "adopt",
+                side_effect=ApiException(status=HTTPStatus.SERVICE_UNAVAILABLE),
+            ) as adopt:
+                acked = suite_starter.suite_runner_callback(tercc, tercc.meta.event_id)
+
+        step("Verify that the TERCC was ACK:ed and that its job was created.")
+        self.assertTrue(acked)
+        self.assertEqual(adopt.call_count, 2)
+        self.assertIn(f"suite-runner-{tercc.meta.event_id}", fake.jobs["etos"])
+        self.assertEqual(len(fake.configmaps["etos"]), 1)
+
+        step("Verify that the threshold is compared to the size in bytes.")
+        suite_starter.tercc_store.threshold = 4
+        self.assertFalse(suite_starter.tercc_store.offload("abcd"))
+        self.assertTrue(suite_starter.tercc_store.offload("åäö"))
+
+    @patch("suite_starter.suite_starter.Job._load_config")
+    def test_suite_starter_shared_environment(self, load_config):
+        """Test that suite starter shares the static environment of the suite runners.
+
+        Approval criteria:
+            - The static environment variables shall be created once in shared ConfigMaps.
+            - Shared ConfigMaps that have been deleted shall be created again.
+            - Jobs shall load the shared ConfigMaps instead of carrying the static variables.
+            - The dynamic environment variables shall be kept in the jobs.
+            - The jobs shall be smaller than without a shared environment.
+
+        Test steps:
+            1. Initialize SuiteStarter with a shared environment against a fake Kubernetes API.
+            2. Execute SuiteStarter with two TERCCs as input.
+            3. Delete the shared ConfigMaps and execute SuiteStarter with a TERCC a minute later.
+            4. Verify that the static variables were created once in shared ConfigMaps.
+            5. Verify that the deleted ConfigMaps were created again.
+            6. Verify that the jobs load the static variables from the shared ConfigMaps.
+        """
+        with FakeKubernetes() as fake:
+            step("Initialize SuiteStarter with a shared environment against a fake Kubernetes API.")
+            load_config.side_effect = lambda: client.Configuration.set_default(fake.configuration())
+            kubernetes_client = SuiteStarter._kubernetes_client  # pylint:disable=protected-access
+
+            def in_namespace(suite_starter, pool_size):
+                job = kubernetes_client(suite_starter, pool_size)
+                job.namespace = "etos"
+                return job
+
+            with patch.dict(os.environ, {"SUITE_STARTER_SHARED_ENVIRONMENT": "true"}):
+                with patch.object(SuiteStarter, "_kubernetes_client", in_namespace):
+                    suite_starter = SuiteStarter(str(BASE_PATH.joinpath("esr_template.yaml")))
+            unshared = suite_starter.suite_runner_template.render(
+                EiffelTestExecutionRecipeCollectionCreatedEvent="TERCC",
+                suite_id="ID",
+                job_name="job",
+                otel_context="",
+            )
+            config_maps = dict(fake.configmaps["etos"])
+
+            step("Execute SuiteStarter with two TERCCs as input.")
+            terccs = [self._generate_tercc() for _ in range(2)]
+            for tercc in terccs:
+                self.assertTrue(suite_starter.suite_runner_callback(tercc, tercc.meta.event_id))
+            created = dict(fake.configmaps["etos"])
+
+            step(
+                "Delete the shared ConfigMaps and execute SuiteStarter with a TERCC a minute later."
+            )
+            fake.configmaps["etos"].clear()
+            suite_starter.shared_environment.clock = lambda: time.monotonic() + 60
+            tercc = self._generate_tercc()
+            self.assertTrue(suite_starter.suite_runner_callback(tercc, tercc.meta.event_id))
+            terccs.append(tercc)
+            recreated = dict(fake.configmaps["etos"])
+
+        step("Verify that the static variables were created once in shared ConfigMaps.")
+        self.assertEqual(created, config_maps)
+        data = {name: body["data"] for name, body in config_maps.items()}
+
+        self.assertEqual(
+            sorted(data.values(), key=len),
+            [
+                {"KUBEXIT_NAME": "esr", "KUBEXIT_GRAVEYARD": "/graveyard"},
+                {
+                    "KUBEXIT_NAME": "log_listener",
+                    "KUBEXIT_GRACE_PERIOD": "400s",
+                    "KUBEXIT_GRAVEYARD": "/graveyard",
+                    "KUBEXIT_DEATH_DEPS": "esr",
+                },
+            ],
+        )
+
+        step("Verify that the deleted ConfigMaps were created again.")
+        self.assertEqual(
+            {name: body["data"] for name, body in recreated.items()},
+            {name: body["data"] for name, body in config_maps.items()},
+        )
+
+        step("Verify that the jobs load the static variables from the shared ConfigMaps.")
+        for tercc in terccs:
+            job = fake.jobs["etos"][f"suite-runner-{tercc.meta.event_id}"]
+            for container in job["spec"]["template"]["spec"]["containers"]:
+                self.assertEqual([variable["name"] for variable in container["env"]], ["TERCC"])
+                self.assertEqual(json.loads(container["env"][0]["value"]), tercc.json)
+                self.assertIn(container["envFrom"][-1]["configMapRef"]["name"], data)
+        self.assertNotIn("KUBEXIT_GRAVEYARD", json.dumps(unshared))
@@ -0,0 +1,127 @@
+# Copyright Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test module for the suite runner template."""
+
+import json
+from pathlib import Path
+from unittest import TestCase
+
+from etos_lib.kubernetes.jobs import Job
+
+from suite_starter.suite_starter import SuiteStarter
+from suite_starter.template import SuiteRunnerTemplate
+
+from .helpers import step
+
+BASE_PATH = Path(__file__).parent
+
+CONFIGURATION = {
+    "docker_image": "ESR",
+    "log_listener": "LOG_LISTENER",
+    "etos_configmap": "etos",
+    "etos_observability_configmap": "None",
+    "etos_rabbitmq_secret": "secret",
+    "ttl": "3600",
+    "termination_grace_period": "300",
+    "sidecar_image": "None",
+    "otel_exporter_otlp_endpoint": "null",
+}
+
+
+class TestSuiteRunnerTemplate(TestCase):
+    """Tests for SuiteRunnerTemplate."""
+
+    def setUp(self):
+        self.text = BASE_PATH.joinpath("esr_template.yaml").read_text(encoding="utf-8")
+        self.data = {
+            "EiffelTestExecutionRecipeCollectionCreatedEvent": json.dumps(
+                {"meta": {"id": "1"}, "data": {"batches": [{"name": "{not a placeholder}"}]}}
+            ),
+            "suite_id": "a1b2c3",
+            "job_name": "suite-runner-a1b2c3",
+            "otel_context": "traceparent=00-abc-def-01",
+        }
+
+    def test_render_same_as_format(self):
+        """Test that rendering a compiled template gives the same job as formatting the text.
+
+        Approval criteria:
+            - A rendered template shall be equal to a formatted and loaded template.
+
+        Test steps:
+            1. Compile the suite runner template.
+            2. Render the template and format the template text with the same data.
+            3. Verify that the job bodies are equal.
+        """
+        step("Compile the suite runner template.")
+        template = SuiteRunnerTemplate(self.text, CONFIGURATION)
+
+        step("Render the template and format the template text with the same data.")
+        rendered = template.render(**self.data)
+        formatted = Job.load_yaml(self.text.format(**self.data, **CONFIGURATION))
+
+        step("Verify that the job bodies are equal.")
+        self.assertDictEqual(rendered, formatted)
+
+    def test_render_returns_new_body(self):
+        """Test that each rendered job body is independent of the template and other renders.
+
+        Approval criteria:
+            - Modifying a rendered job body shall not affect subsequent renders.
+
+        Test steps:
+            1. Compile the suite runner template and render a job body.
+            2. Modify the rendered job body.
+            3. Verify that a new render is unaffected by the modification.
+        """
+        step("Compile the suite runner template and render a job body.")
+        template = SuiteRunnerTemplate(self.text, CONFIGURATION)
+        first = template.render(**self.data)
+
+        step("Modify the rendered job body.")
+        first["spec"]["template"]["spec"]["containers"].clear()
+        first["metadata"]["labels"]["id"] = "modified"
+
+        step("Verify that a new render is unaffected by the modification.")
+        second = template.render(**self.data)
+        self.assertEqual(len(second["spec"]["template"]["spec"]["containers"]), 2)
+        self.assertEqual(second["metadata"]["labels"]["id"], self.data["suite_id"])
+
+    def test_prune_at_compile(self):
+        """Test that pruning the template at compile time gives the same job as pruning a job.
+
+        Approval criteria:
+            - A template pruned when compiled shall render the same job as pruning each job.
+            - Unset configmaps shall not be part of rendered jobs.
+
+        Test steps:
+            1. Compile the suite runner template, removing empty configmaps.
+            2. Render the template and remove empty configmaps from a formatted job.
+            3. Verify that the job bodies are equal and have no unset configmaps.
+        """
+        step("Compile the suite runner template, removing empty configmaps.")
+        template = SuiteRunnerTemplate(
+            self.text, CONFIGURATION, prune=SuiteStarter.remove_empty_configmaps
+        )
+
+        step("Render the template and remove empty configmaps from a formatted job.")
+        rendered = template.render(**self.data)
+        formatted = Job.load_yaml(self.text.format(**self.data, **CONFIGURATION))
+        SuiteStarter.remove_empty_configmaps(formatted)
+
+        step("Verify that the job bodies are equal and have no unset configmaps.")
+        self.assertDictEqual(rendered, formatted)
+        self.assertNotIn('"name": "None"', json.dumps(rendered))